@@ -3,7 +3,7 @@ Direct LLM-based metadata extraction pipeline for scientific papers.
 Simplified approach without complex agent frameworks.
 """
 from openai import AsyncOpenAI
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 import json
 import logging
 import asyncio
@@ -15,12 +15,16 @@ from difflib import SequenceMatcher
 from ..extractors.pdf_extractor import PDFExtractor
 from ..tools.scientific_apis import CrossRefTool, ArxivTool, SemanticScholarTool, OpenAlexTool
 from ..tools.exa_search import ExaSearchTool
+from ...config import settings
 
 logger = logging.getLogger(__name__)
 
 # Check if debug mode is enabled
 DEBUG = os.getenv("DEBUG", "False").lower() in ("true", "1", "yes")
 
+# PDF text sent to the LLM for metadata analysis; extraction stops once it has this much
+LLM_TEXT_CHARS = 8000
+
 # ANSI color codes for terminal output
 class Colors:
     HEADER = '\033[95m'
@@ -97,7 +101,12 @@ class MetadataExtractionPipeline:
             self.model = None
         
         # Initialize extraction tools
-        self.pdf_extractor = PDFExtractor()
+        self.pdf_extractor = PDFExtractor(
+            cache_dir=settings.extraction_cache_dir,
+            ocr_backend=settings.ocr_backend,
+            # Worker processes share the CPU cores, one OCR thread per core overall
+            ocr_workers=settings.ocr_workers or max(1, (os.cpu_count() or 1) // settings.worker_concurrency)
+        )
         self.crossref_tool = CrossRefTool(email=crossref_email)
         self.arxiv_tool = ArxivTool()
         
@@ -111,7 +120,13 @@ class MetadataExtractionPipeline:
         if exa_api_key:
             self.exa_tool = ExaSearchTool(api_key=exa_api_key)
     
-    async def extract_metadata(self, pdf_path: str, paper_id: int, force_llm: bool = False) -> Dict:
+    async def extract_metadata(
+        self,
+        pdf_path: str,
+        paper_id: int,
+        force_llm: bool = False,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Dict:
         """
         Run the complete extraction pipeline with DOI-first and LLM-optional strategy.
         
@@ -119,6 +134,7 @@ class MetadataExtractionPipeline:
             pdf_path: Path to PDF file
             paper_id: Database paper ID
             force_llm: If True, force LLM analysis even if APIs return results
+            progress_callback: Forwarded to PDFExtractor.extract_content for OCR page progress
             
         Returns:
             Dict with extracted metadata and confidence scores
@@ -146,7 +162,9 @@ class MetadataExtractionPipeline:
             debug_log(f"{'─'*80}", Colors.OKCYAN)
             logger.debug(f"Step 1: PDF extraction for paper {paper_id}")
             
-            pdf_result = self.pdf_extractor.extract_content(pdf_path)
+            pdf_result = self.pdf_extractor.extract_content(
+                pdf_path, max_chars=LLM_TEXT_CHARS, progress_callback=progress_callback
+            )
             pipeline_result["sources"].append("pdf_extraction")
             
             debug_result("PDF Extractor", pdf_result)
@@ -173,15 +191,18 @@ class MetadataExtractionPipeline:
             debug_log(f"{'─'*80}", Colors.OKCYAN)
             logger.debug(f"Step 2: Direct metadata extraction for paper {paper_id}")
             
-            basic_metadata = self.pdf_extractor.extract_basic_metadata(pdf_path)
+            # Parse the PDF once for both first-page passes
+            with self.pdf_extractor.open_document(pdf_path) as doc:
+                basic_metadata = self.pdf_extractor.extract_basic_metadata(pdf_path, doc=doc)
+                
+                # Extract keywords from PDF (author-provided keywords)
+                pdf_keywords = self.pdf_extractor.extract_keywords(pdf_path, doc=doc)
             pipeline_result["sources"].append("direct_extraction")
             
             title = basic_metadata.get("title")
             authors = basic_metadata.get("authors")
             doi = basic_metadata.get("doi")
             
-            # Extract keywords from PDF (author-provided keywords)
-            pdf_keywords = self.pdf_extractor.extract_keywords(pdf_path)
             if pdf_keywords:
                 debug_log(f"  Found {len(pdf_keywords)} keywords from PDF: {', '.join(pdf_keywords[:5])}{'...' if len(pdf_keywords) > 5 else ''}", Colors.OKGREEN)
                 pipeline_result["validation_notes"].append(f"Extracted {len(pdf_keywords)} keywords from PDF")
@@ -459,9 +480,9 @@ If information is not clearly available, use null for that field."""
         
         try:
             text_length = len(pdf_result.get("text", ""))
-            debug_log(f"  Sending {min(text_length, 8000)} chars to LLM...", Colors.OKBLUE)
+            debug_log(f"  Sending {min(text_length, LLM_TEXT_CHARS)} chars to LLM...", Colors.OKBLUE)
             
-            pdf_text = pdf_result.get("text", "")[:8000]  # Limit to ~8k chars
+            pdf_text = pdf_result.get("text", "")[:LLM_TEXT_CHARS]
             
             response = await self.llm.chat.completions.create(
                 model=self.model,
@@ -2,14 +2,20 @@
 Simplified AI endpoints for SciLib metadata extraction.
 Minimal version that works with session token authentication.
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import JSONResponse
+from starlette.websockets import WebSocketState
+from sqlalchemy import select, func, case
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any, List, Optional
+import asyncio
+import json
 import logging
 import os
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 
-from ..database.connection import get_db
+from ..database.connection import get_async_db
 from ..database.models import Paper
 from ..config import settings
 from ..auth import verify_api_key
@@ -19,6 +25,36 @@ logger = logging.getLogger(__name__)
 # Create router
 router = APIRouter(prefix="/api/ai", tags=["AI"])
 
+# WebSocket routes authenticate themselves (no X-API-Key header from browsers)
+ws_router = APIRouter(prefix="/api/ai", tags=["AI"])
+
+# Task statuses after which no further updates are pushed
+TERMINAL_TASK_STATUSES = ("completed", "failed")
+# Status WebSocket: time allowed for the auth message, and how long to wait
+# for a published update before re-reading the result backend
+TASK_STATUS_AUTH_TIMEOUT = 10  # seconds
+TASK_STATUS_IDLE_TIMEOUT = 30  # seconds
+
+# Memoized number of papers with embeddings (changes rarely, only grows)
+EMBEDDED_COUNT_TTL = 60  # seconds
+_embedded_count: Dict[str, Any] = {"value": None, "expires_at": 0.0}
+
+
+async def _count_embedded(db: AsyncSession) -> int:
+    """Count papers that have embeddings, memoized for EMBEDDED_COUNT_TTL seconds."""
+    now = time.monotonic()
+    if _embedded_count["value"] is None or now >= _embedded_count["expires_at"]:
+        _embedded_count["value"] = (await db.execute(
+            select(func.count(Paper.id)).where(Paper.embedding_title_abstract.isnot(None))
+        )).scalar()
+        _embedded_count["expires_at"] = now + EMBEDDED_COUNT_TTL
+    return _embedded_count["value"]
+
+
+def _invalidate_embedded_count():
+    """Drop the memoized count after writing embeddings."""
+    _embedded_count["value"] = None
+
 
 @router.get("/health")
 async def health_check():
@@ -37,13 +73,13 @@ async def health_check():
 @router.post("/extract/{paper_id}")
 async def start_extraction(
     paper_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: str = Depends(verify_api_key)
 ):
     """Start metadata extraction for a paper."""
     
     # Get paper
-    paper = db.query(Paper).filter(Paper.id == paper_id).first()
+    paper = (await db.execute(select(Paper).where(Paper.id == paper_id))).scalar_one_or_none()
     if not paper:
         raise HTTPException(status_code=404, detail="Paper not found")
     
@@ -52,13 +88,23 @@ async def start_extraction(
         raise HTTPException(status_code=400, detail="PDF file not found")
     
     try:
-        # For now, just return a mock response
-        # In a full implementation, this would start the Celery task
+        from .tasks import extract_pdf_metadata_task
+        
+        # Text extraction and OCR run on a Celery worker, never in the request
+        task = extract_pdf_metadata_task.delay(
+            pdf_path=paper.file_path,
+            paper_id=paper_id
+        )
+        
+        # Mark paper as processing so UI reflects background work
+        paper.extraction_status = "processing"
+        await db.commit()
+        
         return {
-            "task_id": f"mock_task_{paper_id}",
+            "task_id": task.id,
             "status": "started",
             "paper_id": paper_id,
-            "message": "Extraction started (mock implementation)"
+            "message": "Extraction started"
         }
         
     except Exception as e:
@@ -66,54 +112,51 @@ async def start_extraction(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Celery's Redis result backend stores each task's state under this key
+CELERY_TASK_META_KEY = "celery-task-meta-{task_id}"
+
+_result_backend_client = None
+
+
+async def _fetch_task_status(task_id: str) -> Dict[str, Any]:
+    """
+    Read a task's current state straight from the Celery result backend.
+    
+    Uses an async Redis client rather than ``AsyncResult``, whose lookups
+    block the event loop.
+    """
+    global _result_backend_client
+    from .tasks import CELERY_RESULT_BACKEND, task_status_payload
+    import redis.asyncio as aioredis
+    
+    if _result_backend_client is None:
+        _result_backend_client = aioredis.from_url(CELERY_RESULT_BACKEND)
+    
+    raw = await _result_backend_client.get(CELERY_TASK_META_KEY.format(task_id=task_id))
+    if raw is None:
+        # Unknown or not yet started tasks have no meta (same as AsyncResult)
+        return task_status_payload(task_id, "PENDING", None)
+    
+    meta = json.loads(raw)
+    state = meta.get("status", "PENDING")
+    info = meta.get("result")
+    if state == "FAILURE" and isinstance(info, dict):
+        # Serialized exception: {"exc_type": ..., "exc_message": [...], ...}
+        message = info.get("exc_message")
+        if isinstance(message, (list, tuple)):
+            message = " ".join(str(part) for part in message)
+        info = message or info.get("exc_type")
+    return task_status_payload(task_id, state, info)
+
+
 @router.get("/status/{task_id}")
 async def get_task_status(
     task_id: str,
     _: str = Depends(verify_api_key)
 ):
     """Get extraction task status."""
-    from ..ai.tasks import celery_app
-    from celery.result import AsyncResult
-    
     try:
-        result = AsyncResult(task_id, app=celery_app)
-        
-        if result.state == 'PENDING':
-            response = {
-                "task_id": task_id,
-                "status": "pending",
-                "progress": 0,
-                "message": "Task is waiting to start"
-            }
-        elif result.state == 'PROGRESS':
-            response = {
-                "task_id": task_id,
-                "status": "processing",
-                "progress": result.info.get('current', 0) if result.info else 0,
-                "message": result.info.get('status', 'Processing...') if result.info else 'Processing...'
-            }
-        elif result.state == 'SUCCESS':
-            response = {
-                "task_id": task_id,
-                "status": "completed",
-                "progress": 100,
-                "result": result.result
-            }
-        elif result.state == 'FAILURE':
-            response = {
-                "task_id": task_id,
-                "status": "failed",
-                "progress": 0,
-                "error": str(result.info) if result.info else "Unknown error"
-            }
-        else:
-            response = {
-                "task_id": task_id,
-                "status": result.state.lower(),
-                "progress": 0
-            }
-        
-        return response
+        return await _fetch_task_status(task_id)
     except Exception as e:
         logger.error(f"Error checking task status: {e}")
         return {
@@ -123,16 +166,103 @@ async def get_task_status(
         }
 
 
+async def _receive_ws_api_key(websocket: WebSocket) -> Optional[str]:
+    """The API key from a WebSocket's first message (``{"api_key": ...}``), or None."""
+    try:
+        message = await asyncio.wait_for(websocket.receive_json(), timeout=TASK_STATUS_AUTH_TIMEOUT)
+    except (asyncio.TimeoutError, WebSocketDisconnect, ValueError, KeyError):
+        return None
+    return message.get("api_key") if isinstance(message, dict) else None
+
+
+async def _wait_for_ws_disconnect(websocket: WebSocket):
+    """Return once the client disconnects; other client messages are ignored."""
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+@ws_router.websocket("/ws/status/{task_id}")
+async def task_status_websocket(
+    websocket: WebSocket,
+    task_id: str
+):
+    """
+    Push task status updates over a WebSocket instead of polling /status/{task_id}.
+    
+    Browsers cannot set headers on WebSocket requests, so unless the
+    X-API-Key header is sent, the first message must be ``{"api_key": ...}``
+    (kept out of the URL, which ends up in access logs). Sends the current
+    status first, then every update published by the worker until the task
+    finishes. If nothing is published for TASK_STATUS_IDLE_TIMEOUT seconds,
+    the result backend is read again, so a task whose worker died without
+    publishing still reports its final state.
+    """
+    from .tasks import CELERY_RESULT_BACKEND, TASK_STATUS_CHANNEL
+    import redis.asyncio as aioredis
+    
+    await websocket.accept()
+    
+    api_key = websocket.headers.get("x-api-key") or await _receive_ws_api_key(websocket)
+    if api_key != settings.api_key:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    client = aioredis.from_url(CELERY_RESULT_BACKEND)
+    pubsub = client.pubsub()
+    
+    async def push_updates(last: Dict[str, Any]):
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=TASK_STATUS_IDLE_TIMEOUT)
+            if message is None:
+                update = await _fetch_task_status(task_id)
+                if update == last:
+                    continue
+            else:
+                update = json.loads(message["data"])
+            await websocket.send_json(update)
+            last = update
+            if update.get("status") in TERMINAL_TASK_STATUSES:
+                return
+    
+    try:
+        # Subscribe before reading the current state so no transition is missed
+        await pubsub.subscribe(TASK_STATUS_CHANNEL.format(task_id=task_id))
+        
+        current = await _fetch_task_status(task_id)
+        await websocket.send_json(current)
+        if current["status"] in TERMINAL_TASK_STATUSES:
+            return
+        
+        # Stop on whichever comes first: the task finishing or the client leaving
+        pusher = asyncio.create_task(push_updates(current))
+        watcher = asyncio.create_task(_wait_for_ws_disconnect(websocket))
+        done, pending = await asyncio.wait({pusher, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if pusher not in done:
+            raise WebSocketDisconnect()
+        pusher.result()
+    except WebSocketDisconnect:
+        logger.debug(f"Status WebSocket for task {task_id} disconnected")
+    except Exception as e:
+        logger.error(f"Status WebSocket for task {task_id} failed: {e}")
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close()
+
 
 @router.get("/paper/{paper_id}/extraction") 
 async def get_extraction_results(
     paper_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: str = Depends(verify_api_key)
 ):
     """Get extraction results for a paper."""
     
-    paper = db.query(Paper).filter(Paper.id == paper_id).first()
+    paper = (await db.execute(select(Paper).where(Paper.id == paper_id))).scalar_one_or_none()
     if not paper:
         raise HTTPException(status_code=404, detail="Paper not found")
     
@@ -151,7 +281,7 @@ async def get_similar_papers(
     limit: int = Query(default=10, ge=1, le=50),
     min_score: float = Query(default=0.4, ge=0.0, le=1.0),
     refresh: bool = Query(default=False, description="Force refresh similarity search"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: str = Depends(verify_api_key)
 ):
     """
@@ -162,71 +292,75 @@ async def get_similar_papers(
     - refresh=True is passed
     - Cached results are older than 24 hours
     - New papers have been added since last search
-    """
-    from .services.vector_search_service import find_similar_papers
-    from sqlalchemy import func
     
-    paper = db.query(Paper).filter(Paper.id == paper_id).first()
-    if not paper:
+    If the paper has no embedding yet, one is queued and 202 is returned
+    with status "embedding_pending".
+    """
+    from .services.vector_search_service import (
+        query_similar_papers, similar_paper_entry, similarity_query_cache, SIMILAR_PAPERS_TTL
+    )
+    
+    # Load only the cache columns first; the full row (with the embedding) is
+    # fetched only when the cache can't be used
+    cached = (await db.execute(
+        select(
+            Paper.similar_papers,
+            Paper.similar_papers_updated_at,
+            case((Paper.similar_papers_expires_at > func.now(), True), else_=False).label("cache_valid")
+        ).where(Paper.id == paper_id)
+    )).first()
+    if not cached:
         raise HTTPException(status_code=404, detail="Paper not found")
     
-    # Check if we have cached results that are still valid
-    cache_valid = False
-    if paper.similar_papers and paper.similar_papers_updated_at and not refresh:
-        # Check if cache is less than 24 hours old
-        cache_age = datetime.now() - paper.similar_papers_updated_at.replace(tzinfo=None)
-        if cache_age.total_seconds() < 86400:  # 24 hours
-            cache_valid = True
-    
-    if cache_valid:
+    if cached.cache_valid and cached.similar_papers and not refresh:
         logger.info(f"Returning cached similar papers for paper {paper_id}")
         return {
             "paper_id": paper_id,
-            "similar_papers": paper.similar_papers,
+            "similar_papers": cached.similar_papers,
             "cached": True,
-            "cached_at": paper.similar_papers_updated_at.isoformat() if paper.similar_papers_updated_at else None
+            "cached_at": cached.similar_papers_updated_at.isoformat() if cached.similar_papers_updated_at else None
         }
     
-    # Check how many papers have embeddings
-    papers_with_embeddings = db.query(func.count(Paper.id)).filter(
-        Paper.embedding_title_abstract.isnot(None)
-    ).scalar()
+    paper = (await db.execute(select(Paper).where(Paper.id == paper_id))).scalar_one_or_none()
+    if not paper:
+        raise HTTPException(status_code=404, detail="Paper not found")
     
-    # Check if paper has embedding
+    # Embeddings are generated in the background (after extraction or on insert);
+    # don't block this request on the embedding API
     if paper.embedding_title_abstract is None:
-        # Try to generate embedding first
-        logger.info(f"Paper {paper_id} has no embedding, attempting to generate...")
+        from .tasks import generate_paper_embedding_task
+        
+        if not paper.title:
+            return {
+                "paper_id": paper_id,
+                "similar_papers": [],
+                "cached": False,
+                "total": 0,
+                "message": "Could not generate embedding for this paper. Make sure the paper has a title."
+            }
+        
         try:
-            from .services.embedding_service import EmbeddingService
-            
-            embedding = await EmbeddingService.generate_paper_embedding(
-                paper.title, 
-                paper.abstract
-            )
-            if embedding:
-                paper.embedding_title_abstract = embedding
-                paper.embedding_generated_at = datetime.now()
-                db.commit()
-                logger.info(f"Generated embedding for paper {paper_id}")
-                papers_with_embeddings += 1  # We just added one
-            else:
-                # Return empty results with explanation instead of error
-                return {
-                    "paper_id": paper_id,
-                    "similar_papers": [],
-                    "cached": False,
-                    "total": 0,
-                    "message": "Could not generate embedding for this paper. Make sure the paper has a title."
-                }
+            task = generate_paper_embedding_task.delay(paper_id)
         except Exception as e:
-            logger.error(f"Failed to generate embedding for paper {paper_id}: {e}")
-            return {
+            logger.error(f"Failed to queue embedding for paper {paper_id}: {e}")
+            raise HTTPException(status_code=500, detail=f"Failed to queue embedding generation: {str(e)}")
+        
+        logger.info(f"Paper {paper_id} has no embedding yet, queued task {task.id}")
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={
                 "paper_id": paper_id,
                 "similar_papers": [],
                 "cached": False,
                 "total": 0,
-                "message": f"Embedding generation failed: {str(e)}"
+                "status": "embedding_pending",
+                "task_id": task.id,
+                "message": "The embedding for this paper is still being generated. Try again in a moment."
             }
+        )
+    
+    # Check how many papers have embeddings
+    papers_with_embeddings = await _count_embedded(db)
     
     # Check if there are enough other papers with embeddings
     if papers_with_embeddings < 2:
@@ -239,27 +373,47 @@ async def get_similar_papers(
             "message": f"Need at least 2 papers with embeddings for similarity search. Currently {papers_with_embeddings} paper(s) have embeddings. Generate summaries for more papers to enable similarity search."
         }
     
+    # Reuse results already computed for a near-identical embedding
+    source_embedding = paper.embedding_title_abstract
+    if not refresh:
+        similar_papers = await similarity_query_cache.lookup(
+            source_embedding, paper_id, limit, min_score, papers_with_embeddings
+        )
+        if similar_papers is not None:
+            logger.info(f"Returning semantically cached similar papers for paper {paper_id}")
+            return {
+                "paper_id": paper_id,
+                "similar_papers": similar_papers,
+                "cached": True,
+                "total": len(similar_papers)
+            }
+    source_entry = similar_paper_entry(paper, 1.0)
+    
     # Perform similarity search
     try:
-        similar_papers = await find_similar_papers(
-            db=db,
+        similar_papers = await db.run_sync(
+            query_similar_papers,
             paper_id=paper_id,
             limit=limit,
             min_score=min_score,
             exclude_self=True
         )
+        await similarity_query_cache.store(
+            source_embedding, source_entry, limit, min_score, papers_with_embeddings, similar_papers
+        )
         
         # Cache the results - use a fresh query to avoid transaction issues
         try:
-            db.rollback()  # Clear any failed transaction state
-            paper = db.query(Paper).filter(Paper.id == paper_id).first()
+            await db.rollback()  # Clear any failed transaction state
+            paper = (await db.execute(select(Paper).where(Paper.id == paper_id))).scalar_one_or_none()
             if paper:
                 paper.similar_papers = similar_papers
                 paper.similar_papers_updated_at = datetime.now()
-                db.commit()
+                paper.similar_papers_expires_at = datetime.now(timezone.utc) + SIMILAR_PAPERS_TTL
+                await db.commit()
         except Exception as cache_error:
             logger.warning(f"Failed to cache similar papers: {cache_error}")
-            db.rollback()
+            await db.rollback()
         
         logger.info(f"Found {len(similar_papers)} similar papers for paper {paper_id}")
         
@@ -271,7 +425,7 @@ async def get_similar_papers(
         }
         
     except Exception as e:
-        db.rollback()  # Ensure transaction is rolled back
+        await db.rollback()  # Ensure transaction is rolled back
         logger.error(f"Similarity search failed for paper {paper_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Similarity search failed: {str(e)}")
 
@@ -279,13 +433,13 @@ async def get_similar_papers(
 @router.post("/paper/{paper_id}/similar/refresh")
 async def refresh_similar_papers(
     paper_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: str = Depends(verify_api_key)
 ):
     """Force refresh the similar papers cache for a paper."""
     from .tasks import find_similar_papers_task
     
-    paper = db.query(Paper).filter(Paper.id == paper_id).first()
+    paper = (await db.execute(select(Paper).where(Paper.id == paper_id))).scalar_one_or_none()
     if not paper:
         raise HTTPException(status_code=404, detail="Paper not found")
     
@@ -306,7 +460,7 @@ async def refresh_similar_papers(
 
 @router.post("/embeddings/generate-all")
 async def generate_all_embeddings(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: str = Depends(verify_api_key)
 ):
     """
@@ -314,18 +468,17 @@ async def generate_all_embeddings(
     This is useful for enabling similarity search across the library.
     """
     from .services.embedding_service import EmbeddingService
-    from sqlalchemy import func
     
     # Get all papers without embeddings
-    papers_without_embeddings = db.query(Paper).filter(
-        Paper.embedding_title_abstract.is_(None),
-        Paper.title.isnot(None)  # Need title for embedding
-    ).all()
+    papers_without_embeddings = (await db.execute(
+        select(Paper).where(
+            Paper.embedding_title_abstract.is_(None),
+            Paper.title.isnot(None)  # Need title for embedding
+        )
+    )).scalars().all()
     
     if not papers_without_embeddings:
-        total_with_embeddings = db.query(func.count(Paper.id)).filter(
-            Paper.embedding_title_abstract.isnot(None)
-        ).scalar()
+        total_with_embeddings = await _count_embedded(db)
         return {
             "status": "complete",
             "message": "All papers already have embeddings",
@@ -337,30 +490,24 @@ async def generate_all_embeddings(
     failed = 0
     errors = []
     
-    for paper in papers_without_embeddings:
-        try:
-            embedding = await EmbeddingService.generate_paper_embedding(
-                paper.title,
-                paper.abstract
-            )
-            if embedding:
-                paper.embedding_title_abstract = embedding
-                paper.embedding_generated_at = datetime.now()
-                generated += 1
-                logger.info(f"Generated embedding for paper {paper.id}: {paper.title[:50]}...")
-            else:
-                failed += 1
-                errors.append(f"Paper {paper.id}: No embedding generated")
-        except Exception as e:
+    # Batched API requests instead of one request per paper
+    embeddings = await EmbeddingService.generate_paper_embeddings_batch(
+        [(paper.title, paper.abstract) for paper in papers_without_embeddings]
+    )
+    
+    for paper, embedding in zip(papers_without_embeddings, embeddings):
+        if embedding:
+            paper.embedding_title_abstract = embedding
+            paper.embedding_generated_at = datetime.now()
+            generated += 1
+        else:
             failed += 1
-            errors.append(f"Paper {paper.id}: {str(e)}")
-            logger.error(f"Failed to generate embedding for paper {paper.id}: {e}")
+            errors.append(f"Paper {paper.id}: No embedding generated")
     
-    db.commit()
+    await db.commit()
+    _invalidate_embedded_count()
     
-    total_with_embeddings = db.query(func.count(Paper.id)).filter(
-        Paper.embedding_title_abstract.isnot(None)
-    ).scalar()
+    total_with_embeddings = await _count_embedded(db)
     
     return {
         "status": "complete",
@@ -374,7 +521,7 @@ async def generate_all_embeddings(
 @router.get("/paper/{paper_id}/tasks")
 async def get_paper_tasks(
     paper_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: str = Depends(verify_api_key)
 ):
     """
@@ -387,7 +534,7 @@ async def get_paper_tasks(
     5. Summary generation
     6. Similar papers search
     """
-    paper = db.query(Paper).filter(Paper.id == paper_id).first()
+    paper = (await db.execute(select(Paper).where(Paper.id == paper_id))).scalar_one_or_none()
     if not paper:
         raise HTTPException(status_code=404, detail="Paper not found")
     
@@ -2,27 +2,349 @@
 PDF content extraction service with text and OCR capabilities.
 """
 import fitz  # PyMuPDF
-import pdfplumber
-import pytesseract
-from PIL import Image
-from typing import Dict, Optional, List
+import numpy as np
+from typing import Callable, Dict, Iterable, Iterator, Optional, List, Tuple
 from pathlib import Path
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import hashlib
+import json
 import logging
+import os
 import re
+import threading
 
 logger = logging.getLogger(__name__)
 
+# OCR runs in parallel on the OCR thread pool; tesseract's own OpenMP threads
+# on top of that would oversubscribe the CPU. Set before tesseract is loaded.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+
+# OCR rendering/recognition settings
+OCR_DPI = 216  # Render resolution for OCR; tesseract gains little above that for body text
+OCR_MAX_PAGE_PIXELS = 3000  # Cap on the longer rendered side (oversized/poster pages)
+OCR_CONFIG = "--psm 3 --oem 1"  # Automatic page segmentation without OSD, LSTM engine
+OCR_WORKERS = os.cpu_count() or 1  # Default OCR threads; each runs its own tesseract instance
+OCR_PREFETCH_PAGES = 2  # Rendered pages allowed to queue ahead of the OCR workers
+
+# Documents longer than this use PyMuPDF's plain-text extraction flags
+LARGE_DOCUMENT_PAGES = 500
+
+# Text layers shorter than this are treated as missing (scanned document)
+MIN_TEXT_CHARS = 100
+
+# Cache keys hash this much of the file (plus its size and mtime)
+CACHE_KEY_PREFIX_BYTES = 1 << 20
+
+# First-page title heuristics: lines containing any of these are affiliations,
+# venue/publisher banners etc., not titles
+_TITLE_SKIP_KEYWORDS = frozenset({
+    'university', 'institute', 'department', 'faculty',
+    'college', 'school', 'center', 'centre', 'laboratory', 'email',
+    '@', 'www.', 'http', '.edu', '.com', '.org', '.ac.uk',
+    'short papers', 'conference', 'proceedings',
+    'volume', 'issue', 'pp.', 'pages', 'page ',
+    'ieee', 'acm', 'springer', 'elsevier',
+    'transactions', 'journal of', 'letters', 'practice',
+    'copyright', '©', 'published', 'received',
+    'contents lists', 'sciencedirect', 'available at',
+    'journal homepage', 'preprint', 'submitted'
+})
+_RE_TITLE_SKIP = re.compile('|'.join(map(re.escape, sorted(_TITLE_SKIP_KEYWORDS))), re.IGNORECASE)
+_RE_PAGE_NUMBER = re.compile(r'^\d+\s*$')
+_RE_JOURNAL_CITATION = re.compile(r'\d+\s*\(\d{4}\)\s*\d+[-–]\d+')  # e.g. "Journal Name 80 (2018) 83-93"
+_RE_LEADING_NUMBER = re.compile(r'^\d+[A-Z]')
+_RE_MONTH_YEAR = re.compile(
+    r'\b(january|february|march|april|may|june|july|august|september|october|november|december)\s+\d{4}\b',
+    re.IGNORECASE
+)
+_FOOTNOTE_MARKERS = '✩★*†‡§'
+_RE_FOOTNOTE_MARKER = re.compile(f'[{re.escape(_FOOTNOTE_MARKERS)}]$')
+# Everything a title line must not match, as one pattern: page numbers, journal
+# citations, skip keywords, leading author-ref numbers, month-year dates and
+# trailing footnote markers
+_RE_NOT_TITLE = re.compile('|'.join([
+    _RE_PAGE_NUMBER.pattern,
+    _RE_JOURNAL_CITATION.pattern,
+    f"(?i:{_RE_TITLE_SKIP.pattern})",
+    _RE_LEADING_NUMBER.pattern,
+    f"(?i:{_RE_MONTH_YEAR.pattern})",
+    _RE_FOOTNOTE_MARKER.pattern,
+]))
+_RE_AUTHOR_MEMBERSHIP = re.compile(r'[A-Z][A-Z\s\.]+,\s*(MEMBER|SENIOR|FELLOW|IEEE|ACM)', re.IGNORECASE)
+
+# Author keyword sections; multiple patterns to catch different journal styles
+_KEYWORD_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE | re.DOTALL) for pattern in (
+        # Standard "Keywords:" followed by comma/semicolon separated list
+        r"(?:Keywords?|Key\s*words?|KEY\s*WORDS?)[:\s—–-]+([^\n]+?)(?=\n\s*\n|\n[A-Z1-9]\.|\nIntroduction|\n\d+\.\s)",
+        # Index Terms (IEEE style)
+        r"(?:Index\s*Terms?)[:\s—–-]+([^\n]+?)(?=\n\s*\n|\n[A-Z1-9]\.|\nIntroduction|\n\d+\.\s)",
+        # Keywords on next line
+        r"(?:Keywords?|Key\s*words?|KEY\s*WORDS?|Index\s*Terms?)[:\s]*\n([^\n]+?)(?=\n\s*\n|\n[A-Z1-9]\.)",
+    )
+]
+_RE_KEYWORD_TRIM = re.compile(r'^[\s.,:;•–-]+|[\s.,:;•–-]+$')
+
+# DOIs after a "doi:" marker (any non-space), else bare DOIs (stricter charset).
+# DOI bodies are matched anchored at each "10." offset; the marker check
+# only looks at the few characters before it
+_RE_DOI_MARKED = re.compile(r'10\.\d{4,}/[^\s]+')
+_RE_DOI_BARE = re.compile(r'10\.\d{4,}/[^\s\]<>]+')
+_RE_DOI_MARKER = re.compile(r'doi:?\s*$', re.IGNORECASE)
+
+
+def _is_title_line(line: str) -> bool:
+    """Whether a first-page line can start a title (cheapest checks first)."""
+    # Very short or very long lines are not titles
+    if len(line) < 15 or len(line) > 150:
+        return False
+    # Lots of commas: likely an author list
+    if line.count(',') > 3:
+        return False
+    # Very short uppercase lines are section headers like "ABSTRACT"
+    if len(line) < 30 and line.isupper():
+        return False
+    # Page numbers, journal citations, journal/conference markers, author refs,
+    # dates and footnote markers, all in a single regex pass
+    return not _RE_NOT_TITLE.search(line)
+
+
+def _otsu_threshold(pixels: np.ndarray) -> int:
+    """Compute Otsu's binarization threshold for 8-bit grayscale pixels."""
+    hist = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    if total == 0:
+        return 127
+    
+    levels = np.arange(256)
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    cum_mean = np.cumsum(hist * levels)
+    mean_bg = cum_mean / np.maximum(weight_bg, 1)
+    mean_fg = (cum_mean[-1] - cum_mean) / np.maximum(weight_fg, 1)
+    between_var = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between_var))
+
+
+def _binarize(samples: bytes) -> bytes:
+    """Otsu-binarize 8-bit grayscale pixmap samples into 0/255 samples of the same layout."""
+    # The histogram reads the pixmap buffer in place; translate() then maps it
+    # through a lookup table in one pass, producing the only copy
+    threshold = _otsu_threshold(np.frombuffer(samples, dtype=np.uint8))
+    return bytes(samples).translate(bytes([0] * (threshold + 1) + [255] * (255 - threshold)))
+
+
+# One tesserocr API per OCR thread (PyTessBaseAPI is not thread-safe); False
+# marks a thread where tesserocr is unavailable
+_tess_local = threading.local()
+_ocr_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _get_tess_api():
+    """Return this thread's persistent tesserocr API, or None to use pytesseract."""
+    api = getattr(_tess_local, "api", None)
+    if api is None:
+        try:
+            from tesserocr import PyTessBaseAPI, PSM, OEM
+            
+            # Same settings as OCR_CONFIG; the language model is loaded once per thread
+            api = PyTessBaseAPI(lang='eng', psm=PSM.AUTO, oem=OEM.LSTM_ONLY)
+        except Exception as e:
+            logger.debug(f"tesserocr unavailable, using pytesseract: {e}")
+            api = False
+        _tess_local.api = api
+    return api or None
+
+
+def _get_ocr_pool(workers: int) -> ThreadPoolExecutor:
+    """
+    Shared OCR thread pool; kept alive so each thread's tesserocr API is reused.
+    
+    Sized by the first caller in the process.
+    """
+    global _ocr_pool
+    if _ocr_pool is None:
+        _ocr_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr")
+    return _ocr_pool
+
+
+def _ocr_bytes(raster: Tuple[int, int, int, bytes]) -> str:
+    """OCR one rasterized page given as (page_num, width, height, grayscale samples)."""
+    page_num, width, height, samples = raster
+    try:
+        # Binarize up front: tesseract only uses a binary image internally anyway
+        binary = _binarize(samples)
+        
+        api = _get_tess_api()
+        if api is not None:
+            # Hand the raw 8-bit buffer to tesseract; no PIL image or temp file
+            api.SetImageBytes(binary, width, height, 1, width)
+            return api.GetUTF8Text()
+        # Only needed without tesserocr, so not imported at module load
+        import pytesseract
+        from PIL import Image
+        
+        # frombuffer shares the buffer instead of copying it like frombytes
+        img = Image.frombuffer("L", (width, height), binary, "raw", "L", 0, 1)
+        # pytesseract always round-trips through a temp file; uncompressed BMP
+        # is an order of magnitude cheaper to write than its PNG default
+        img.format = "BMP"
+        return pytesseract.image_to_string(img, lang='eng', config=OCR_CONFIG)
+    except Exception as e:
+        logger.warning(f"OCR failed for page {page_num}: {e}")
+        return ""
+
+
+# Shared EasyOCR reader (model load is expensive); False once known to be unavailable
+_easyocr_reader = None
+EASYOCR_BATCH_SIZE = 8
+
+
+def _get_easyocr_reader():
+    """Create the EasyOCR GPU reader on first use; None if EasyOCR or CUDA is missing."""
+    global _easyocr_reader
+    if _easyocr_reader is None:
+        try:
+            import easyocr
+            import torch
+            
+            if not torch.cuda.is_available():
+                logger.info("CUDA not available, using tesseract for OCR")
+                _easyocr_reader = False
+            else:
+                _easyocr_reader = easyocr.Reader(['en'], gpu=True)
+        except Exception as e:
+            logger.warning(f"EasyOCR unavailable, using tesseract for OCR: {e}")
+            _easyocr_reader = False
+    return _easyocr_reader or None
+
+
+@contextmanager
+def _borrow_document(pdf_path: str, doc: Optional[fitz.Document] = None):
+    """Yield ``doc`` if the caller already has the PDF open, else open (and close) it."""
+    if doc is not None:
+        yield doc
+    else:
+        with fitz.open(pdf_path) as opened:
+            yield opened
+
 
 class PDFExtractor:
     """Extracts text and metadata from PDF files using multiple methods."""
     
-    def __init__(self, max_ocr_pages: int = 10):
+    def __init__(
+        self,
+        max_ocr_pages: int = 10,
+        cache_dir: Optional[Path] = None,
+        ocr_backend: str = "tesseract",
+        ocr_workers: Optional[int] = None
+    ):
+        """
+        Args:
+            max_ocr_pages: Maximum number of pages to OCR for scanned documents
+            cache_dir: Directory for caching extract_content results keyed by
+                file hash; None disables the cache
+            ocr_backend: "tesseract" (CPU) or "easyocr" (batched GPU OCR for bulk
+                backfills; falls back to tesseract when EasyOCR/CUDA is unavailable)
+            ocr_workers: OCR threads for this process (default: OCR_WORKERS);
+                lower it when several worker processes share the CPU
+        """
         self.max_ocr_pages = max_ocr_pages
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.ocr_backend = ocr_backend
+        self.ocr_workers = ocr_workers or OCR_WORKERS
+    
+    def _cache_path(self, pdf_path: Path, kind: str) -> Optional[Path]:
+        """
+        Location of a cached result of type ``kind`` for this file.
+        
+        Keyed by a hash of the first 1 MB plus the file size and mtime, so a
+        cache hit never has to read the whole PDF.
+        """
+        if not self.cache_dir:
+            return None
+        
+        stat = pdf_path.stat()
+        digest = hashlib.blake2b(digest_size=20)
+        with open(pdf_path, "rb") as f:
+            digest.update(f.read(CACHE_KEY_PREFIX_BYTES))
+        digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+        return self.cache_dir / f"{digest.hexdigest()}-{kind}.json"
+    
+    def _cache_path_or_none(self, pdf_path: Path, kind: str) -> Optional[Path]:
+        try:
+            return self._cache_path(pdf_path, kind)
+        except Exception as e:
+            logger.warning(f"Could not hash {pdf_path} for extraction cache: {e}")
+            return None
+    
+    def _load_cached(self, cache_path: Optional[Path], pdf_path: Path) -> Optional[Dict]:
+        """Return a cached result if one exists and is newer than the PDF."""
+        if not cache_path or not cache_path.exists():
+            return None
+        try:
+            if cache_path.stat().st_mtime <= pdf_path.stat().st_mtime:
+                return None
+            with open(cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable extraction cache {cache_path}: {e}")
+            return None
+    
+    def _store_cached(self, cache_path: Optional[Path], result: Dict) -> None:
+        """Persist a successful extraction result."""
+        if not cache_path or result.get("error"):
+            return
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(result, f)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            logger.warning(f"Failed to write extraction cache {cache_path}: {e}")
+    
+    @contextmanager
+    def open_document(self, pdf_path: str):
+        """
+        Open a PDF once to share between several extract_* calls (pass it as
+        ``doc``), instead of each call re-parsing the file. Yields None if the
+        file can't be opened; the methods then open (and report on) it themselves.
+        """
+        try:
+            doc = fitz.open(pdf_path)
+        except Exception as e:
+            logger.warning(f"Could not open {pdf_path}: {e}")
+            yield None
+            return
+        try:
+            yield doc
+        finally:
+            doc.close()
     
-    def extract_content(self, pdf_path: str) -> Dict:
+    def extract_content(
+        self,
+        pdf_path: str,
+        max_chars: Optional[int] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        force_refresh: bool = False,
+        doc: Optional[fitz.Document] = None
+    ) -> Dict:
         """
         Extract comprehensive content from PDF.
         
+        Args:
+            pdf_path: Path to the PDF file
+            max_chars: Stop reading pages once this much text has been collected
+                (useful for quick metadata extraction); None reads every page
+            progress_callback: Called as (pages_done, pages_total) after each OCR page
+            force_refresh: Ignore any cached result and re-extract
+            doc: Already opened document for pdf_path (see open_document)
+        
         Returns:
             Dict with extracted text, metadata, and extraction method used
         """
@@ -39,126 +361,319 @@ class PDFExtractor:
             "error": None
         }
         
+        # Re-extraction of an unchanged file is just a JSON read; truncated
+        # results are cached separately from full ones
+        cache_kind = f"{self.ocr_backend}{self.max_ocr_pages}"
+        if max_chars is not None:
+            cache_kind += f"-{max_chars}"
+        cache_path = self._cache_path_or_none(pdf_path, cache_kind)
+        cached = None if force_refresh else self._load_cached(cache_path, pdf_path)
+        if cached is not None:
+            logger.info(f"Using cached extraction result for {pdf_path}")
+            return cached
+        
         try:
-            # Try text extraction first (fastest)
-            text_result = self._extract_text(str(pdf_path))
-            
-            if text_result["text"].strip() and len(text_result["text"]) > 100:
-                # Good text extraction
-                result.update(text_result)
-                result["method"] = "text_extraction"
-                result["confidence"] = 0.9
-            else:
-                # Fallback to OCR for scanned documents
-                logger.info(f"Text extraction yielded little content, trying OCR for {pdf_path}")
-                ocr_result = self._extract_with_ocr(str(pdf_path))
-                result.update(ocr_result)
-                result["method"] = "ocr"
-                result["confidence"] = 0.7
+            # Open once: text extraction and the OCR fallback share the parsed document
+            with _borrow_document(str(pdf_path), doc) as doc:
+                # Try text extraction first (fastest)
+                text_result = self._extract_text(doc, str(pdf_path), max_chars=max_chars)
+                probably_scanned = text_result.pop("probably_scanned")
                 
+                if not probably_scanned and len(text_result["text"].strip()) > MIN_TEXT_CHARS:
+                    # Good text extraction
+                    result.update(text_result)
+                    result["method"] = "text_extraction"
+                    result["confidence"] = 0.9
+                else:
+                    # Fallback to OCR for scanned documents
+                    logger.info(f"Text extraction yielded little content, trying OCR for {pdf_path}")
+                    ocr_result = self._extract_with_ocr(doc, progress_callback=progress_callback)
+                    result.update(ocr_result)
+                    result["method"] = "ocr"
+                    result["confidence"] = 0.7
+        
         except Exception as e:
             logger.error(f"PDF extraction failed for {pdf_path}: {e}")
             result["error"] = str(e)
             result["confidence"] = 0.0
         
+        self._store_cached(cache_path, result)
         return result
     
-    def _extract_text(self, pdf_path: str) -> Dict:
-        """Extract text using PyMuPDF and pdfplumber."""
-        text = ""
+    def _extract_text(self, doc: fitz.Document, pdf_path: str, max_chars: Optional[int] = None) -> Dict:
+        """
+        Extract text using PyMuPDF, falling back to pdfplumber if it finds none.
+        
+        Skips the text pass (with ``probably_scanned`` set) when the first and
+        middle pages are images without a text layer.
+        """
+        parts = []
+        total_chars = 0
         metadata = {}
         page_count = 0
+        probably_scanned = False
         
         try:
             # Try PyMuPDF first (fastest)
-            with fitz.open(pdf_path) as doc:
-                page_count = len(doc)
-                metadata = dict(doc.metadata) if doc.metadata else {}
-                
-                # Extract text from all pages
-                for page in doc:
-                    page_text = page.get_text()
-                    if page_text.strip():
-                        text += page_text + "\n"
+            page_count = len(doc)
+            metadata = dict(doc.metadata) if doc.metadata else {}
+            
+            # Plain-text mode skips block assembly; worth it for very long documents
+            flags = None
+            if page_count > LARGE_DOCUMENT_PAGES:
+                flags = fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_DEHYPHENATE
             
-            # If PyMuPDF didn't get much text, try pdfplumber
-            if len(text.strip()) < 100:
+            # Image-only pages with (almost) no text layer at the start and in the
+            # middle: a scan that will go to OCR anyway, so don't walk the document
+            if page_count:
+                probe_pages = [doc[page_num] for page_num in sorted({0, page_count // 2})]
+                probe_chars = sum(len(page.get_text("text").strip()) for page in probe_pages)
+                probably_scanned = (probe_chars < MIN_TEXT_CHARS
+                                    and all(page.get_images() for page in probe_pages))
+            
+            # Extract text from all pages (or until max_chars is reached)
+            for page in ([] if probably_scanned else doc):
+                page_text = page.get_text("text", flags=flags)
+                if page_text.strip():
+                    parts.append(page_text)
+                    total_chars += len(page_text) + 1
+                if max_chars is not None and total_chars > max_chars:
+                    break
+            
+            # Only reparse with pdfplumber if PyMuPDF found no text layer at all
+            if not probably_scanned and not any(part.strip() for part in parts):
                 try:
+                    import pdfplumber  # Heavy (pdfminer.six); only needed for this rare fallback
+                    
                     with pdfplumber.open(pdf_path) as pdf:
                         for page in pdf.pages[:5]:  # First 5 pages for speed
                             page_text = page.extract_text()
                             if page_text:
-                                text += page_text + "\n"
+                                parts.append(page_text)
                 except Exception as e:
                     logger.warning(f"pdfplumber extraction failed: {e}")
-            
+        
         except Exception as e:
             raise Exception(f"Text extraction failed: {e}")
         
         return {
-            "text": text.strip(),
+            "text": "\n".join(parts).strip(),
             "metadata": metadata,
-            "page_count": page_count
+            "page_count": page_count,
+            "probably_scanned": probably_scanned
         }
     
-    def _extract_with_ocr(self, pdf_path: str) -> Dict:
+    def _extract_with_ocr(
+        self,
+        doc: fitz.Document,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Dict:
         """Extract text using OCR for scanned documents."""
-        text = ""
+        parts = []
         page_count = 0
         
         try:
-            with fitz.open(pdf_path) as doc:
-                page_count = len(doc)
-                
-                # Limit OCR to first few pages for speed
-                pages_to_process = min(self.max_ocr_pages, page_count)
-                
-                for page_num in range(pages_to_process):
-                    page = doc[page_num]
-                    
-                    # Convert page to image
-                    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # 2x zoom for better OCR
-                    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                    
-                    # Perform OCR
-                    try:
-                        page_text = pytesseract.image_to_string(img, lang='eng')
-                        if page_text.strip():
-                            text += page_text + "\n"
-                    except Exception as e:
-                        logger.warning(f"OCR failed for page {page_num}: {e}")
-                        continue
+            page_count = len(doc)
+            
+            # Limit OCR to first few pages for speed
+            pages_to_process = min(self.max_ocr_pages, page_count)
+            
+            if pages_to_process:
+                rasters = self._rasterize_pages(doc, pages_to_process)
+                page_texts = None
+                if self.ocr_backend == "easyocr":
+                    rasters = list(rasters)
+                    page_texts = self._ocr_with_easyocr(rasters, progress_callback)
+                if page_texts is None:
+                    page_texts = self._ocr_with_tesseract(rasters, pages_to_process, progress_callback)
                 
+                parts = [page_text for page_text in page_texts if page_text.strip()]
+        
         except Exception as e:
             raise Exception(f"OCR extraction failed: {e}")
         
         return {
-            "text": text.strip(),
+            "text": "\n".join(parts).strip(),
             "metadata": {},
             "page_count": page_count
         }
     
-    def get_first_page_text(self, pdf_path: str, max_chars: int = 2000) -> str:
+    @staticmethod
+    def _rasterize_pages(doc: fitz.Document, page_count: int) -> Iterator[Tuple[int, int, int, bytes]]:
+        """Render pages one at a time as (page_num, width, height, grayscale samples)."""
+        for page_num in range(page_count):
+            page = doc[page_num]
+            
+            # Zoom from the page's own size: OCR_DPI, unless that would exceed
+            # OCR_MAX_PAGE_PIXELS on the longer side
+            zoom = OCR_DPI / 72
+            longest_side = max(page.rect.width, page.rect.height)
+            if longest_side * zoom > OCR_MAX_PAGE_PIXELS:
+                zoom = OCR_MAX_PAGE_PIXELS / longest_side
+            
+            # Grayscale: 1 byte/pixel instead of 3 for RGB
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+            yield (page_num, pix.width, pix.height, pix.samples)
+    
+    def _ocr_with_tesseract(
+        self,
+        rasters: Iterable[Tuple[int, int, int, bytes]],
+        page_count: int,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> List[str]:
+        """OCR pages in parallel on the shared OCR thread pool."""
+        executor = _get_ocr_pool(self.ocr_workers)
+        page_texts = []
+        
+        def collect(future):
+            page_texts.append(future.result())
+            if progress_callback:
+                progress_callback(len(page_texts), page_count)
+        
+        # Submit each page as soon as it is rendered, so rendering the next
+        # page overlaps OCR of the previous ones. Rendering stays on this
+        # thread because PyMuPDF documents are not thread-safe. At most
+        # OCR_PREFETCH_PAGES rasters wait for a worker, which bounds memory.
+        in_flight = deque()
+        max_in_flight = self.ocr_workers + OCR_PREFETCH_PAGES
+        for raster in rasters:
+            if len(in_flight) >= max_in_flight:
+                collect(in_flight.popleft())
+            in_flight.append(executor.submit(_ocr_bytes, raster))
+        while in_flight:
+            collect(in_flight.popleft())
+        return page_texts
+    
+    def _ocr_with_easyocr(
+        self,
+        rasters: List[Tuple[int, int, int, bytes]],
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Optional[List[str]]:
+        """OCR pages in GPU batches with EasyOCR; None if the GPU backend is unavailable."""
+        reader = _get_easyocr_reader()
+        if reader is None:
+            return None
+        
+        try:
+            images = [
+                np.frombuffer(samples, dtype=np.uint8).reshape(height, width)
+                for _, width, height, samples in rasters
+            ]
+            page_texts = []
+            for start in range(0, len(images), EASYOCR_BATCH_SIZE):
+                batch = images[start:start + EASYOCR_BATCH_SIZE]
+                for lines in reader.readtext_batched(batch, batch_size=EASYOCR_BATCH_SIZE, detail=0, paragraph=True):
+                    page_texts.append("\n".join(lines))
+                if progress_callback:
+                    progress_callback(len(page_texts), len(rasters))
+            return page_texts
+        except Exception as e:
+            logger.warning(f"EasyOCR failed, falling back to tesseract: {e}")
+            return None
+    
+    def get_first_page_text(
+        self,
+        pdf_path: str,
+        max_chars: int = 2000,
+        doc: Optional[fitz.Document] = None
+    ) -> str:
         """Get text from first page only (for quick metadata extraction)."""
         try:
-            with fitz.open(pdf_path) as doc:
+            with _borrow_document(pdf_path, doc) as doc:
                 if len(doc) > 0:
-                    first_page = doc[0]
-                    text = first_page.get_text()
-                    return text[:max_chars] if text else ""
+                    # Collect text blocks only until the budget is reached, rather
+                    # than building the whole page string and slicing it
+                    parts = []
+                    total_chars = 0
+                    for block in doc[0].get_text("blocks"):
+                        if block[6] != 0:  # Image block
+                            continue
+                        parts.append(block[4])
+                        total_chars += len(block[4])
+                        if total_chars >= max_chars:
+                            break
+                    return "".join(parts)[:max_chars]
         except Exception as e:
             logger.error(f"Failed to extract first page text: {e}")
         
         return ""
     
-    def extract_basic_metadata(self, pdf_path: str) -> Dict:
+    def extract_document_metadata(self, pdf_path: str) -> Dict[str, str]:
+        """
+        Read only the PDF's document information dictionary (title, author, ...).
+        
+        No page is loaded or parsed, so this is cheap even for very large files;
+        meant for bulk scans such as library imports.
+        """
+        try:
+            with fitz.open(pdf_path, filetype="pdf") as doc:
+                return dict(doc.metadata) if doc.metadata else {}
+        except Exception as e:
+            logger.error(f"Failed to read PDF metadata: {e}")
+            return {}
+    
+    def extract_basic_metadata(
+        self,
+        pdf_path: str,
+        force_refresh: bool = False,
+        include_doi: bool = True,
+        doc: Optional[fitz.Document] = None
+    ) -> Dict:
         """
         Extract basic metadata (title, authors, DOI) directly from PDF without LLM.
         Uses PDF metadata and first-page heuristics.
         
+        Args:
+            pdf_path: Path to the PDF file
+            force_refresh: Ignore any cached result and re-extract
+            include_doi: Search the first page for a DOI. Without it, no page
+                text is read at all when the PDF metadata has a title.
+            doc: Already opened document for pdf_path (see open_document)
+        
         Returns:
             Dict with title, authors, doi if found
         """
+        cache_path = None
+        if Path(pdf_path).exists():
+            cache_path = self._cache_path_or_none(Path(pdf_path), "basic" if include_doi else "basic-nodoi")
+        cached = None if force_refresh else self._load_cached(cache_path, Path(pdf_path))
+        if cached is not None:
+            return cached
+        
+        result = self._extract_basic_metadata(pdf_path, include_doi=include_doi, doc=doc)
+        self._store_cached(cache_path, result)
+        return result
+    
+    @staticmethod
+    def _extract_doi(page_text: str) -> Optional[str]:
+        """Find a DOI in page text."""
+        text_to_search = page_text[:8000]  # Increased from 3000 to capture DOIs near end of page
+        
+        # Every DOI starts with "10.", so only those offsets need the regex
+        # (pages without one skip it entirely). A DOI labelled as such wins
+        # over an earlier bare one.
+        bare = None
+        start = text_to_search.find('10.')
+        while start >= 0:
+            if _RE_DOI_MARKER.search(text_to_search, max(0, start - 16), start):
+                match = _RE_DOI_MARKED.match(text_to_search, start)
+                if match:
+                    return match.group().rstrip('.')
+            preceding = text_to_search[start - 1] if start else ' '
+            if bare is None and not (preceding.isalnum() or preceding == '_'):
+                match = _RE_DOI_BARE.match(text_to_search, start)
+                if match:
+                    bare = match.group()
+            start = text_to_search.find('10.', start + 3)
+        return bare.rstrip('.') if bare else None
+    
+    def _extract_basic_metadata(
+        self,
+        pdf_path: str,
+        include_doi: bool = True,
+        doc: Optional[fitz.Document] = None
+    ) -> Dict:
+        """Uncached implementation of extract_basic_metadata."""
         result = {
             "title": None,
             "authors": None,
@@ -167,7 +682,7 @@ class PDFExtractor:
         }
         
         try:
-            with fitz.open(pdf_path) as doc:
+            with _borrow_document(pdf_path, doc) as doc:
                 # Try PDF metadata first
                 if doc.metadata:
                     if doc.metadata.get("title") and len(doc.metadata.get("title", "").strip()) > 5:
@@ -175,121 +690,61 @@ class PDFExtractor:
                     if doc.metadata.get("author") and len(doc.metadata.get("author", "").strip()) > 3:
                         result["authors"] = doc.metadata["author"].strip()
                 
+                # Title and authors from the info dict are enough unless a DOI is wanted
+                if result["title"] and result["authors"] and not include_doi:
+                    return result
+                
                 # If no metadata, try extracting from first page
+                first_page_text = None
                 if not result["title"] and len(doc) > 0:
                     first_page_text = doc[0].get_text()
                     
                     # Extract title (usually first large text block)
                     if first_page_text:
-                        lines = [line.strip() for line in first_page_text.split('\n') if line.strip()]
-                        if lines:
-                            # Title is typically the first substantial line after headers
-                            title_candidates = []
-                            skip_keywords = [
-                                'university', 'institute', 'department', 'faculty',
-                                'college', 'school', 'center', 'centre', 'laboratory', 'email',
-                                '@', 'www.', 'http', '.edu', '.com', '.org', '.ac.uk',
-                                'short papers', 'conference', 'proceedings', 
-                                'volume', 'issue', 'pp.', 'pages', 'page ',
-                                'ieee', 'acm', 'springer', 'elsevier',
-                                'transactions', 'journal of', 'letters', 'practice',
-                                'copyright', '©', 'published', 'received',
-                                'contents lists', 'sciencedirect', 'available at',
-                                'journal homepage', 'preprint', 'submitted'
-                            ]
+                        # Only the first 20 non-empty lines (plus one for a
+                        # continuation) are considered; don't strip the whole page
+                        stripped = (line.strip() for line in first_page_text.split('\n'))
+                        lines = list(islice(filter(None, stripped), 21))
+                        
+                        # Title is typically the first substantial line after headers
+                        i = next((i for i, line in enumerate(lines[:20]) if _is_title_line(line)), None)
+                        if i is not None:
+                            title = lines[i]
                             
-                            for i, line in enumerate(lines[:20]):  # Check first 20 lines
-                                # Skip very short lines or very long lines (likely not titles)
-                                if len(line) < 15 or len(line) > 150:
-                                    continue
-                                    
-                                # Skip pure numbers or page numbers
-                                if re.match(r'^\d+\s*$', line):
-                                    continue
-                                
-                                # Skip lines that look like journal citations (e.g., "Journal Name 80 (2018) 83-93")
-                                if re.search(r'\d+\s*\(\d{4}\)\s*\d+[-–]\d+', line):
-                                    continue
-                                    
-                                # Skip lines with journal/conference markers
-                                if any(marker in line.lower() for marker in skip_keywords):
-                                    continue
+                            # Check if next line continues the title
+                            if i + 1 < len(lines):
+                                next_line = lines[i + 1]
+                                # If next line looks like a continuation (reasonable length, not author name pattern)
+                                if 5 < len(next_line) < 100:
+                                    # Remove a footnote marker at the end and include the line
+                                    if next_line[-1] in _FOOTNOTE_MARKERS:
+                                        next_line = next_line[:-1].rstrip()
                                     
-                                # Skip lines with numbers at the start (likely author refs or page numbers)
-                                if re.match(r'^\d+[A-Z]', line):
-                                    continue
-                                    
-                                # Skip lines with lots of commas (likely author lists)
-                                if line.count(',') > 3:
-                                    continue
-                                    
-                                # Skip very short uppercase lines (likely section headers like "Abstract")
-                                if len(line) < 30 and line.isupper():
-                                    continue
-                                
-                                # Skip lines that end with dates (like "OCTOBER 1969")
-                                if re.search(r'\b(january|february|march|april|may|june|july|august|september|october|november|december)\s+\d{4}\b', line, re.IGNORECASE):
-                                    continue
-                                
-                                # Skip lines with special markers like ✩ or * at the end (footnote markers)
-                                if re.search(r'[✩★*†‡§]$', line):
-                                    continue
-                                
-                                # Check if next line continues the title
-                                potential_title = line
-                                if i + 1 < len(lines):
-                                    next_line = lines[i + 1].strip()
-                                    # If next line looks like a continuation (reasonable length, not author name pattern)
-                                    if next_line and 5 < len(next_line) < 100:
-                                        # Check for footnote marker at the end
-                                        has_footnote = re.search(r'[✩★*†‡§]$', next_line)
-                                        if has_footnote:
-                                            # Remove the marker and include the line
-                                            next_line = re.sub(r'[✩★*†‡§]$', '', next_line).strip()
-                                        
-                                        # Not an author line (doesn't have patterns like "NAME, IEEE" or multiple commas)
-                                        if (next_line.count(',') <= 1 and 
-                                            not re.search(r'[A-Z][A-Z\s\.]+,\s*(MEMBER|SENIOR|FELLOW|IEEE|ACM)', next_line, re.IGNORECASE) and
-                                            not any(marker in next_line.lower() for marker in skip_keywords)):
-                                            # Check if it starts with lowercase (definitely continuation) or looks like title text
-                                            if next_line[0].islower() or (next_line[0].isupper() and not next_line.isupper()):
-                                                potential_title += " " + next_line
-                                
-                                # This looks like a potential title
-                                title_candidates.append(potential_title)
-                                if len(title_candidates) >= 1:  # Take first good candidate
-                                    break
+                                    # Starts lowercase (definitely continuation) or looks like title text,
+                                    # and isn't an author line ("NAME, IEEE" or multiple commas);
+                                    # string checks first, the regexes only for lines that pass them
+                                    if (next_line.count(',') <= 1 and
+                                        (next_line[0].islower() or (next_line[0].isupper() and not next_line.isupper())) and
+                                        not _RE_AUTHOR_MEMBERSHIP.search(next_line) and
+                                        not _RE_TITLE_SKIP.search(next_line)):
+                                        title += " " + next_line
                             
-                            if title_candidates:
-                                # Use the first good candidate
-                                result["title"] = title_candidates[0]
+                            result["title"] = title
                 
                 # Extract DOI from first page (regardless of whether title was found)
-                if len(doc) > 0 and not result.get("doi"):
-                    # Always extract first page text for DOI search
-                    doi_page_text = doc[0].get_text()
-                    
-                    if doi_page_text:
-                        # Extract DOI using regex
-                        doi_patterns = [
-                            r'(?:doi:?\s*)(10\.\d{4,}/[^\s]+)',
-                            r'(?:DOI:?\s*)(10\.\d{4,}/[^\s]+)',
-                            r'\b(10\.\d{4,}/[^\s\]<>]+)'
-                        ]
-                        
-                        text_to_search = doi_page_text[:8000]  # Increased from 3000 to capture DOIs near end of page
-                        for pattern in doi_patterns:
-                            match = re.search(pattern, text_to_search, re.IGNORECASE)
-                            if match:
-                                result["doi"] = match.group(1).rstrip('.')
-                                break
-                
+                if include_doi and len(doc) > 0:
+                    # Reuse the first page text if the title search already read it
+                    if first_page_text is None:
+                        first_page_text = doc[0].get_text()
+                    if first_page_text:
+                        result["doi"] = self._extract_doi(first_page_text)
+        
         except Exception as e:
             logger.error(f"Failed to extract basic metadata: {e}")
         
         return result
     
-    def extract_keywords(self, pdf_path: str) -> Optional[List[str]]:
+    def extract_keywords(self, pdf_path: str, doc: Optional[fitz.Document] = None) -> Optional[List[str]]:
         """
         Extract author-provided keywords from PDF.
         
@@ -300,29 +755,18 @@ class PDFExtractor:
         
         Args:
             pdf_path: Path to PDF file
-            
+            doc: Already opened document for pdf_path (see open_document)
+        
         Returns:
             List of keywords if found, None otherwise
         """
         try:
-            with fitz.open(pdf_path) as doc:
+            with _borrow_document(pdf_path, doc) as doc:
                 # Only check first 2 pages for keywords (usually in abstract area)
-                text = ""
-                for page_num in range(min(2, len(doc))):
-                    text += doc[page_num].get_text() + "\n"
-                
-                # Multiple patterns to catch different journal styles
-                keyword_patterns = [
-                    # Standard "Keywords:" followed by comma/semicolon separated list
-                    r"(?:Keywords?|Key\s*words?|KEY\s*WORDS?)[:\s—–-]+([^\n]+?)(?=\n\s*\n|\n[A-Z1-9]\.|\nIntroduction|\n\d+\.\s)",
-                    # Index Terms (IEEE style)
-                    r"(?:Index\s*Terms?)[:\s—–-]+([^\n]+?)(?=\n\s*\n|\n[A-Z1-9]\.|\nIntroduction|\n\d+\.\s)",
-                    # Keywords on next line
-                    r"(?:Keywords?|Key\s*words?|KEY\s*WORDS?|Index\s*Terms?)[:\s]*\n([^\n]+?)(?=\n\s*\n|\n[A-Z1-9]\.)",
-                ]
+                text = "".join(doc[page_num].get_text() + "\n" for page_num in range(min(2, len(doc))))
                 
-                for pattern in keyword_patterns:
-                    match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+                for pattern in _KEYWORD_PATTERNS:
+                    match = pattern.search(text)
                     if match:
                         keywords_str = match.group(1).strip()
                         
@@ -346,7 +790,7 @@ class PDFExtractor:
                         cleaned_keywords = []
                         for kw in keywords:
                             # Remove leading/trailing punctuation and whitespace
-                            kw = re.sub(r'^[\s.,:;•–-]+|[\s.,:;•–-]+$', '', kw)
+                            kw = _RE_KEYWORD_TRIM.sub('', kw)
                             # Skip empty or too short keywords
                             if kw and len(kw) >= 2 and len(kw) <= 100:
                                 # Skip common noise
@@ -358,7 +802,7 @@ class PDFExtractor:
                             return cleaned_keywords
                 
                 return None
-                
+        
         except Exception as e:
             logger.error(f"Failed to extract keywords from PDF: {e}")
             return None
\ No newline at end of file
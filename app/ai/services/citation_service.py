@@ -5,11 +5,14 @@ Analyzes citation relationships, calculates influence metrics,
 and provides citation network insights.
 """
 import logging
-from typing import Dict, List, Optional, Set, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import func, text
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import Float, cast, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from datetime import datetime
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+import numpy as np
 
 from ...database.models import Paper, Citation
 from ..tools.scientific_apis import SemanticScholarTool
@@ -17,6 +20,79 @@ from ...config import settings
 
 logger = logging.getLogger(__name__)
 
+# Rows fetched per round-trip when streaming the whole citation network
+NETWORK_BATCH_SIZE = 10000
+
+# Concurrent Semantic Scholar title lookups in fetch_external_citations_bulk
+EXTERNAL_LOOKUP_WORKERS = 5
+
+# PageRank settings for network centrality
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-6  # L1 change between iterations
+PAGERANK_MAX_ITERATIONS = 100
+
+
+def _pagerank(node_count: int, sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """
+    PageRank of a directed graph by power iteration
+    
+    Args:
+        node_count: Number of nodes (dense indices 0..node_count-1)
+        sources: Edge start indices (citing papers)
+        targets: Edge end indices (cited papers), aligned with sources
+    
+    Returns:
+        Scores summing to 1; nodes without out-edges spread theirs uniformly
+    """
+    out_degree = np.bincount(sources, minlength=node_count)
+    edge_weights = 1.0 / out_degree[sources]
+    dangling = out_degree == 0
+    
+    rank = np.full(node_count, 1.0 / node_count)
+    for _ in range(PAGERANK_MAX_ITERATIONS):
+        # Sparse matrix-vector product: each node's rank flows along its out-edges
+        spread = np.bincount(targets, weights=rank[sources] * edge_weights, minlength=node_count)
+        new_rank = (
+            PAGERANK_DAMPING * (spread + rank[dangling].sum() / node_count)
+            + (1 - PAGERANK_DAMPING) / node_count
+        )
+        converged = np.abs(new_rank - rank).sum() < PAGERANK_TOLERANCE
+        rank = new_rank
+        if converged:
+            break
+    return rank
+
+
+def _connected_components(node_count: int, sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """
+    Connected component labels of an undirected graph
+    
+    Vectorized hooking and pointer jumping: each round hooks the larger root
+    of every edge onto the smaller one, then flattens the label trees until
+    every node points at its root. Rounds repeat until no edge spans two
+    components; every round removes at least one root.
+    
+    Returns:
+        Per node, the smallest node index in its component
+    """
+    labels = np.arange(node_count)
+    while True:
+        source_labels, target_labels = labels[sources], labels[targets]
+        spanning = source_labels != target_labels
+        if not spanning.any():
+            return labels
+        
+        low = np.minimum(source_labels[spanning], target_labels[spanning])
+        high = np.maximum(source_labels[spanning], target_labels[spanning])
+        np.minimum.at(labels, high, low)
+        
+        # Pointer jumping until every label is a root
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
 
 class CitationAnalysisService:
     """Service for analyzing citations and calculating influence metrics"""
@@ -24,6 +100,8 @@ class CitationAnalysisService:
     def __init__(self, db: Session):
         self.db = db
         self.semantic_scholar = SemanticScholarTool()
+        self._norms: Optional[Tuple[int, float, float, float]] = None
+        self._centrality: Optional[Dict[int, float]] = None
     
     def add_citation(
         self,
@@ -42,35 +120,77 @@ class CitationAnalysisService:
         Returns:
             Created Citation object
         """
-        # Check if citation already exists
-        existing = self.db.query(Citation).filter(
-            Citation.citing_paper_id == citing_paper_id,
-            Citation.cited_paper_id == cited_paper_id
-        ).first()
-        
-        if existing:
-            logger.info(f"Citation already exists: {citing_paper_id} -> {cited_paper_id}")
-            return existing
-        
         # Prevent self-citation
         if citing_paper_id == cited_paper_id:
             raise ValueError("Cannot create self-citation")
         
-        # Create citation
-        citation = Citation(
-            citing_paper_id=citing_paper_id,
-            cited_paper_id=cited_paper_id,
-            context=context
-        )
+        # Insert unless the pair already exists (uq_citations_pair); no lookup first
+        citation_id = self.db.execute(
+            pg_insert(Citation).values(
+                citing_paper_id=citing_paper_id,
+                cited_paper_id=cited_paper_id,
+                context=context
+            ).on_conflict_do_nothing(
+                index_elements=[Citation.citing_paper_id, Citation.cited_paper_id]
+            ).returning(Citation.id)
+        ).scalar()
+        
+        if citation_id is None:
+            logger.info(f"Citation already exists: {citing_paper_id} -> {cited_paper_id}")
+            return self.db.query(Citation).filter(
+                Citation.citing_paper_id == citing_paper_id,
+                Citation.cited_paper_id == cited_paper_id
+            ).first()
         
-        self.db.add(citation)
         self.db.commit()
-        self.db.refresh(citation)
+        self._norms = self._centrality = None  # Citation graph changed
         
         logger.info(f"Added citation: Paper {citing_paper_id} cites Paper {cited_paper_id}")
         
         # Trigger will update counts automatically
-        return citation
+        return self.db.get(Citation, citation_id)
+    
+    def bulk_add_citations(
+        self,
+        citations: List[Tuple[int, int, Optional[str]]]
+    ) -> int:
+        """
+        Add many citation relationships in one statement
+        
+        Self-citations and pairs that already exist are skipped.
+        
+        Args:
+            citations: (citing_paper_id, cited_paper_id, context) tuples
+        
+        Returns:
+            Number of citations actually inserted
+        """
+        # First occurrence of each pair wins, as with repeated add_citation calls
+        rows = {}
+        for citing_paper_id, cited_paper_id, context in citations:
+            if citing_paper_id != cited_paper_id:
+                rows.setdefault((citing_paper_id, cited_paper_id), context)
+        
+        if not rows:
+            return 0
+        
+        result = self.db.execute(
+            pg_insert(Citation).values([
+                {
+                    "citing_paper_id": citing_paper_id,
+                    "cited_paper_id": cited_paper_id,
+                    "context": context
+                }
+                for (citing_paper_id, cited_paper_id), context in rows.items()
+            ]).on_conflict_do_nothing(
+                index_elements=[Citation.citing_paper_id, Citation.cited_paper_id]
+            )
+        )
+        self.db.commit()
+        self._norms = self._centrality = None  # Citation graph changed
+        
+        logger.info(f"Added {result.rowcount}/{len(citations)} citations")
+        return result.rowcount
     
     def remove_citation(self, citing_paper_id: int, cited_paper_id: int) -> bool:
         """Remove a citation relationship"""
@@ -82,6 +202,7 @@ class CitationAnalysisService:
         if citation:
             self.db.delete(citation)
             self.db.commit()
+            self._norms = self._centrality = None  # Citation graph changed
             logger.info(f"Removed citation: {citing_paper_id} -> {cited_paper_id}")
             return True
         
@@ -94,33 +215,14 @@ class CitationAnalysisService:
         Returns:
             Dictionary with 'citing' and 'cited' lists
         """
-        paper = self.db.query(Paper).filter(Paper.id == paper_id).first()
-        if not paper:
+        if self.db.query(Paper.id).filter(Paper.id == paper_id).scalar() is None:
             raise ValueError(f"Paper {paper_id} not found")
         
         # Papers that cite this paper
-        citing = []
-        for citation in paper.citations_received:
-            citing.append({
-                "id": citation.citing_paper.id,
-                "title": citation.citing_paper.title,
-                "authors": citation.citing_paper.authors,
-                "year": citation.citing_paper.year,
-                "context": citation.context,
-                "citation_id": citation.id
-            })
+        citing = self._linked_papers(Citation.citing_paper_id, Citation.cited_paper_id, paper_id)
         
         # Papers cited by this paper
-        cited = []
-        for citation in paper.citations_made:
-            cited.append({
-                "id": citation.cited_paper.id,
-                "title": citation.cited_paper.title,
-                "authors": citation.cited_paper.authors,
-                "year": citation.cited_paper.year,
-                "context": citation.context,
-                "citation_id": citation.id
-            })
+        cited = self._linked_papers(Citation.cited_paper_id, Citation.citing_paper_id, paper_id)
         
         return {
             "citing": citing,  # Papers that cite this paper
@@ -129,13 +231,37 @@ class CitationAnalysisService:
             "reference_count": len(cited)
         }
     
-    def fetch_external_citations(self, paper_id: int) -> Dict:
+    def _linked_papers(self, linked_column, own_column, paper_id: int) -> List[Dict]:
+        """
+        Papers on the other end of a paper's citations, one dict per citation
+        
+        Args:
+            linked_column: Citation column holding the papers to list
+            own_column: Citation column matched against paper_id
+            paper_id: Paper whose citations to follow
+        """
+        # Plain column rows from one join: no ORM objects to build or track
+        rows = self.db.query(
+            Paper.id, Paper.title, Paper.authors, Paper.year,
+            Citation.context, Citation.id.label("citation_id")
+        ).join(Citation, linked_column == Paper.id).filter(own_column == paper_id).all()
+        
+        return [row._asdict() for row in rows]
+    
+    def fetch_external_citations(self, paper_id: int, commit: bool = True) -> Dict:
         """
         Fetch citation data from external sources (Semantic Scholar)
         
         Updates external_citation_count for the paper
+        
+        Args:
+            paper_id: Paper to look up
+            commit: Commit the update; batch callers pass False and commit once
         """
-        paper = self.db.query(Paper).filter(Paper.id == paper_id).first()
+        # Only the lookup keys and the columns this updates, not the whole row
+        paper = self.db.query(Paper).options(
+            load_only(Paper.doi, Paper.title, Paper.external_citation_count, Paper.citations_updated_at)
+        ).filter(Paper.id == paper_id).first()
         if not paper:
             raise ValueError(f"Paper {paper_id} not found")
         
@@ -156,7 +282,8 @@ class CitationAnalysisService:
                     # Update paper
                     paper.external_citation_count = citation_data["external_citations"]
                     paper.citations_updated_at = datetime.utcnow()
-                    self.db.commit()
+                    if commit:
+                        self.db.commit()
                     
                     logger.info(
                         f"Updated external citations for paper {paper_id}: "
@@ -176,7 +303,8 @@ class CitationAnalysisService:
                 # Update paper
                 paper.external_citation_count = citation_data["external_citations"]
                 paper.citations_updated_at = datetime.utcnow()
-                self.db.commit()
+                if commit:
+                    self.db.commit()
                 
                 logger.info(
                     f"Updated external citations for paper {paper_id}: "
@@ -187,7 +315,65 @@ class CitationAnalysisService:
         
         return citation_data
     
-    def calculate_influence_score(self, paper_id: int) -> float:
+    def fetch_external_citations_bulk(self, paper_ids: List[int]) -> Dict[int, Dict]:
+        """
+        Fetch external citation counts for many papers at once
+        
+        DOIs go to Semantic Scholar's batch endpoint (one request per 500
+        papers); papers without a DOI or a DOI match fall back to title
+        matching, EXTERNAL_LOOKUP_WORKERS requests at a time. All updates
+        are committed together.
+        
+        Returns:
+            Per found paper id, the same dict fetch_external_citations returns
+        """
+        papers = self.db.query(Paper).options(
+            load_only(Paper.doi, Paper.title, Paper.external_citation_count, Paper.citations_updated_at)
+        ).filter(Paper.id.in_(paper_ids)).all()
+        
+        matches = {}
+        
+        # Try DOI first
+        with_doi = [p for p in papers if p.doi]
+        if with_doi:
+            results = self.semantic_scholar.get_papers_by_dois([p.doi for p in with_doi])
+            for paper, result in zip(with_doi, results):
+                if result:
+                    matches[paper.id] = (result, "Semantic Scholar (DOI)")
+        
+        # Try title match; the lookups are network-bound, so overlap them
+        remaining = [p for p in papers if p.id not in matches]
+        if remaining:
+            with ThreadPoolExecutor(max_workers=EXTERNAL_LOOKUP_WORKERS) as pool:
+                results = pool.map(self.semantic_scholar.search_by_title_match, [p.title for p in remaining])
+                for paper, result in zip(remaining, results):
+                    if result:
+                        matches[paper.id] = (result, "Semantic Scholar (Title)")
+        
+        citation_data = {}
+        now = datetime.utcnow()
+        for paper in papers:
+            data = {"external_citations": 0, "references": [], "source": None}
+            if paper.id in matches:
+                result, source = matches[paper.id]
+                data["external_citations"] = result.get("citationCount", 0)
+                data["source"] = source
+                
+                paper.external_citation_count = data["external_citations"]
+                paper.citations_updated_at = now
+            citation_data[paper.id] = data
+        
+        self.db.commit()
+        
+        logger.info(f"Updated external citations for {len(matches)}/{len(paper_ids)} papers")
+        return citation_data
+    
+    def calculate_influence_score(
+        self,
+        paper_id: int,
+        norms: Optional[Tuple[int, float, float, float]] = None,
+        commit: bool = True
+    ) -> float:
         """
         Calculate influence score for a paper based on citation network
         
@@ -196,42 +382,46 @@ class CitationAnalysisService:
         - Citation velocity (20%)
         - H-index contribution (20%)
         - Network centrality (20%)
+        
+        Args:
+            paper_id: Paper to score
+            norms: Library-wide normalization values from _get_norms();
+                fetched (and cached on this service) when omitted
+            commit: Commit the update; batch callers pass False and commit once
         """
-        paper = self.db.query(Paper).filter(Paper.id == paper_id).first()
+        # Only the inputs and the columns this updates, not the whole row
+        paper = self.db.query(Paper).options(
+            load_only(
+                Paper.year, Paper.citation_count, Paper.h_index,
+                Paper.influence_score, Paper.citations_updated_at
+            )
+        ).filter(Paper.id == paper_id).first()
         if not paper:
             raise ValueError(f"Paper {paper_id} not found")
         
-        # Get total papers in library for normalization
-        total_papers = self.db.query(func.count(Paper.id)).scalar()
+        # Library size and maxima for normalization
+        total_papers, max_citations, max_velocity, max_h_index = norms or self._get_norms()
         
         if total_papers <= 1:
             return 0.0
         
         # 1. Direct citation score (normalized)
-        max_citations = self.db.query(func.max(Paper.citation_count)).scalar() or 1
-        max_citations = float(max_citations)
-        citation_score = (paper.citation_count / max_citations) if max_citations > 0 else 0.0
+        citation_score = paper.citation_count / max_citations
         
         # 2. Citation velocity (citations per year since publication)
         current_year = datetime.utcnow().year
         if paper.year and current_year > paper.year:
             years_since_pub = current_year - paper.year
             velocity = paper.citation_count / max(years_since_pub, 1)
-            max_velocity = self.db.query(
-                func.max(Paper.citation_count / func.greatest(current_year - Paper.year, 1))
-            ).scalar() or 1
-            max_velocity = float(max_velocity)
-            velocity_score = velocity / max_velocity if max_velocity > 0 else 0.0
+            velocity_score = velocity / max_velocity
         else:
             velocity_score = 0.0
         
         # 3. H-index contribution
         h_index = self._calculate_h_index(paper_id)
-        max_h_index = self.db.query(func.max(Paper.h_index)).scalar() or 1
-        max_h_index = float(max_h_index)
-        h_index_score = h_index / max_h_index if max_h_index > 0 else 0.0
+        h_index_score = h_index / max_h_index
         
-        # 4. Network centrality (papers that cite influential papers)
+        # 4. Network centrality (PageRank over the library's citation graph)
         centrality_score = self._calculate_centrality(paper_id)
         
         # Weighted combination
@@ -246,116 +436,264 @@ class CitationAnalysisService:
         paper.influence_score = influence
         paper.h_index = h_index
         paper.citations_updated_at = datetime.utcnow()
-        self.db.commit()
+        if commit:
+            self.db.commit()
+        
+        # Keep the cached maximum in line with the h-index just stored
+        if self._norms and h_index > self._norms[3]:
+            self._norms = self._norms[:3] + (float(h_index),)
         
         logger.info(f"Calculated influence score for paper {paper_id}: {influence:.4f}")
         return influence
     
+    def _get_norms(self) -> Tuple[int, float, float, float]:
+        """
+        Library-wide values influence scores are normalized by
+        
+        Returns:
+            (total papers, max citation count, max citation velocity, max h-index),
+            with zero maxima replaced by 1; one aggregate query, cached until
+            a citation is added or removed through this service
+        """
+        if self._norms is None:
+            current_year = datetime.utcnow().year
+            total_papers, max_citations, max_velocity, max_h_index = self.db.query(
+                func.count(Paper.id),
+                func.max(Paper.citation_count),
+                func.max(cast(Paper.citation_count, Float) / func.greatest(current_year - Paper.year, 1)),
+                func.max(Paper.h_index)
+            ).one()
+            self._norms = (
+                total_papers,
+                float(max_citations or 1),
+                float(max_velocity or 1),
+                float(max_h_index or 1)
+            )
+        return self._norms
+    
     def _calculate_h_index(self, paper_id: int) -> int:
         """Calculate h-index for a paper based on its citations"""
         # Get citation counts for all papers this paper cites
-        citations = self.db.query(
-            Paper.citation_count
-        ).join(
-            Citation, Citation.cited_paper_id == Paper.id
-        ).filter(
-            Citation.citing_paper_id == paper_id
-        ).order_by(
-            Paper.citation_count.desc()
-        ).all()
+        cited_count = func.coalesce(Paper.citation_count, 0)
+        counts = self.db.execute(
+            select(cited_count).join(
+                Citation, Citation.cited_paper_id == Paper.id
+            ).where(
+                Citation.citing_paper_id == paper_id
+            ).order_by(
+                cited_count.desc()
+            )
+        ).scalars().all()
+        
+        # H-index: largest number h such that h papers have at least h citations;
+        # with counts sorted descending that's how many satisfy count >= rank
+        counts = np.asarray(counts, dtype=np.int64)
+        return int(np.count_nonzero(counts >= np.arange(1, counts.size + 1)))
+    
+    def _calculate_centrality(self, paper_id: int) -> float:
+        """Calculate network centrality score (cached for the whole library)"""
+        if self._centrality is None:
+            ids = np.array(
+                self.db.execute(select(Paper.id).order_by(Paper.id)).scalars().all(),
+                dtype=np.int64
+            )
+            self._centrality = dict(zip(ids.tolist(), self._compute_centrality(ids).tolist()))
+        return self._centrality.get(paper_id, 0.0)
+    
+    def _load_edges(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Every citation as aligned (citing ids, cited ids) int64 arrays
         
-        if not citations:
-            return 0
+        Rows are streamed in batches of NETWORK_BATCH_SIZE straight into one
+        array, 16 bytes per edge, without a list of row objects for the
+        whole table in between.
+        """
+        edges = np.fromiter(
+            chain.from_iterable(
+                self.db.query(Citation.citing_paper_id, Citation.cited_paper_id).yield_per(NETWORK_BATCH_SIZE)
+            ),
+            dtype=np.int64
+        ).reshape(-1, 2)
+        return edges[:, 0], edges[:, 1]
+    
+    def _compute_centrality(self, ids: np.ndarray) -> np.ndarray:
+        """
+        PageRank centrality of every paper, aligned with the sorted paper ``ids``
         
-        # H-index: largest number h such that h papers have at least h citations
-        citation_counts = [c[0] for c in citations]
-        h = 0
-        for i, count in enumerate(citation_counts, 1):
-            if count >= i:
-                h = i
-            else:
-                break
+        Scaled so the most central paper scores 1.0, like the other
+        influence components.
+        """
+        if len(ids) == 0:
+            return np.zeros(0)
+        
+        citing_ids, cited_ids = self._load_edges()
+        if len(citing_ids) == 0:
+            return np.zeros(len(ids))
         
-        return h
+        rank = _pagerank(len(ids), np.searchsorted(ids, citing_ids), np.searchsorted(ids, cited_ids))
+        return rank / rank.max()
     
-    def _calculate_centrality(self, paper_id: int) -> float:
-        """Calculate network centrality score"""
-        # Papers that cite this paper
-        citing_papers = self.db.query(Paper.id, Paper.citation_count).join(
-            Citation, Citation.citing_paper_id == Paper.id
-        ).filter(
-            Citation.cited_paper_id == paper_id
-        ).all()
+    def recalculate_all_metrics(self, force: bool = False) -> Dict[str, int]:
+        """
+        Recalculate all citation metrics for all papers
         
-        if not citing_papers:
-            return 0.0
+        Same scores as calculate_influence_score, computed for the whole
+        library at once: three queries, array arithmetic, one bulk UPDATE
+        and a single commit.
         
-        # Weighted by citation count of citing papers
-        total_influence = sum(count for _, count in citing_papers)
-        max_possible = len(citing_papers) * (
-            self.db.query(func.max(Paper.citation_count)).scalar() or 1
+        Papers are flagged metrics_stale by a trigger on the citations table.
+        Scores are normalized library-wide, so any stale paper means a full
+        recompute, but only stale papers and papers whose scores moved are
+        written back. With nothing stale the call returns immediately.
+        
+        Args:
+            force: Recalculate even if no paper is flagged stale
+            
+        Returns:
+            Dict with total paper count and number of papers updated
+        """
+        if not force:
+            has_stale = self.db.query(Paper.id).filter(Paper.metrics_stale.isnot(False)).first()
+            if has_stale is None:
+                total = self.db.query(func.count(Paper.id)).scalar()
+                logger.info(f"Citation metrics up to date for {total} papers, skipping")
+                return {"total": total, "updated": 0}
+        
+        rows = self.db.query(
+            Paper.id, Paper.year, func.coalesce(Paper.citation_count, 0),
+            Paper.h_index, Paper.influence_score, Paper.metrics_stale
+        ).order_by(Paper.id).all()
+        
+        total = len(rows)
+        if total <= 1:
+            # Nothing to normalize against; calculate_influence_score returns 0.0
+            self.db.query(Paper).update({Paper.metrics_stale: False}, synchronize_session=False)
+            self.db.commit()
+            return {"total": total, "updated": total}
+        
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        has_year = np.array([row[1] is not None for row in rows])
+        years = np.array([row[1] or 0 for row in rows], dtype=np.int64)
+        counts = np.array([row[2] for row in rows], dtype=np.float64)
+        old_h_index = np.array([row[3] or 0 for row in rows], dtype=np.int64)
+        old_influence = np.array([row[4] or 0.0 for row in rows], dtype=np.float64)
+        stale = np.array([row[5] is not False for row in rows])
+        
+        # 1. Direct citation score (normalized)
+        max_citations = counts.max() or 1.0
+        citation_score = counts / max_citations
+        
+        # 2. Citation velocity (citations per year since publication)
+        current_year = datetime.utcnow().year
+        velocity = counts / np.maximum(current_year - years, 1)
+        max_velocity = velocity[has_year].max(initial=0.0) or 1.0
+        velocity_score = np.where(has_year & (current_year > years), velocity / max_velocity, 0.0)
+        
+        # 3. H-index contribution
+        h_index = self._calculate_all_h_indices(ids)
+        max_h_index = h_index.max() or 1
+        h_index_score = h_index / max_h_index
+        
+        # 4. Network centrality (PageRank over the library's citation graph)
+        centrality_score = self._compute_centrality(ids)
+        
+        # Weighted combination
+        influence = (
+            0.4 * citation_score +
+            0.2 * velocity_score +
+            0.2 * h_index_score +
+            0.2 * centrality_score
         )
         
-        return total_influence / max_possible if max_possible > 0 else 0.0
-    
-    def recalculate_all_metrics(self) -> Dict[str, int]:
-        """Recalculate all citation metrics for all papers"""
-        papers = self.db.query(Paper).all()
+        # Only write rows that were flagged or whose scores moved
+        changed = stale | (h_index != old_h_index) | ~np.isclose(influence, old_influence, rtol=0.0, atol=1e-9)
         
-        updated_count = 0
-        for paper in papers:
-            try:
-                self.calculate_influence_score(paper.id)
-                updated_count += 1
-            except Exception as e:
-                logger.error(f"Failed to calculate metrics for paper {paper.id}: {e}")
+        now = datetime.utcnow()
+        try:
+            if changed.any():
+                self.db.execute(update(Paper), [
+                    {
+                        "id": int(paper_id),
+                        "influence_score": float(score),
+                        "h_index": int(h),
+                        "citations_updated_at": now,
+                        "metrics_stale": False
+                    }
+                    for paper_id, score, h in zip(ids[changed], influence[changed], h_index[changed])
+                ])
+                self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Failed to store recalculated metrics: {e}")
+            return {"total": total, "updated": 0}
         
-        logger.info(f"Recalculated metrics for {updated_count}/{len(papers)} papers")
+        updated = int(changed.sum())
+        logger.info(f"Recalculated metrics for {total} papers, {updated} updated")
         return {
-            "total": len(papers),
-            "updated": updated_count
+            "total": total,
+            "updated": updated
         }
     
+    def _calculate_all_h_indices(self, ids: np.ndarray) -> np.ndarray:
+        """
+        H-index of every paper, aligned with the sorted paper ``ids``
+        
+        One query lists the citation counts of each paper's references,
+        sorted descending per citing paper.
+        """
+        h_index = np.zeros(len(ids), dtype=np.int64)
+        
+        cited_count = func.coalesce(Paper.citation_count, 0)
+        references = self.db.query(
+            Citation.citing_paper_id, cited_count
+        ).join(
+            Paper, Citation.cited_paper_id == Paper.id
+        ).order_by(
+            Citation.citing_paper_id, cited_count.desc()
+        ).all()
+        
+        if not references:
+            return h_index
+        
+        owners, reference_counts = (np.array(column) for column in zip(*references))
+        
+        # 1-based rank of each reference within its citing paper
+        starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+        sizes = np.diff(np.r_[starts, len(owners)])
+        ranks = np.arange(len(owners)) - np.repeat(starts, sizes) + 1
+        
+        # Counts are descending, so "count >= rank" holds for exactly the first h references
+        h_per_owner = np.bincount(np.repeat(np.arange(len(starts)), sizes), weights=reference_counts >= ranks)
+        h_index[np.searchsorted(ids, owners[starts])] = h_per_owner.astype(np.int64)
+        return h_index
+    
     def get_most_influential_papers(self, limit: int = 10) -> List[Dict]:
         """Get most influential papers by influence score"""
-        papers = self.db.query(Paper).filter(
+        columns = (
+            Paper.id, Paper.title, Paper.authors, Paper.year, Paper.citation_count,
+            Paper.external_citation_count, Paper.h_index, Paper.influence_score
+        )
+        # Backward scan of the partial ix_papers_influence_positive: no sort
+        rows = self.db.query(*columns).filter(
             Paper.influence_score > 0
         ).order_by(
             Paper.influence_score.desc()
         ).limit(limit).all()
         
-        return [
-            {
-                "id": p.id,
-                "title": p.title,
-                "authors": p.authors,
-                "year": p.year,
-                "citation_count": p.citation_count,
-                "external_citation_count": p.external_citation_count,
-                "h_index": p.h_index,
-                "influence_score": p.influence_score
-            }
-            for p in papers
-        ]
+        return [row._asdict() for row in rows]
     
     def get_most_cited_papers(self, limit: int = 10) -> List[Dict]:
         """Get most cited papers in library"""
-        papers = self.db.query(Paper).order_by(
+        columns = (
+            Paper.id, Paper.title, Paper.authors, Paper.year, Paper.citation_count,
+            Paper.external_citation_count, Paper.reference_count
+        )
+        # Backward scan of ix_papers_citation_count: no sort, `limit` heap fetches
+        rows = self.db.query(*columns).order_by(
             Paper.citation_count.desc()
         ).limit(limit).all()
         
-        return [
-            {
-                "id": p.id,
-                "title": p.title,
-                "authors": p.authors,
-                "year": p.year,
-                "citation_count": p.citation_count,
-                "external_citation_count": p.external_citation_count,
-                "reference_count": p.reference_count
-            }
-            for p in papers
-        ]
+        return [row._asdict() for row in rows]
     
     def get_citation_network(self) -> Dict:
         """
@@ -365,42 +703,64 @@ class CitationAnalysisService:
             nodes: List of papers
             edges: List of citations (citing -> cited)
         """
-        # Get all papers with citations
-        papers = self.db.query(Paper).filter(
-            (Paper.citation_count > 0) | (Paper.reference_count > 0)
-        ).all()
-        
-        # Get all citations
-        citations = self.db.query(Citation).all()
+        network = {"nodes": [], "edges": []}
+        for record in self.iter_citation_network():
+            kind = record.pop("type")
+            if kind == "stats":
+                network["stats"] = record
+            else:
+                network[f"{kind}s"].append(record)
+        return network
+    
+    def iter_citation_network(self) -> Iterator[Dict]:
+        """
+        Stream the citation network one record at a time
         
-        nodes = [
-            {
-                "id": p.id,
-                "title": p.title,
-                "year": p.year,
-                "citation_count": p.citation_count,
-                "influence_score": p.influence_score
+        Yields every node (``"type": "node"``), then every edge
+        (``"type": "edge"``), then a final ``"type": "stats"`` record, with the
+        same fields get_citation_network returns. Rows are read in batches
+        of NETWORK_BATCH_SIZE, so memory stays flat for large libraries.
+        """
+        # Get all papers with citations, as plain column tuples streamed in
+        # batches: no ORM objects or identity map entries for the whole library
+        papers = self.db.query(
+            Paper.id, Paper.title, Paper.year, Paper.citation_count, Paper.influence_score
+        ).filter(
+            (Paper.citation_count > 0) | (Paper.reference_count > 0)
+        ).yield_per(NETWORK_BATCH_SIZE)
+        
+        total_papers = 0
+        for paper_id, title, year, citation_count, influence_score in papers:
+            total_papers += 1
+            yield {
+                "type": "node",
+                "id": paper_id,
+                "title": title,
+                "year": year,
+                "citation_count": citation_count,
+                "influence_score": influence_score
             }
-            for p in papers
-        ]
         
-        edges = [
-            {
-                "source": c.citing_paper_id,
-                "target": c.cited_paper_id,
-                "id": c.id
+        # Get all citations
+        citations = self.db.query(
+            Citation.citing_paper_id, Citation.cited_paper_id, Citation.id
+        ).yield_per(NETWORK_BATCH_SIZE)
+        
+        total_citations = 0
+        for citing_paper_id, cited_paper_id, citation_id in citations:
+            total_citations += 1
+            yield {
+                "type": "edge",
+                "source": citing_paper_id,
+                "target": cited_paper_id,
+                "id": citation_id
             }
-            for c in citations
-        ]
         
-        return {
-            "nodes": nodes,
-            "edges": edges,
-            "stats": {
-                "total_papers": len(nodes),
-                "total_citations": len(edges),
-                "avg_citations_per_paper": len(edges) / len(nodes) if nodes else 0
-            }
+        yield {
+            "type": "stats",
+            "total_papers": total_papers,
+            "total_citations": total_citations,
+            "avg_citations_per_paper": total_citations / total_papers if total_papers else 0
         }
     
     def detect_citation_clusters(self) -> List[Dict]:
@@ -410,59 +770,63 @@ class CitationAnalysisService:
         Uses simple connected components algorithm
         """
         # Get all papers with citations
-        papers = self.db.query(Paper).filter(
+        paper_ids = [row[0] for row in self.db.query(Paper.id).filter(
             (Paper.citation_count > 0) | (Paper.reference_count > 0)
-        ).all()
+        ).all()]
         
-        if not papers:
+        if not paper_ids:
             return []
         
-        # Build adjacency list
-        graph = defaultdict(set)
-        for citation in self.db.query(Citation).all():
-            graph[citation.citing_paper_id].add(citation.cited_paper_id)
-            graph[citation.cited_paper_id].add(citation.citing_paper_id)
+        # Connected components over dense indices (papers plus any citation
+        # endpoints), computed with array operations
+        citing_ids, cited_ids = self._load_edges()
+        node_ids = np.unique(np.concatenate([np.array(paper_ids, dtype=np.int64), citing_ids, cited_ids]))
+        labels = _connected_components(
+            len(node_ids), np.searchsorted(node_ids, citing_ids), np.searchsorted(node_ids, cited_ids)
+        )
         
-        # Find connected components using DFS
-        visited = set()
-        clusters = []
+        # Members of each component, grouped by one sort
+        order = np.argsort(labels, kind="stable")
+        boundaries = np.flatnonzero(np.diff(labels[order])) + 1
+        members = {
+            int(labels[group[0]]): node_ids[group].tolist()
+            for group in np.split(order, boundaries)
+        }
         
-        def dfs(node, cluster):
-            visited.add(node)
-            cluster.add(node)
-            for neighbor in graph.get(node, []):
-                if neighbor not in visited:
-                    dfs(neighbor, cluster)
+        # Components in order of their first paper; only clusters with 2+ papers
+        clusters = []
+        seen = set()
+        for label in labels[np.searchsorted(node_ids, paper_ids)].tolist():
+            if label not in seen:
+                seen.add(label)
+                if len(members[label]) > 1:
+                    clusters.append(members[label])
+        
+        if not clusters:
+            return []
         
-        for paper in papers:
-            if paper.id not in visited:
-                cluster = set()
-                dfs(paper.id, cluster)
-                if len(cluster) > 1:  # Only include clusters with 2+ papers
-                    clusters.append(cluster)
+        # Details for every clustered paper in one query
+        details = {
+            p.id: {
+                "id": p.id,
+                "title": p.title,
+                "authors": p.authors,
+                "year": p.year
+            }
+            for p in self.db.query(Paper.id, Paper.title, Paper.authors, Paper.year).filter(
+                Paper.id.in_([paper_id for cluster in clusters for paper_id in cluster])
+            )
+        }
         
         # Convert to detailed format
-        result = []
-        for i, cluster in enumerate(clusters, 1):
-            cluster_papers = self.db.query(Paper).filter(
-                Paper.id.in_(cluster)
-            ).all()
-            
-            result.append({
+        return [
+            {
                 "cluster_id": i,
                 "size": len(cluster),
-                "papers": [
-                    {
-                        "id": p.id,
-                        "title": p.title,
-                        "authors": p.authors,
-                        "year": p.year
-                    }
-                    for p in cluster_papers
-                ]
-            })
-        
-        return result
+                "papers": [details[paper_id] for paper_id in cluster if paper_id in details]
+            }
+            for i, cluster in enumerate(clusters, 1)
+        ]
 
 
 def add_citation_link(
@@ -4,10 +4,19 @@ Discovery Service - Search external scientific databases
 Aggregates results from multiple sources (Semantic Scholar, arXiv, CrossRef, OpenAlex)
 and provides unified discovery functionality.
 """
+import hashlib
+import html
+import json
 import logging
-from typing import Dict, List, Optional, Set
+import re
+import time
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Callable, Dict, Iterator, List, Optional, Set
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from ..tools.scientific_apis import (
     SemanticScholarTool,
@@ -15,15 +24,108 @@ from ..tools.scientific_apis import (
     CrossRefTool,
     OpenAlexTool
 )
+from ..utils import SingleFlight
 from ...database.models import Paper
 from ...config import settings
 
+try:
+    from rapidfuzz import fuzz
+except ImportError:
+    # Optional: C++ title similarity for deduplication (falls back to difflib)
+    fuzz = None
+
 logger = logging.getLogger(__name__)
 
+# How long cached raw search results count as fresh, per source (seconds).
+# arXiv listings rarely change; citation counts on the others drift.
+SEARCH_CACHE_TTL = {
+    "semantic_scholar": 6 * 3600,
+    "arxiv": 24 * 3600,
+    "crossref": 12 * 3600,
+    "openalex": 12 * 3600
+}
+# Entries are kept this long as a fallback for when a source fails
+SEARCH_CACHE_STALE_TTL = 7 * 24 * 3600
+
+# Near-duplicate titles across sources: token-set Jaccard or SequenceMatcher
+# ratio on normalized titles, compared only within +/-1 publication year
+TITLE_JACCARD_THRESHOLD = 0.9
+TITLE_SIMILARITY_THRESHOLD = 0.93
+
+_DOI_PREFIXES = ("https://doi.org/", "http://doi.org/", "https://dx.doi.org/", "http://dx.doi.org/", "doi:")
+_RE_HTML_TAG = re.compile(r'<[^>]+>')
+_RE_PUNCTUATION = re.compile(r'[^\w\s]')
+_RE_WHITESPACE = re.compile(r'\s+')
+
+# Reciprocal Rank Fusion constant: damps the weight of top positions
+RRF_K = 60
+
+_search_cache_client = None
+
+# Identical searches already in flight share one upstream request
+_search_flights = SingleFlight()
+
+
+def _get_search_cache():
+    """Redis client for the search result cache, or None if Redis is unavailable."""
+    global _search_cache_client
+    if _search_cache_client is None:
+        try:
+            import redis
+            _search_cache_client = redis.Redis.from_url(
+                settings.redis_url, socket_timeout=0.5, socket_connect_timeout=0.5
+            )
+        except Exception as e:
+            logger.debug(f"Search cache unavailable: {e}")
+            return None
+    return _search_cache_client
+
+
+def _normalize_doi(doi: str) -> str:
+    """Lowercase DOI without resolver URL or "doi:" prefix."""
+    doi = doi.strip().lower()
+    for prefix in _DOI_PREFIXES:
+        if doi.startswith(prefix):
+            return doi[len(prefix):].strip()
+    return doi
+
+
+def _normalize_title(title: str) -> str:
+    """Lowercase title without markup, entities, accents, punctuation or extra whitespace."""
+    # NFKD splits accented letters; the combining marks go with the punctuation
+    title = unicodedata.normalize('NFKD', _RE_HTML_TAG.sub(' ', html.unescape(title))).lower()
+    title = _RE_PUNCTUATION.sub('', title)
+    return _RE_WHITESPACE.sub(' ', title).strip()
+
+
+def _titles_similar(title1: str, title2: str, tokens1: frozenset, tokens2: frozenset) -> bool:
+    """Whether two normalized titles are near-duplicates."""
+    if len(tokens1 & tokens2) >= TITLE_JACCARD_THRESHOLD * len(tokens1 | tokens2):
+        return True
+    if fuzz is not None:
+        # Indel similarity with early exit below the cutoff; never lower
+        # than difflib's ratio for the same pair
+        return fuzz.ratio(title1, title2, score_cutoff=TITLE_SIMILARITY_THRESHOLD * 100) > 0
+    # Cheap upper bounds first; ratio() itself is quadratic
+    matcher = SequenceMatcher(None, title1, title2)
+    return (
+        matcher.real_quick_ratio() >= TITLE_SIMILARITY_THRESHOLD and
+        matcher.quick_ratio() >= TITLE_SIMILARITY_THRESHOLD and
+        matcher.ratio() >= TITLE_SIMILARITY_THRESHOLD
+    )
+
 
 class DiscoveredPaper:
     """Represents a paper discovered from external sources"""
     
+    # Fields returned by the API, in response order
+    RESPONSE_FIELDS = (
+        "title", "authors", "year", "abstract", "doi", "journal", "url", "source",
+        "relevance_score", "citation_count", "in_library", "library_paper_id"
+    )
+    # No per-instance __dict__: a search builds one object per source result
+    __slots__ = RESPONSE_FIELDS + ("source_ranks", "doi_key", "title_key")
+    
     def __init__(
         self,
         title: str,
@@ -51,23 +153,92 @@ class DiscoveredPaper:
         self.citation_count = citation_count
         self.in_library = in_library
         self.library_paper_id = library_paper_id
+        # Position in each source's result list (1-based), for rank fusion
+        self.source_ranks: Dict[str, int] = {}
+        # Normalized once here rather than on every dedup comparison
+        self.doi_key = _normalize_doi(doi) if doi else None
+        self.title_key = _normalize_title(title) if title else ""
     
     def to_dict(self) -> Dict:
         """Convert to dictionary for API response"""
-        return {
-            "title": self.title,
-            "authors": self.authors,
-            "year": self.year,
-            "abstract": self.abstract,
-            "doi": self.doi,
-            "journal": self.journal,
-            "url": self.url,
-            "source": self.source,
-            "relevance_score": self.relevance_score,
-            "citation_count": self.citation_count,
-            "in_library": self.in_library,
-            "library_paper_id": self.library_paper_id
-        }
+        return {field: getattr(self, field) for field in self.RESPONSE_FIELDS}
+
+
+class _ResultDeduplicator:
+    """
+    Incremental duplicate detection across source results
+    
+    Three tiers, first occurrence wins and absorbs the source ranks (and
+    a missing DOI) of its duplicates: normalized DOI, normalized title, then near-identical
+    titles (see _titles_similar). The fuzzy tier only
+    compares papers published within a year of each other (preprint vs.
+    journal version), or where either year is unknown, and never merges
+    two papers with different DOIs.
+    """
+    
+    def __init__(self):
+        self.seen_dois: Dict[str, DiscoveredPaper] = {}
+        self.seen_titles: Dict[str, DiscoveredPaper] = {}
+        # Kept titles by year for the fuzzy tier: (title, tokens, paper)
+        self.kept_by_year: Dict[Optional[int], List[tuple]] = {}
+    
+    def add(self, paper: DiscoveredPaper) -> bool:
+        """Record a paper; returns False if it was merged into an earlier one"""
+        # Check DOI first (most reliable)
+        doi_normalized = paper.doi_key
+        if doi_normalized and doi_normalized in self.seen_dois:
+            self._merge(self.seen_dois[doi_normalized], paper)
+            return False
+        
+        title_normalized = paper.title_key
+        if title_normalized:
+            if title_normalized in self.seen_titles:
+                self._merge_recorded(self.seen_titles[title_normalized], paper)
+                return False
+            
+            tokens = frozenset(title_normalized.split())
+            if paper.year is None:
+                candidates = [kept for block in self.kept_by_year.values() for kept in block]
+            else:
+                candidates = [
+                    kept
+                    for year in (paper.year - 1, paper.year, paper.year + 1, None)
+                    for kept in self.kept_by_year.get(year, ())
+                ]
+            duplicate_of = next((
+                kept_paper
+                for kept_title, kept_tokens, kept_paper in candidates
+                if not (doi_normalized and kept_paper.doi_key and kept_paper.doi_key != doi_normalized) and
+                _titles_similar(title_normalized, kept_title, tokens, kept_tokens)
+            ), None)
+            if duplicate_of is not None:
+                self._merge_recorded(duplicate_of, paper)
+                return False
+            
+            self.seen_titles[title_normalized] = paper
+            self.kept_by_year.setdefault(paper.year, []).append((title_normalized, tokens, paper))
+        
+        # Only kept papers are recorded, so later duplicates merge into them
+        if doi_normalized:
+            self.seen_dois[doi_normalized] = paper
+        return True
+    
+    def _merge_recorded(self, kept: DiscoveredPaper, duplicate: DiscoveredPaper):
+        """Merge a title duplicate, pointing its DOI at the kept paper"""
+        self._merge(kept, duplicate)
+        if duplicate.doi_key:
+            self.seen_dois.setdefault(duplicate.doi_key, kept)
+    
+    @staticmethod
+    def _merge(kept: DiscoveredPaper, duplicate: DiscoveredPaper):
+        """Fold a duplicate's source ranks (and missing citation count and DOI) into the kept paper"""
+        for source, rank in duplicate.source_ranks.items():
+            kept.source_ranks[source] = min(rank, kept.source_ranks.get(source, rank))
+        if kept.citation_count is None:
+            kept.citation_count = duplicate.citation_count
+        if not kept.doi and duplicate.doi:
+            kept.doi = duplicate.doi
+            kept.doi_key = duplicate.doi_key
 
 
 class DiscoveryService:
@@ -95,58 +266,195 @@ class DiscoveryService:
             query: Search query (title, keywords, etc.)
             sources: List of sources to search (default: all)
             limit: Maximum results per source
-            min_year: Filter papers after this year
-            max_year: Filter papers before this year
+            min_year: Only papers published in or after this year
+            max_year: Only papers published in or before this year
         
         Returns:
             List of DiscoveredPaper objects, ranked by relevance
         """
-        if sources is None:
-            sources = ["semantic_scholar", "arxiv", "crossref", "openalex"]
+        searches = self._source_searches(sources)
         
+        # Search each source concurrently; the searches are independent HTTP
+        # round-trips and each returns [] on failure. Results keep source order.
+        # The year range is applied by each source's API, so every returned
+        # paper counts towards the per-source limit.
         results = []
+        if searches:
+            with ThreadPoolExecutor(max_workers=len(searches)) as pool:
+                for papers in pool.map(lambda search: search(query, limit, min_year, max_year), searches):
+                    for rank, paper in enumerate(papers, 1):
+                        paper.source_ranks[paper.source] = rank
+                        results.append(paper)
         
-        # Search each source
-        if "semantic_scholar" in sources:
-            results.extend(self._search_semantic_scholar(query, limit))
+        # Deduplicate by DOI and title, merging each paper's source ranks
+        results = self._deduplicate_results(results)
+        
+        # Fuse the per-source rankings
+        results = self._rank_results(results, len(searches))
         
-        if "arxiv" in sources:
-            results.extend(self._search_arxiv(query, limit))
+        # Limit total results; only the returned papers need a library check
+        results = results[:limit * 2]  # Return 2x limit since we combine sources
+        
+        # Check which papers are already in library
+        return self._check_library_status(results)
+    
+    def search_stream(
+        self,
+        query: str,
+        sources: Optional[List[str]] = None,
+        limit: int = 20,
+        min_year: Optional[int] = None,
+        max_year: Optional[int] = None
+    ) -> Iterator[Dict]:
+        """
+        Search external sources, yielding papers as each source responds
         
-        if "crossref" in sources:
-            results.extend(self._search_crossref(query, limit))
+        Takes the same arguments as search(), but the first papers are
+        available after the fastest source instead of the slowest. Yields:
+        - ``{"type": "paper", "index": n, ...}`` for each new unique paper,
+          with library status and a provisional relevance_score from the
+          sources seen so far. Duplicates from later sources are merged
+          into the paper already sent and are not yielded again.
+        - ``{"type": "ranking", "total_results": n, "papers": [...]}`` once
+          every source is done: the final order as ``{"index", "relevance_score"}``
+          entries, truncated like search(). Papers not listed were ranked out.
+        """
+        searches = self._source_searches(sources)
+        deduplicator = _ResultDeduplicator()
+        sent: List[DiscoveredPaper] = []
         
-        if "openalex" in sources:
-            results.extend(self._search_openalex(query, limit))
+        if searches:
+            with ThreadPoolExecutor(max_workers=len(searches)) as pool:
+                futures = [pool.submit(search, query, limit, min_year, max_year) for search in searches]
+                for future in as_completed(futures):
+                    new_papers = []
+                    for rank, paper in enumerate(future.result(), 1):
+                        paper.source_ranks[paper.source] = rank
+                        if deduplicator.add(paper):
+                            new_papers.append(paper)
+                    
+                    # One library query per source batch
+                    new_papers = self._check_library_status(self._rank_results(new_papers, len(searches)))
+                    for paper in new_papers:
+                        yield {"type": "paper", "index": len(sent), **paper.to_dict()}
+                        sent.append(paper)
         
-        # Filter by year if specified
-        if min_year or max_year:
-            results = [
-                r for r in results
-                if (min_year is None or (r.year and r.year >= min_year)) and
-                   (max_year is None or (r.year and r.year <= max_year))
+        index_of = {id(paper): index for index, paper in enumerate(sent)}
+        ranked = self._rank_results(sent[:], len(searches))[:limit * 2]
+        yield {
+            "type": "ranking",
+            "total_results": len(ranked),
+            "papers": [
+                {"index": index_of[id(paper)], "relevance_score": paper.relevance_score}
+                for paper in ranked
             ]
+        }
+    
+    def _source_searches(self, sources: Optional[List[str]]) -> List[Callable[..., List[DiscoveredPaper]]]:
+        """Per-source search methods for the requested sources (default: all)"""
+        if sources is None:
+            sources = ["semantic_scholar", "arxiv", "crossref", "openalex"]
         
-        # Deduplicate by DOI and title
-        results = self._deduplicate_results(results)
+        return [
+            search for source, search in (
+                ("semantic_scholar", self._search_semantic_scholar),
+                ("arxiv", self._search_arxiv),
+                ("crossref", self._search_crossref),
+                ("openalex", self._search_openalex)
+            )
+            if source in sources
+        ]
+    
+    def _cached_search(
+        self,
+        source: str,
+        search: Callable[..., List[Dict]],
+        query: str,
+        limit: int,
+        min_year: Optional[int] = None,
+        max_year: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Raw search results from one source, served from Redis when fresh
         
-        # Check which papers are already in library
-        results = self._check_library_status(results)
+        Non-empty results are cached under (source, normalized query, limit,
+        year range).
+        Concurrent misses for the same key share one upstream request.
+        If the live search raises or comes back empty, an expired entry is
+        returned instead, since the tools report most failures as [].
         
-        # Sort by relevance and citation count
-        results = self._rank_results(results)
+        Args:
+            source: Source id, selects the TTL from SEARCH_CACHE_TTL
+            search: The tool's search_by_title
+            query: Search query
+            limit: Maximum results
+            min_year: Earliest publication year, passed to the source
+            max_year: Latest publication year, passed to the source
+        
+        Returns:
+            List of result dicts as returned by the tool
+        """
+        cache = _get_search_cache()
+        digest = hashlib.sha1(" ".join(query.lower().split()).encode()).hexdigest()
+        key = f"discovery:{source}:{digest}:{limit}"
+        if min_year is not None or max_year is not None:
+            key += f":{min_year or ''}-{max_year or ''}"
+        
+        cached = None
+        if cache is not None:
+            try:
+                raw = cache.get(key)
+                if raw:
+                    cached = json.loads(raw)
+            except Exception as e:
+                logger.debug(f"Search cache read failed: {e}")
+        
+        if cached and time.time() - cached["fetched_at"] < SEARCH_CACHE_TTL[source]:
+            logger.info(f"Search cache hit for {source}: {query}")
+            return cached["results"]
+        
+        try:
+            results = _search_flights.do(
+                key, search, query, limit=limit, min_year=min_year, max_year=max_year
+            )
+        except Exception:
+            if cached:
+                logger.warning(f"{source} search failed, using cached results")
+                return cached["results"]
+            raise
+        
+        if not results:
+            if cached:
+                logger.warning(f"{source} returned no results, using cached results")
+                return cached["results"]
+            return results
         
-        # Limit total results
-        return results[:limit * 2]  # Return 2x limit since we combine sources
+        if cache is not None:
+            try:
+                cache.setex(key, SEARCH_CACHE_STALE_TTL, json.dumps(
+                    {"fetched_at": time.time(), "results": results}, default=str
+                ))
+            except Exception as e:
+                logger.debug(f"Search cache write failed: {e}")
+        
+        return results
     
-    def _search_semantic_scholar(self, query: str, limit: int) -> List[DiscoveredPaper]:
+    def _search_semantic_scholar(
+        self,
+        query: str,
+        limit: int,
+        min_year: Optional[int] = None,
+        max_year: Optional[int] = None
+    ) -> List[DiscoveredPaper]:
         """Search Semantic Scholar"""
         try:
             logger.info(f"Searching Semantic Scholar: {query}")
-            results = self.semantic_scholar.search_by_title(query, limit=limit)
+            results = self._cached_search(
+                "semantic_scholar", self.semantic_scholar.search_by_title, query, limit, min_year, max_year
+            )
             
             papers = []
-            for idx, result in enumerate(results):
+            for result in results:
                 # Extract DOI
                 doi = None
                 if "externalIds" in result and result["externalIds"]:
@@ -161,11 +469,6 @@ class DiscoveryService:
                 # Extract journal/venue
                 journal = result.get("venue") or result.get("journal", {}).get("name")
                 
-                # Calculate relevance score (position-based + citation count)
-                position_score = 1.0 - (idx / max(limit, 1))
-                citation_score = min(result.get("citationCount", 0) / 1000.0, 1.0)
-                relevance = 0.7 * position_score + 0.3 * citation_score
-                
                 # Get URL
                 url = result.get("url") or (result.get("openAccessPdf", {}) or {}).get("url")
                 
@@ -178,7 +481,6 @@ class DiscoveryService:
                     journal=journal,
                     url=url,
                     source="Semantic Scholar",
-                    relevance_score=relevance,
                     citation_count=result.get("citationCount")
                 )
                 papers.append(paper)
@@ -190,17 +492,22 @@ class DiscoveryService:
             logger.error(f"Semantic Scholar search failed: {e}")
             return []
     
-    def _search_arxiv(self, query: str, limit: int) -> List[DiscoveredPaper]:
+    def _search_arxiv(
+        self,
+        query: str,
+        limit: int,
+        min_year: Optional[int] = None,
+        max_year: Optional[int] = None
+    ) -> List[DiscoveredPaper]:
         """Search arXiv"""
         try:
             logger.info(f"Searching arXiv: {query}")
-            results = self.arxiv.search_by_title(query, limit=limit)
+            results = self._cached_search(
+                "arxiv", self.arxiv.search_by_title, query, limit, min_year, max_year
+            )
             
             papers = []
-            for idx, result in enumerate(results):
-                # Position-based relevance
-                relevance = 1.0 - (idx / max(limit, 1))
-                
+            for result in results:
                 paper = DiscoveredPaper(
                     title=result.get("title", ""),
                     authors=result.get("authors"),
@@ -210,7 +517,6 @@ class DiscoveryService:
                     journal=result.get("journal", "arXiv preprint"),
                     url=result.get("url"),
                     source="arXiv",
-                    relevance_score=relevance * 0.8,  # Slightly lower than Semantic Scholar
                     citation_count=None
                 )
                 papers.append(paper)
@@ -222,14 +528,22 @@ class DiscoveryService:
             logger.error(f"arXiv search failed: {e}")
             return []
     
-    def _search_crossref(self, query: str, limit: int) -> List[DiscoveredPaper]:
+    def _search_crossref(
+        self,
+        query: str,
+        limit: int,
+        min_year: Optional[int] = None,
+        max_year: Optional[int] = None
+    ) -> List[DiscoveredPaper]:
         """Search CrossRef"""
         try:
             logger.info(f"Searching CrossRef: {query}")
-            results = self.crossref.search_by_title(query, limit=limit)
+            results = self._cached_search(
+                "crossref", self.crossref.search_by_title, query, limit, min_year, max_year
+            )
             
             papers = []
-            for idx, result in enumerate(results):
+            for result in results:
                 # Extract title
                 title = result.get("title", [""])[0] if "title" in result else ""
                 
@@ -254,9 +568,6 @@ class DiscoveryService:
                 # Extract journal
                 journal = result.get("container-title", [""])[0] if "container-title" in result else None
                 
-                # Position-based relevance
-                relevance = 1.0 - (idx / max(limit, 1))
-                
                 paper = DiscoveredPaper(
                     title=title,
                     authors=authors,
@@ -266,7 +577,6 @@ class DiscoveryService:
                     journal=journal,
                     url=f"https://doi.org/{result['DOI']}" if "DOI" in result else None,
                     source="CrossRef",
-                    relevance_score=relevance * 0.85,
                     citation_count=result.get("is-referenced-by-count")
                 )
                 papers.append(paper)
@@ -278,14 +588,22 @@ class DiscoveryService:
             logger.error(f"CrossRef search failed: {e}")
             return []
     
-    def _search_openalex(self, query: str, limit: int) -> List[DiscoveredPaper]:
+    def _search_openalex(
+        self,
+        query: str,
+        limit: int,
+        min_year: Optional[int] = None,
+        max_year: Optional[int] = None
+    ) -> List[DiscoveredPaper]:
         """Search OpenAlex"""
         try:
             logger.info(f"Searching OpenAlex: {query}")
-            results = self.openalex.search_by_title(query, limit=limit)
+            results = self._cached_search(
+                "openalex", self.openalex.search_by_title, query, limit, min_year, max_year
+            )
             
             papers = []
-            for idx, result in enumerate(results):
+            for result in results:
                 # Extract authors
                 authors = None
                 if "authorships" in result and result["authorships"]:
@@ -295,9 +613,6 @@ class DiscoveryService:
                     ]
                     authors = "; ".join([n for n in author_names if n])
                 
-                # Position-based relevance
-                relevance = 1.0 - (idx / max(limit, 1))
-                
                 paper = DiscoveredPaper(
                     title=result.get("title", ""),
                     authors=authors,
@@ -307,7 +622,6 @@ class DiscoveryService:
                     journal=result.get("host_venue", {}).get("display_name"),
                     url=result.get("doi"),
                     source="OpenAlex",
-                    relevance_score=relevance * 0.75,
                     citation_count=result.get("cited_by_count")
                 )
                 papers.append(paper)
@@ -320,67 +634,65 @@ class DiscoveryService:
             return []
     
     def _deduplicate_results(self, results: List[DiscoveredPaper]) -> List[DiscoveredPaper]:
-        """Remove duplicate papers based on DOI and title similarity"""
-        seen_dois: Set[str] = set()
-        seen_titles: Set[str] = set()
-        unique_results = []
-        
-        for paper in results:
-            # Check DOI first (most reliable)
-            if paper.doi:
-                doi_normalized = paper.doi.lower().strip()
-                if doi_normalized in seen_dois:
-                    continue
-                seen_dois.add(doi_normalized)
-            
-            # Check title (normalize for comparison)
-            if paper.title:
-                title_normalized = paper.title.lower().strip()
-                # Simple duplicate detection (exact match)
-                if title_normalized in seen_titles:
-                    continue
-                seen_titles.add(title_normalized)
-            
-            unique_results.append(paper)
+        """Remove duplicate papers based on DOI and title similarity (see _ResultDeduplicator)"""
+        deduplicator = _ResultDeduplicator()
+        unique_results = [paper for paper in results if deduplicator.add(paper)]
         
         logger.info(f"Deduplicated {len(results)} -> {len(unique_results)} papers")
         return unique_results
     
     def _check_library_status(self, results: List[DiscoveredPaper]) -> List[DiscoveredPaper]:
         """Check which papers are already in the library"""
+        dois = {paper.doi for paper in results if paper.doi}
+        titles = {paper.title.lower() for paper in results if paper.title}
+        if not dois and not titles:
+            return results
+        
+        # One query for all candidates instead of up to two per result
+        existing = self.db.query(Paper.id, Paper.doi, Paper.title).filter(
+            or_(Paper.doi.in_(dois), func.lower(Paper.title).in_(titles))
+        ).order_by(Paper.id).all()
+        
+        # Lowest id wins when several library papers match
+        by_doi: Dict[str, int] = {}
+        by_title: Dict[str, int] = {}
+        for paper_id, doi, title in existing:
+            if doi in dois:
+                by_doi.setdefault(doi, paper_id)
+            if title and title.lower() in titles:
+                by_title.setdefault(title.lower(), paper_id)
+        
         for paper in results:
-            # Check by DOI first
-            if paper.doi:
-                existing = self.db.query(Paper).filter(
-                    Paper.doi == paper.doi
-                ).first()
-                if existing:
-                    paper.in_library = True
-                    paper.library_paper_id = existing.id
-                    continue
-            
-            # Check by title (exact match)
-            if paper.title:
-                existing = self.db.query(Paper).filter(
-                    Paper.title == paper.title
-                ).first()
-                if existing:
-                    paper.in_library = True
-                    paper.library_paper_id = existing.id
+            # Check by DOI first, then by title (ignoring case)
+            library_paper_id = by_doi.get(paper.doi) if paper.doi else None
+            if library_paper_id is None and paper.title:
+                library_paper_id = by_title.get(paper.title.lower())
+            if library_paper_id is not None:
+                paper.in_library = True
+                paper.library_paper_id = library_paper_id
         
         return results
     
-    def _rank_results(self, results: List[DiscoveredPaper]) -> List[DiscoveredPaper]:
-        """Rank results by relevance and citation count"""
-        # Sort by relevance score (descending), then citation count
-        def sort_key(paper: DiscoveredPaper):
-            citation_score = (paper.citation_count or 0) / 1000.0  # Normalize
-            return (
-                paper.relevance_score * 0.7 + min(citation_score, 1.0) * 0.3,
-                paper.citation_count or 0
-            )
+    def _rank_results(self, results: List[DiscoveredPaper], source_count: int) -> List[DiscoveredPaper]:
+        """
+        Rank results by Reciprocal Rank Fusion of their per-source ranks
         
-        results.sort(key=sort_key, reverse=True)
+        Each paper scores sum(1 / (RRF_K + rank)) over the sources that
+        returned it, so only positions are compared, never the sources'
+        incompatible scores. relevance_score is that sum scaled to 0-1,
+        where 1.0 means ranked first by every source searched. Ties are
+        broken by citation count.
+        
+        Args:
+            results: Deduplicated results with source_ranks filled in
+            source_count: Number of sources searched
+        """
+        best_score = max(source_count, 1) / (RRF_K + 1)
+        for paper in results:
+            fused = sum(1.0 / (RRF_K + rank) for rank in paper.source_ranks.values())
+            paper.relevance_score = fused / best_score
+        
+        results.sort(key=lambda paper: (paper.relevance_score, paper.citation_count or 0), reverse=True)
         return results
     
     def add_to_library(
@@ -418,21 +730,18 @@ class DiscoveryService:
             }
         )
         
+        # Add to collections if specified; unknown ids are skipped. The
+        # collection links are inserted in the same flush as the paper.
+        if collection_ids:
+            from ...database.models import Collection
+            paper.collections = self.db.query(Collection).filter(
+                Collection.id.in_(collection_ids)
+            ).all()
+        
         self.db.add(paper)
         self.db.commit()
         self.db.refresh(paper)
         
-        # Add to collections if specified
-        if collection_ids:
-            from ...database.models import Collection
-            for collection_id in collection_ids:
-                collection = self.db.query(Collection).filter(
-                    Collection.id == collection_id
-                ).first()
-                if collection:
-                    paper.collections.append(collection)
-            self.db.commit()
-        
         logger.info(f"Added discovered paper to library: {paper.title} (ID: {paper.id})")
         return paper
 
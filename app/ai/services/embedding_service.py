@@ -5,25 +5,157 @@ Generates vector embeddings for papers using OpenAI's text-embedding-3-small mod
 Embeddings are used for semantic search and recommendations.
 """
 
+import asyncio
+import hashlib
 import logging
-from typing import List, Optional
-from openai import AsyncOpenAI
+import math
+from typing import Dict, List, Optional, Tuple
+import httpx
+import numpy as np
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, BadRequestError, InternalServerError, RateLimitError
 from app.config import settings
+from app.ai.utils import LoopBoundClient, async_retry_with_exponential_backoff
 
-logger = logging.getLogger(__name__)
+try:
+    import tiktoken
+except ImportError:
+    # Optional: exact token counts for truncation (falls back to a character estimate)
+    tiktoken = None
 
-# Initialize OpenAI client
-client = AsyncOpenAI(api_key=settings.openai_api_key)
+logger = logging.getLogger(__name__)
 
 # Constants
 EMBEDDING_MODEL = "text-embedding-3-small"
 EMBEDDING_DIMENSION = 1536
 MAX_TOKENS = 8191  # Max tokens for text-embedding-3-small
+# Without tiktoken, for truncation and batch budgets alike: conservative, as
+# dense (e.g. CJK) text runs close to one character per token
+CHARS_PER_TOKEN_ESTIMATE = 2
+
+# Batch limits of the embeddings endpoint: inputs and total tokens per request
+EMBEDDING_BATCH_SIZE = 2048
+EMBEDDING_BATCH_MAX_TOKENS = 300_000
+EMBEDDING_BATCH_CONCURRENCY = 4  # Requests in flight at once
+
+# Kept-alive connections let consecutive batches skip the TLS handshake
+EMBEDDING_HTTP_LIMITS = httpx.Limits(max_connections=16, max_keepalive_connections=EMBEDDING_BATCH_CONCURRENCY)
+# Rate limits and transient server/network errors are retried; 4xx request errors are not
+EMBEDDING_RETRY_EXCEPTIONS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+# Embeddings of a fixed model never change; cached by content hash
+EMBEDDING_CACHE_TTL = 30 * 24 * 3600  # seconds
+# Half precision: 3 KB per vector. Similarity search already ranks on a
+# halfvec cast (ix_papers_embedding_hnsw), so rankings are unaffected.
+EMBEDDING_CACHE_DTYPE = np.float16
+
+_encoding = None
+
+
+def _get_encoding():
+    """Tokenizer of EMBEDDING_MODEL, or None if tiktoken is unavailable."""
+    global _encoding, tiktoken
+    if _encoding is None and tiktoken is not None:
+        try:
+            _encoding = tiktoken.encoding_for_model(EMBEDDING_MODEL)
+        except Exception as e:
+            # First use downloads the BPE ranks; don't retry on every call
+            logger.warning(f"Tokenizer unavailable, estimating tokens from characters: {e}")
+            tiktoken = None
+    return _encoding
+
+
+# The SDK's own retries are disabled; _create_embeddings retries instead
+_embedding_client = LoopBoundClient(
+    lambda: AsyncOpenAI(
+        api_key=settings.openai_api_key,
+        max_retries=0,
+        http_client=httpx.AsyncClient(limits=EMBEDDING_HTTP_LIMITS)
+    ),
+    close="close"
+)
+
+
+def _get_embedding_client() -> AsyncOpenAI:
+    """
+    OpenAI client for embedding requests, with a pooled HTTP connection.
+    
+    Like the cache client below, it is recreated when the running event loop
+    changes, since pooled connections are bound to the loop that opened them;
+    run_async() closes it before its loop ends.
+    """
+    return _embedding_client.get()
+
+
+@async_retry_with_exponential_backoff(
+    max_retries=4,
+    initial_delay=1.0,
+    max_delay=30.0,
+    exceptions=EMBEDDING_RETRY_EXCEPTIONS
+)
+async def _create_embeddings(texts: List[str]):
+    """One embeddings request, retried with backoff on rate limits and transient errors."""
+    return await _get_embedding_client().embeddings.create(
+        model=EMBEDDING_MODEL,
+        input=texts,
+        encoding_format="float"
+    )
+
+
+def _connect_embedding_cache():
+    import redis.asyncio as aioredis
+    return aioredis.from_url(settings.redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+
+_embedding_cache_client = LoopBoundClient(_connect_embedding_cache)
+
+
+def _get_embedding_cache():
+    """
+    Async Redis client for the embedding cache.
+    
+    Celery tasks run each coroutine in a fresh event loop (run_async), and
+    async Redis connections cannot cross loops, so the client is recreated
+    whenever the running loop changes and closed when the task's loop ends.
+    """
+    return _embedding_cache_client.get()
+
+
+def _embedding_cache_key(text: str) -> str:
+    """Cache key for the embedding of text under the current model and storage type."""
+    digest = hashlib.sha256(text.encode()).hexdigest()
+    return f"embedding:{EMBEDDING_MODEL}:{np.dtype(EMBEDDING_CACHE_DTYPE).name}:{digest}"
 
 
 class EmbeddingService:
     """Service for generating and managing paper embeddings"""
     
+    @staticmethod
+    def _prepare_text(text: Optional[str]) -> Optional[str]:
+        """Truncate text to the model's input limit; None if there is nothing to embed."""
+        if not text or not text.strip():
+            logger.warning("Empty text provided for embedding generation")
+            return None
+        
+        encoding = _get_encoding()
+        if encoding is None:
+            # Truncate text if too long (estimated from characters)
+            max_chars = MAX_TOKENS * CHARS_PER_TOKEN_ESTIMATE
+            if len(text) > max_chars:
+                logger.info(f"Truncating text from {len(text)} to {max_chars} characters")
+                text = text[:max_chars]
+            return text
+        
+        # Every token covers at least one byte, so short texts need no encoding
+        if len(text.encode()) <= MAX_TOKENS:
+            return text
+        # Special-token markers in paper text are embedded as plain text; a
+        # character split at the cut is dropped rather than replaced
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) > MAX_TOKENS:
+            logger.info(f"Truncating text from {len(tokens)} to {MAX_TOKENS} tokens")
+            text = encoding.decode(tokens[:MAX_TOKENS], errors="ignore")
+        return text
+    
     @staticmethod
     async def generate_embedding(text: str) -> Optional[List[float]]:
         """
@@ -36,37 +168,139 @@ class EmbeddingService:
             List of floats representing the embedding vector (1536 dimensions)
             or None if generation fails
         """
-        if not text or not text.strip():
-            logger.warning("Empty text provided for embedding generation")
-            return None
+        embeddings = await EmbeddingService.generate_embeddings_batch([text])
+        return embeddings[0]
+    
+    @staticmethod
+    async def generate_embeddings_batch(texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Generate embeddings for many texts with as few API requests as possible.
         
-        try:
-            # Truncate text if too long (rough estimate: 1 token ≈ 4 characters)
-            max_chars = MAX_TOKENS * 4
-            if len(text) > max_chars:
-                logger.info(f"Truncating text from {len(text)} to {max_chars} characters")
-                text = text[:max_chars]
-            
-            # Generate embedding
-            response = await client.embeddings.create(
-                model=EMBEDDING_MODEL,
-                input=text,
-                encoding_format="float"
-            )
-            
-            embedding = response.data[0].embedding
-            
-            # Validate dimension
-            if len(embedding) != EMBEDDING_DIMENSION:
-                logger.error(f"Unexpected embedding dimension: {len(embedding)}, expected {EMBEDDING_DIMENSION}")
-                return None
-            
-            logger.info(f"Successfully generated embedding (dim={len(embedding)})")
-            return embedding
+        Cached embeddings are fetched in one Redis round trip. The rest are
+        deduplicated and sent in requests of up to EMBEDDING_BATCH_SIZE inputs
+        and EMBEDDING_BATCH_MAX_TOKENS tokens, EMBEDDING_BATCH_CONCURRENCY
+        requests at a time.
+        
+        Args:
+            texts: Texts to embed
             
+        Returns:
+            Embedding per input text, in input order; None where the text was
+            empty or generation failed
+        """
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        
+        # Input positions of each distinct text still to embed
+        pending: Dict[str, List[int]] = {}
+        for position, text in enumerate(texts):
+            text = EmbeddingService._prepare_text(text)
+            if text is not None:
+                pending.setdefault(text, []).append(position)
+        
+        if not pending:
+            return embeddings
+        
+        # Identical texts embedded before: serve them from the cache
+        try:
+            cache = _get_embedding_cache()
+            cached = await cache.mget([_embedding_cache_key(text) for text in pending])
         except Exception as e:
-            logger.error(f"Failed to generate embedding: {str(e)}", exc_info=True)
-            return None
+            logger.debug(f"Embedding cache read failed: {e}")
+            cache = None
+            cached = []
+        
+        hits = 0
+        for text, blob in zip(list(pending), cached):
+            if blob:
+                hits += 1
+                embedding = np.frombuffer(blob, dtype=EMBEDDING_CACHE_DTYPE).tolist()
+                for position in pending.pop(text):
+                    embeddings[position] = embedding
+        if hits:
+            logger.info(f"Embedding cache hits: {hits}")
+        
+        if not pending:
+            return embeddings
+        
+        # Split into requests within the per-request token budget. Tokens are
+        # counted with the model's tokenizer when available, otherwise
+        # estimated from characters
+        encoding = _get_encoding()
+        if encoding is not None:
+            # Special-token markers count as plain text, as in _prepare_text
+            token_counts = [len(tokens) for tokens in encoding.encode_ordinary_batch(list(pending))]
+        else:
+            token_counts = [math.ceil(len(text) / CHARS_PER_TOKEN_ESTIMATE) for text in pending]
+        chunks: List[List[str]] = []
+        chunk: List[str] = []
+        chunk_tokens = 0
+        for text, tokens in zip(pending, token_counts):
+            if chunk and (len(chunk) == EMBEDDING_BATCH_SIZE or chunk_tokens + tokens > EMBEDDING_BATCH_MAX_TOKENS):
+                chunks.append(chunk)
+                chunk, chunk_tokens = [], 0
+            chunk.append(text)
+            chunk_tokens += tokens
+        chunks.append(chunk)
+        
+        semaphore = asyncio.Semaphore(EMBEDDING_BATCH_CONCURRENCY)
+        
+        async def embed_chunk(chunk: List[str]) -> List[Tuple[str, List[float]]]:
+            async with semaphore:
+                try:
+                    response = await _create_embeddings(chunk)
+                except BadRequestError as e:
+                    if len(chunk) == 1:
+                        logger.error(f"Embedding request rejected: {str(e)}")
+                        return []
+                    # One bad input rejects the whole request: retry in halves,
+                    # down to single texts, so only the bad input goes without
+                    logger.warning(f"Embedding request of {len(chunk)} texts rejected, splitting: {str(e)}")
+                    response = None
+                except Exception as e:
+                    logger.error(f"Failed to generate {len(chunk)} embedding(s): {str(e)}", exc_info=True)
+                    return []
+            
+            if response is None:
+                # Outside the semaphore, which the halves acquire themselves
+                middle = len(chunk) // 2
+                first, second = await asyncio.gather(embed_chunk(chunk[:middle]), embed_chunk(chunk[middle:]))
+                return first + second
+            return [(chunk[item.index], item.embedding) for item in response.data]
+        
+        generated: Dict[str, List[float]] = {}
+        for results in await asyncio.gather(*(embed_chunk(chunk) for chunk in chunks)):
+            for text, embedding in results:
+                # Validate dimension
+                if len(embedding) != EMBEDDING_DIMENSION:
+                    logger.error(f"Unexpected embedding dimension: {len(embedding)}, expected {EMBEDDING_DIMENSION}")
+                    continue
+                generated[text] = embedding
+                for position in pending[text]:
+                    embeddings[position] = embedding
+        
+        # Raw EMBEDDING_CACHE_DTYPE bytes instead of ~20 KB of JSON per vector
+        if generated and cache is not None:
+            try:
+                async with cache.pipeline(transaction=False) as pipe:
+                    for text, embedding in generated.items():
+                        pipe.setex(
+                            _embedding_cache_key(text), EMBEDDING_CACHE_TTL,
+                            np.asarray(embedding, dtype=EMBEDDING_CACHE_DTYPE).tobytes()
+                        )
+                    await pipe.execute()
+            except Exception as e:
+                logger.debug(f"Embedding cache write failed: {e}")
+        
+        logger.info(f"Successfully generated {len(generated)} embedding(s) in {len(chunks)} request(s)")
+        return embeddings
+    
+    @staticmethod
+    def _paper_text(title: str, abstract: Optional[str] = None) -> str:
+        """Title and abstract combined into the text embedded for a paper."""
+        text_parts = [title]
+        if abstract and abstract.strip():
+            text_parts.append(abstract)
+        return " ".join(text_parts)
     
     @staticmethod
     async def generate_paper_embedding(title: str, abstract: Optional[str] = None) -> Optional[List[float]]:
@@ -87,48 +321,81 @@ class EmbeddingService:
             logger.warning("Cannot generate embedding without title")
             return None
         
-        # Combine title and abstract
-        text_parts = [title]
-        if abstract and abstract.strip():
-            text_parts.append(abstract)
-        
-        combined_text = " ".join(text_parts)
+        combined_text = EmbeddingService._paper_text(title, abstract)
         
         logger.info(f"Generating embedding for paper: '{title[:50]}...' (length={len(combined_text)})")
         return await EmbeddingService.generate_embedding(combined_text)
     
+    @staticmethod
+    async def generate_paper_embeddings_batch(
+        papers: List[Tuple[str, Optional[str]]]
+    ) -> List[Optional[List[float]]]:
+        """
+        Generate embeddings for many papers in batched API requests.
+        
+        Args:
+            papers: (title, abstract) per paper
+            
+        Returns:
+            Embedding per paper, in input order; None for papers without a
+            title or whose generation failed
+        """
+        texts = [EmbeddingService._paper_text(title, abstract) if title else None for title, abstract in papers]
+        logger.info(f"Generating embeddings for {len(texts)} papers")
+        return await EmbeddingService.generate_embeddings_batch(texts)
+    
     @staticmethod
     def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
         """
         Calculate cosine similarity between two vectors.
         
         Note: In practice, use database vector operations for efficiency.
-        This is mainly for testing/debugging.
+        This is mainly for testing/debugging. To score one vector against
+        many, use cosine_similarity_batch.
         
         Args:
-            vec1: First vector
-            vec2: Second vector
+            vec1: First vector (list or numpy array)
+            vec2: Second vector (list or numpy array)
             
         Returns:
             Cosine similarity score (-1 to 1, higher is more similar)
         """
-        import numpy as np
-        
         if len(vec1) != len(vec2):
             raise ValueError(f"Vectors must have same dimension: {len(vec1)} vs {len(vec2)}")
         
-        vec1_np = np.array(vec1)
-        vec2_np = np.array(vec2)
-        
-        # Cosine similarity = dot product / (norm1 * norm2)
-        dot_product = np.dot(vec1_np, vec2_np)
-        norm1 = np.linalg.norm(vec1_np)
-        norm2 = np.linalg.norm(vec2_np)
+        # asarray: numpy inputs are used as-is, without a copy
+        vec1_np = np.asarray(vec1, dtype=np.float64)
+        vec2_np = np.asarray(vec2, dtype=np.float64)
         
-        if norm1 == 0 or norm2 == 0:
+        # Cosine similarity = dot product / (norm1 * norm2), as three dot products
+        norm_product = float(vec1_np @ vec1_np) * float(vec2_np @ vec2_np)
+        if norm_product == 0:
             return 0.0
         
-        return float(dot_product / (norm1 * norm2))
+        return float(vec1_np @ vec2_np) / math.sqrt(norm_product)
+    
+    @staticmethod
+    def cosine_similarity_batch(query: List[float], corpus) -> np.ndarray:
+        """
+        Cosine similarity of one vector against many.
+        
+        One float32 matrix-vector product over the corpus rows instead of a
+        cosine_similarity call per candidate.
+        
+        Args:
+            query: Query vector
+            corpus: Candidate vectors, one per row (list of lists or 2-D array)
+            
+        Returns:
+            Similarity per corpus row; 0.0 where either vector is all zeros
+        """
+        query_np = np.asarray(query, dtype=np.float32)
+        corpus_np = np.asarray(corpus, dtype=np.float32).reshape(-1, len(query_np))
+        
+        # Row norms via einsum: no squared copy of the corpus
+        norms = np.sqrt(np.einsum("ij,ij->i", corpus_np, corpus_np)) * np.linalg.norm(query_np)
+        scores = corpus_np @ query_np
+        return np.divide(scores, norms, out=np.zeros_like(scores), where=norms > 0)
 
 
 # Convenience functions for backward compatibility
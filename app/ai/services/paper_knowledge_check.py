@@ -1,10 +1,60 @@
 """
 Service to check if an LLM has knowledge of a paper in its training data.
 """
+import hashlib
+import json
+import logging
 import os
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from openai import OpenAI
 
+from ..utils import SingleFlight
+from ...config import settings
+
+try:
+    import orjson
+except ImportError:
+    # Optional: faster parsing of LLM responses and cache entries
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_MODEL = "gpt-4o-mini"
+
+# A frozen model's knowledge of a paper does not change; the key includes
+# the model, so switching models starts a fresh cache
+RESPONSE_CACHE_TTL = 30 * 24 * 3600  # seconds
+
+_response_cache_client = None
+
+# Identical requests already in flight share one completion
+_completion_flights = SingleFlight()
+
+
+def _json_loads(data):
+    """Parse JSON text or bytes, with orjson when installed."""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def _json_dumps(obj) -> bytes:
+    """Serialize to JSON bytes, with orjson when installed."""
+    return orjson.dumps(obj) if orjson else json.dumps(obj).encode()
+
+
+def _get_response_cache():
+    """Redis client for cached LLM responses, or None if Redis is unavailable."""
+    global _response_cache_client
+    if _response_cache_client is None:
+        try:
+            import redis
+            _response_cache_client = redis.Redis.from_url(
+                settings.redis_url, socket_timeout=0.5, socket_connect_timeout=0.5
+            )
+        except Exception as e:
+            logger.debug(f"LLM response cache unavailable: {e}")
+            return None
+    return _response_cache_client
+
 
 class PaperKnowledgeService:
     """Check if LLM knows about a paper and can provide summaries."""
@@ -12,6 +62,38 @@ class PaperKnowledgeService:
     def __init__(self, api_key: str):
         self.client = OpenAI(api_key=api_key)
     
+    def _complete_json(self, messages: List[Dict], **params) -> Dict:
+        """
+        Chat completion parsed as JSON, served from Redis for repeated requests.
+        
+        Keyed by a hash of the model, messages and parameters; concurrent
+        misses for the same key share one completion. Only responses that
+        parse are cached; API and parse errors propagate to the caller.
+        """
+        request = {"model": KNOWLEDGE_MODEL, "messages": messages, **params}
+        # Stdlib json for the key, so it does not depend on orjson being installed
+        key = "llm:" + hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+        
+        cache = _get_response_cache()
+        if cache is not None:
+            try:
+                cached = cache.get(key)
+                if cached:
+                    return _json_loads(cached)
+            except Exception as e:
+                logger.debug(f"LLM response cache read failed: {e}")
+        
+        response = _completion_flights.do(key, self.client.chat.completions.create, **request)
+        result = _json_loads(response.choices[0].message.content.strip())
+        
+        if cache is not None:
+            try:
+                cache.setex(key, RESPONSE_CACHE_TTL, _json_dumps(result))
+            except Exception as e:
+                logger.debug(f"LLM response cache write failed: {e}")
+        
+        return result
+    
     def check_paper_knowledge(
         self, 
         title: str, 
@@ -61,8 +143,7 @@ Please respond in JSON format with:
 Only respond with the JSON object, no other text."""
 
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
+            result = self._complete_json(
                 messages=[
                     {"role": "system", "content": "You are a helpful research assistant. Respond only with valid JSON."},
                     {"role": "user", "content": prompt}
@@ -71,9 +152,6 @@ Only respond with the JSON object, no other text."""
                 max_tokens=300
             )
             
-            import json
-            result = json.loads(response.choices[0].message.content.strip())
-            
             return {
                 "has_knowledge": result.get("has_knowledge", False),
                 "confidence": result.get("confidence", 0.0),
@@ -118,8 +196,7 @@ Please provide:
 Format your response as JSON with keys: "short_summary", "long_summary", "key_findings" (array), "eli5_summary"""
 
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
+            result = self._complete_json(
                 messages=[
                     {"role": "system", "content": "You are a helpful research assistant. Provide accurate summaries based on your training data. Respond only with valid JSON."},
                     {"role": "user", "content": prompt}
@@ -129,10 +206,6 @@ Format your response as JSON with keys: "short_summary", "long_summary", "key_fi
                 response_format={"type": "json_object"}
             )
             
-            import json
-            content = response.choices[0].message.content.strip()
-            result = json.loads(content)
-            
             # Ensure all fields exist
             short = result.get("short_summary", "") or result.get("short", "")
             long = result.get("long_summary", "") or result.get("detailed_summary", "")
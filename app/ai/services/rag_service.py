@@ -5,27 +5,226 @@ Implements Retrieval-Augmented Generation for question answering over user's pap
 Combines semantic search with LLM generation to answer questions based on paper content.
 """
 
+import asyncio
+import hashlib
+import json
 import logging
-from typing import Dict, List, Optional, Any
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
+import numpy as np
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from openai import AsyncOpenAI
 
 from app.database.models import Paper
+from app.ai.services.embedding_service import EmbeddingService, EMBEDDING_DIMENSION
 from app.ai.services.vector_search_service import VectorSearchService
+from app.ai.utils import LoopBoundClient
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Answers are keyed by the full prompt, which includes the retrieved paper
+# context, so library changes lead to new keys rather than stale answers
+RESPONSE_CACHE_TTL = 7 * 24 * 3600  # seconds
+
+NO_SOURCES_ANSWER = "I couldn't find any relevant papers in your library to answer this question."
+
+# Enhanced queries kept in process, in front of the Redis response cache
+ENHANCED_QUERY_CACHE_SIZE = 4096
+
+_enhanced_query_cache: "OrderedDict[Tuple[str, str, Optional[int]], str]" = OrderedDict()
+
+
+_chat_client = LoopBoundClient(lambda: AsyncOpenAI(api_key=settings.openai_api_key), close="close")
+
+
+def _get_chat_client() -> AsyncOpenAI:
+    """
+    OpenAI client shared by all RAGService instances.
+    
+    One client keeps one connection pool, so questions reuse kept-alive
+    connections instead of each opening (and leaking) a pool of its own.
+    Recreated whenever the running event loop changes, since pooled
+    connections are bound to the loop that opened them; run_async() closes
+    it before its loop ends.
+    """
+    return _chat_client.get()
+
+
+def _response_cache_key(request: Dict) -> str:
+    """Response cache key for a chat completion request (model, messages, parameters)."""
+    return "llm:" + hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+
+def _connect_response_cache():
+    import redis.asyncio as aioredis
+    return aioredis.from_url(settings.redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+
+_response_cache_client = LoopBoundClient(_connect_response_cache)
+
+
+def _get_response_cache():
+    """
+    Async Redis client for cached LLM responses.
+    
+    Recreated whenever the running event loop changes, since async Redis
+    connections cannot cross loops; run_async() closes it before its loop ends.
+    """
+    return _response_cache_client.get()
+
+
+class SemanticAnswerCache:
+    """
+    In-process semantic cache in front of RAGService.answer_question.
+    
+    Entries are keyed by the L2-normalized question embedding. A question
+    whose cosine similarity to a stored one reaches ``threshold`` reuses its
+    answer and sources, skipping retrieval and generation, so paraphrases
+    of a recent question are answered instantly. Entries only match the
+    same filters and library version (paper count and last update) they
+    were computed with; the least recently used entry is evicted once
+    ``max_entries`` is reached.
+    """
+    
+    def __init__(self, dim: int = EMBEDDING_DIMENSION, max_entries: int = 512, threshold: float = 0.92):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * max_entries
+        self._last_used = np.zeros(max_entries, dtype=np.int64)  # 0 marks an empty slot
+        self._clock = 0
+        self._lock = asyncio.Lock()
+    
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        return vector / norm
+    
+    async def lookup(self, embedding, key: Tuple) -> Optional[Dict[str, Any]]:
+        """Return the cached response for a similar question under key, or None on a miss."""
+        query = self._normalize(embedding)
+        if query is None:
+            return None
+        
+        async with self._lock:
+            if self._clock == 0:
+                return None
+            
+            # Only entries computed under the same key compete
+            scores = self._vectors @ query
+            for slot, entry in enumerate(self._entries):
+                if entry is None or entry["key"] != key:
+                    scores[slot] = -1.0
+            slot = int(np.argmax(scores))
+            if scores[slot] < self.threshold:
+                return None
+            
+            self._clock += 1
+            self._last_used[slot] = self._clock
+            return dict(self._entries[slot]["response"])
+    
+    async def store(self, embedding, key: Tuple, response: Dict[str, Any]) -> None:
+        """Remember the response computed for a question's embedding."""
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+        
+        async with self._lock:
+            # Fill an empty slot, else evict the least recently used
+            slot = int(np.argmin(self._last_used))
+            self._clock += 1
+            self._vectors[slot] = vector
+            self._entries[slot] = {"key": key, "response": response}
+            self._last_used[slot] = self._clock
+
+
+# Shared by the API process; RAGService is created per request
+semantic_answer_cache = SemanticAnswerCache()
+
 
 class RAGService:
     """Service for RAG-based question answering over paper library"""
     
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
         self.model = "gpt-4o-mini"
         self.max_context_papers = 5
         self.max_tokens = 1000
     
+    @property
+    def client(self) -> AsyncOpenAI:
+        """Process-wide pooled client; RAGService itself is created per request."""
+        return _get_chat_client()
+    
+    async def _complete(self, messages: List[Dict], **params) -> str:
+        """
+        Chat completion text, served from Redis for repeated requests.
+        
+        Keyed by a hash of the model, messages and parameters. API errors
+        propagate to the caller; cache errors only skip the cache.
+        """
+        request = {"model": self.model, "messages": messages, **params}
+        key = _response_cache_key(request)
+        
+        cache = _get_response_cache()
+        try:
+            cached = await cache.get(key)
+            if cached:
+                return cached.decode()
+        except Exception as e:
+            logger.debug(f"LLM response cache read failed: {e}")
+        
+        response = await self.client.chat.completions.create(**request)
+        text = response.choices[0].message.content.strip()
+        
+        try:
+            await cache.setex(key, RESPONSE_CACHE_TTL, text)
+        except Exception as e:
+            logger.debug(f"LLM response cache write failed: {e}")
+        
+        return text
+    
+    async def _complete_stream(self, messages: List[Dict], **params) -> AsyncIterator[str]:
+        """
+        Streaming variant of _complete: yields the completion text as it arrives.
+        
+        Shares _complete's cache; a cached response is yielded in one piece,
+        and a streamed one is cached once the stream has finished.
+        """
+        request = {"model": self.model, "messages": messages, **params}
+        key = _response_cache_key(request)
+        
+        cache = _get_response_cache()
+        try:
+            cached = await cache.get(key)
+            if cached:
+                yield cached.decode()
+                return
+        except Exception as e:
+            logger.debug(f"LLM response cache read failed: {e}")
+        
+        parts = []
+        stream = await self.client.chat.completions.create(**request, stream=True)
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                # Leading whitespace is dropped, as _complete strips it
+                if not parts:
+                    delta = delta.lstrip()
+                    if not delta:
+                        continue
+                parts.append(delta)
+                yield delta
+        
+        try:
+            await cache.setex(key, RESPONSE_CACHE_TTL, "".join(parts).strip())
+        except Exception as e:
+            logger.debug(f"LLM response cache write failed: {e}")
+    
     async def answer_question(
         self,
         db: Session,
@@ -52,22 +251,16 @@ class RAGService:
             Dictionary with answer, sources, and metadata
         """
         try:
-            # Step 1: Retrieve relevant papers using semantic search
-            logger.info(f"RAG: Retrieving papers for query: {query[:100]}...")
-            search_results = await VectorSearchService.semantic_search(
-                db=db,
-                query=query,
-                limit=max_papers,
-                min_score=0.2,  # Lowered from 0.3 to handle meta-linguistic queries like "what do I have"
-                collection_ids=collection_ids,
-                tag_ids=tag_ids,
-                year_from=year_from,
-                year_to=year_to
+            # Steps 0-1: Reuse a near-identical recent answer, else retrieve papers
+            query_embedding, cache_key, cached, search_results = await self._retrieve(
+                db, query, collection_ids, tag_ids, year_from, year_to, max_papers
             )
+            if cached is not None:
+                return cached
             
             if not search_results:
                 return {
-                    "answer": "I couldn't find any relevant papers in your library to answer this question.",
+                    "answer": NO_SOURCES_ANSWER,
                     "sources": [],
                     "context_papers_count": 0,
                     "has_sources": False
@@ -82,25 +275,15 @@ class RAGService:
             answer = await self._generate_answer(query, context)
             
             # Step 4: Format response with sources
-            sources = [
-                {
-                    "paper_id": result.paper.id,
-                    "title": result.paper.title,
-                    "authors": result.paper.authors,
-                    "year": result.paper.year,
-                    "relevance_score": round(result.score, 4),
-                    "doi": result.paper.doi,
-                    "journal": result.paper.journal
-                }
-                for result in search_results
-            ]
-            
-            return {
+            response = {
                 "answer": answer,
-                "sources": sources,
+                "sources": self._format_sources(search_results),
                 "context_papers_count": len(search_results),
                 "has_sources": True
             }
+            if cache_key is not None:
+                await semantic_answer_cache.store(query_embedding, cache_key, response)
+            return response
             
         except Exception as e:
             logger.error(f"Error in RAG answer generation: {str(e)}", exc_info=True)
@@ -112,6 +295,142 @@ class RAGService:
                 "error": str(e)
             }
     
+    async def answer_question_stream(
+        self,
+        db: Session,
+        query: str,
+        collection_ids: Optional[List[int]] = None,
+        tag_ids: Optional[List[int]] = None,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+        max_papers: int = 5
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answer a question like answer_question, streaming the answer as it is generated.
+        
+        Yields one ``{"type": "sources", ...}`` record (sources,
+        context_papers_count, has_sources) as soon as retrieval is done, then
+        ``{"type": "token", "text": ...}`` records that concatenate to the
+        answer, then ``{"type": "done"}``; ``{"type": "error", "error": ...}``
+        replaces the rest if anything fails.
+        """
+        try:
+            query_embedding, cache_key, cached, search_results = await self._retrieve(
+                db, query, collection_ids, tag_ids, year_from, year_to, max_papers
+            )
+            if cached is not None:
+                yield {
+                    "type": "sources",
+                    "sources": cached["sources"],
+                    "context_papers_count": cached["context_papers_count"],
+                    "has_sources": cached["has_sources"]
+                }
+                yield {"type": "token", "text": cached["answer"]}
+                yield {"type": "done"}
+                return
+            
+            sources = self._format_sources(search_results)
+            yield {
+                "type": "sources",
+                "sources": sources,
+                "context_papers_count": len(search_results),
+                "has_sources": bool(search_results)
+            }
+            if not search_results:
+                yield {"type": "token", "text": NO_SOURCES_ANSWER}
+                yield {"type": "done"}
+                return
+            
+            context = self._build_context(search_results)
+            logger.info(f"RAG: Streaming answer from {len(search_results)} papers")
+            
+            parts = []
+            async for text in self._complete_stream(
+                self._answer_messages(query, context),
+                max_tokens=self.max_tokens,
+                temperature=0.3
+            ):
+                parts.append(text)
+                yield {"type": "token", "text": text}
+            
+            # Cached before "done", as clients may disconnect once they see it
+            if cache_key is not None:
+                await semantic_answer_cache.store(query_embedding, cache_key, {
+                    "answer": "".join(parts).strip(),
+                    "sources": sources,
+                    "context_papers_count": len(search_results),
+                    "has_sources": True
+                })
+            yield {"type": "done"}
+            
+        except Exception as e:
+            logger.error(f"Error in RAG answer streaming: {str(e)}", exc_info=True)
+            yield {"type": "error", "error": str(e)}
+    
+    async def _retrieve(
+        self,
+        db: Session,
+        query: str,
+        collection_ids: Optional[List[int]],
+        tag_ids: Optional[List[int]],
+        year_from: Optional[int],
+        year_to: Optional[int],
+        max_papers: int
+    ) -> Tuple[Optional[List[float]], Optional[Tuple], Optional[Dict[str, Any]], List]:
+        """
+        Embed the question, check the semantic answer cache, and on a miss
+        retrieve the context papers.
+        
+        Returns:
+            (query embedding, semantic cache key, cached response or None,
+            search results); the key is None if the question could not be
+            embedded, and the results are empty on a cache hit
+        """
+        # Reuse the answer to a near-identical recent question
+        query_embedding = await EmbeddingService.generate_embedding(query)
+        cache_key = None
+        if query_embedding is not None:
+            paper_count, last_update = db.query(func.count(Paper.id), func.max(Paper.updated_at)).one()
+            cache_key = (
+                tuple(sorted(collection_ids or ())), tuple(sorted(tag_ids or ())),
+                year_from, year_to, max_papers, paper_count, last_update
+            )
+            cached = await semantic_answer_cache.lookup(query_embedding, cache_key)
+            if cached is not None:
+                logger.info(f"RAG: Semantic cache hit for query: {query[:100]}")
+                return query_embedding, cache_key, cached, []
+        
+        # Retrieve relevant papers using semantic search
+        logger.info(f"RAG: Retrieving papers for query: {query[:100]}...")
+        search_results = await VectorSearchService.semantic_search(
+            db=db,
+            query=query,
+            limit=max_papers,
+            min_score=0.2,  # Lowered from 0.3 to handle meta-linguistic queries like "what do I have"
+            collection_ids=collection_ids,
+            tag_ids=tag_ids,
+            year_from=year_from,
+            year_to=year_to,
+            query_embedding=query_embedding
+        )
+        return query_embedding, cache_key, None, search_results
+    
+    @staticmethod
+    def _format_sources(search_results: List) -> List[Dict[str, Any]]:
+        """Source entries returned alongside an answer."""
+        return [
+            {
+                "paper_id": result.paper.id,
+                "title": result.paper.title,
+                "authors": result.paper.authors,
+                "year": result.paper.year,
+                "relevance_score": round(result.score, 4),
+                "doi": result.paper.doi,
+                "journal": result.paper.journal
+            }
+            for result in search_results
+        ]
+    
     def _build_context(self, search_results: List) -> str:
         """
         Build context string from retrieved papers.
@@ -167,6 +486,21 @@ class RAGService:
         Returns:
             Generated answer
         """
+        try:
+            answer = await self._complete(
+                self._answer_messages(query, context),
+                max_tokens=self.max_tokens,
+                temperature=0.3,  # Lower temperature for more factual answers
+            )
+            return answer
+            
+        except Exception as e:
+            logger.error(f"Error calling OpenAI API: {str(e)}", exc_info=True)
+            raise Exception(f"Failed to generate answer: {str(e)}")
+    
+    @staticmethod
+    def _answer_messages(query: str, context: str) -> List[Dict[str, str]]:
+        """Chat messages asking the LLM to answer query from context."""
         system_prompt = """You are a helpful research assistant for SciLib, a scientific paper manager.
 Your task is to answer questions based on the user's paper library.
 
@@ -188,23 +522,10 @@ Papers:
 
 Please provide a clear, well-structured answer with citations to the specific papers."""
         
-        try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=self.max_tokens,
-                temperature=0.3,  # Lower temperature for more factual answers
-            )
-            
-            answer = response.choices[0].message.content.strip()
-            return answer
-            
-        except Exception as e:
-            logger.error(f"Error calling OpenAI API: {str(e)}", exc_info=True)
-            raise Exception(f"Failed to generate answer: {str(e)}")
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
     
     async def generate_enhanced_query(
         self,
@@ -224,6 +545,13 @@ Please provide a clear, well-structured answer with citations to the specific pa
         Returns:
             Enhanced search query
         """
+        # Repeat searches skip the paper lookup and the Redis round trip. The
+        # first sampled enhancement is reused, as in the response cache
+        cache_key = (self.model, user_query, paper_id)
+        if cache_key in _enhanced_query_cache:
+            _enhanced_query_cache.move_to_end(cache_key)
+            return _enhanced_query_cache[cache_key]
+        
         try:
             # Build context if paper provided
             context = ""
@@ -244,18 +572,19 @@ Return ONLY the enhanced query, no explanations."""
             
             user_prompt = f"Original query: {user_query}{context}\n\nGenerate an enhanced search query:"
             
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            enhanced = await self._complete(
+                [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
                 max_tokens=150,
                 temperature=0.5
             )
-            
-            enhanced = response.choices[0].message.content.strip()
             logger.info(f"Enhanced query: {user_query} -> {enhanced}")
+            
+            _enhanced_query_cache[cache_key] = enhanced
+            if len(_enhanced_query_cache) > ENHANCED_QUERY_CACHE_SIZE:
+                _enhanced_query_cache.popitem(last=False)
             return enhanced
             
         except Exception as e:
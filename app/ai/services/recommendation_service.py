@@ -8,17 +8,49 @@ Generates paper recommendations based on multiple similarity strategies:
 - Author-based similarity
 """
 
+import itertools
 import logging
-from typing import List, Optional, Dict, Any, Tuple
+from functools import lru_cache
+from typing import FrozenSet, List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+import numpy as np
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import text, and_, or_
 
 from app.database.models import Paper, Collection
 from app.ai.services.embedding_service import EmbeddingService
+from app.ai.services.vector_search_service import embedding_matrix_cache, halfvec_supported
 
 logger = logging.getLogger(__name__)
 
+# Nearest neighbours shortlisted per requested recommendation; the other
+# strategies only rerank this shortlist
+SHORTLIST_FACTOR = 4
+
+
+@lru_cache(maxsize=4096)
+def _author_set(authors: str) -> FrozenSet[str]:
+    """Lower-cased author names of a comma-separated author string."""
+    return frozenset(author.strip().lower() for author in authors.split(','))
+
+
+# Dense bit positions for collection ids, assigned on first sight, so
+# collection sets are small int bitmasks however large the ids get
+_collection_bits: Dict[int, int] = {}
+_next_collection_bit = itertools.count()
+
+
+def _collection_mask(paper: Paper) -> int:
+    """Bitmask of a paper's collections."""
+    mask = 0
+    for col in paper.collections:
+        bit = _collection_bits.get(col.id)
+        if bit is None:
+            # next() on a count is atomic, so concurrent requests never share a bit
+            bit = _collection_bits.setdefault(col.id, next(_next_collection_bit))
+        mask |= 1 << bit
+    return mask
+
 
 class RecommendationStrategy:
     """Base class for recommendation strategies"""
@@ -56,6 +88,52 @@ class VectorSimilarityStrategy(RecommendationStrategy):
         except Exception as e:
             logger.error(f"Error calculating vector similarity: {str(e)}")
             return 0.0
+    
+    def nearest(
+        self,
+        target_paper: Paper,
+        db: Session,
+        exclude_ids: List[int],
+        limit: int
+    ) -> Optional[List[Tuple[int, float]]]:
+        """
+        Find the papers most similar to the target in one query.
+        
+        Returns:
+            (paper_id, similarity) pairs, most similar first, or None if
+            the search failed
+        """
+        # ORDER BY <=> ... LIMIT on the halfvec cast is served by the HNSW
+        # index (ix_papers_embedding_hnsw)
+        sql = """
+            SELECT
+                p.id,
+                1 - (p.embedding_title_abstract::halfvec(1536) <=> CAST(:target_embedding AS halfvec(1536))) AS similarity
+            FROM papers p
+            WHERE p.embedding_title_abstract IS NOT NULL
+              AND p.id != ALL(:exclude_ids)
+            ORDER BY p.embedding_title_abstract::halfvec(1536) <=> CAST(:target_embedding AS halfvec(1536))
+            LIMIT :limit
+        """
+        embedding_list = [float(x) for x in target_paper.embedding_title_abstract]
+        
+        try:
+            if halfvec_supported(db):
+                # Savepoint: a failed query must not roll back the caller's session
+                with db.begin_nested():
+                    rows = db.execute(text(sql), {
+                        "target_embedding": str(embedding_list),
+                        "exclude_ids": exclude_ids,
+                        "limit": limit
+                    }).fetchall()
+            else:
+                excluded = set(exclude_ids)
+                rows = embedding_matrix_cache.top_k(db, embedding_list, limit + len(excluded))
+                rows = [row for row in rows if row[0] not in excluded][:limit]
+            return [(row_id, float(similarity)) for row_id, similarity in rows]
+        except Exception as e:
+            logger.error(f"Error finding nearest papers: {str(e)}")
+            return None
 
 
 # TagSimilarityStrategy removed - tags feature disabled
@@ -66,14 +144,14 @@ class CollectionSimilarityStrategy(RecommendationStrategy):
     
     def calculate_score(self, target_paper: Paper, candidate: Paper, db: Session) -> float:
         """Calculate Jaccard similarity of collections"""
-        target_collections = set(col.id for col in target_paper.collections)
-        candidate_collections = set(col.id for col in candidate.collections)
+        target_collections = _collection_mask(target_paper)
+        candidate_collections = _collection_mask(candidate)
         
         if not target_collections or not candidate_collections:
             return 0.0
         
-        intersection = len(target_collections & candidate_collections)
-        union = len(target_collections | candidate_collections)
+        intersection = (target_collections & candidate_collections).bit_count()
+        union = (target_collections | candidate_collections).bit_count()
         
         return intersection / union if union > 0 else 0.0
 
@@ -83,9 +161,10 @@ class AuthorSimilarityStrategy(RecommendationStrategy):
     
     def calculate_score(self, target_paper: Paper, candidate: Paper, db: Session) -> float:
         """Calculate author overlap (normalized)"""
-        # Simple approach: check if any author appears in both papers
-        target_authors = set(author.strip().lower() for author in target_paper.authors.split(','))
-        candidate_authors = set(author.strip().lower() for author in candidate.authors.split(','))
+        # Simple approach: check if any author appears in both papers. The
+        # target's set is parsed once, not once per candidate
+        target_authors = _author_set(target_paper.authors)
+        candidate_authors = _author_set(candidate.authors)
         
         if not target_authors or not candidate_authors:
             return 0.0
@@ -183,8 +262,9 @@ class RecommendationService:
         Returns:
             List of RecommendationResult objects ordered by score
         """
-        # Get target paper
-        target_paper = db.query(Paper).filter(Paper.id == paper_id).first()
+        # Get target paper. Collections are loaded up front for every paper
+        # here, in one query per batch rather than one lazy load per paper
+        target_paper = db.query(Paper).options(selectinload(Paper.collections)).filter(Paper.id == paper_id).first()
         if not target_paper:
             logger.warning(f"Paper {paper_id} not found")
             return []
@@ -193,13 +273,29 @@ class RecommendationService:
         if strategies is None:
             strategies = RecommendationService.DEFAULT_STRATEGIES
         
-        # Get all candidate papers (exclude target and specified IDs)
-        exclude_ids = exclude_ids or []
-        exclude_ids.append(paper_id)
+        # Exclude target and specified IDs
+        exclude_ids = list(exclude_ids or []) + [paper_id]
         
-        candidates = db.query(Paper).filter(
-            Paper.id.notin_(exclude_ids)
-        ).all()
+        # Shortlist the target's nearest neighbours in one query, with their
+        # similarities, instead of one similarity query per paper
+        vector_strategy = next(
+            (strategy for _, strategy in strategies if isinstance(strategy, VectorSimilarityStrategy)), None
+        )
+        similarities = None
+        if vector_strategy is not None and target_paper.embedding_title_abstract is not None:
+            nearest = vector_strategy.nearest(target_paper, db, exclude_ids, limit * SHORTLIST_FACTOR)
+            if nearest:
+                similarities = dict(nearest)
+        
+        if similarities is not None:
+            candidates = db.query(Paper).options(selectinload(Paper.collections)).filter(
+                Paper.id.in_(list(similarities))
+            ).all()
+        else:
+            # Nothing to shortlist by embedding: score every other paper
+            candidates = db.query(Paper).options(selectinload(Paper.collections)).filter(
+                Paper.id.notin_(exclude_ids)
+            ).all()
         
         if not candidates:
             logger.info(f"No candidate papers for recommendations (paper {paper_id})")
@@ -207,34 +303,35 @@ class RecommendationService:
         
         logger.info(f"Generating recommendations for paper {paper_id} from {len(candidates)} candidates")
         
-        # Calculate scores for each candidate
-        results = []
-        for candidate in candidates:
-            strategy_scores = {}
-            total_score = 0.0
-            
-            for strategy_name, strategy in strategies:
+        # Score matrix: one row per candidate, one column per strategy
+        names = [strategy_name for strategy_name, _ in strategies]
+        weights = np.array([strategy.weight for _, strategy in strategies], dtype=np.float64)
+        features = np.zeros((len(candidates), len(strategies)), dtype=np.float64)
+        for column, (strategy_name, strategy) in enumerate(strategies):
+            if similarities is not None and strategy is vector_strategy:
+                features[:, column] = np.fromiter(
+                    (similarities[candidate.id] for candidate in candidates), dtype=np.float64, count=len(candidates)
+                )
+                continue
+            for row, candidate in enumerate(candidates):
                 try:
-                    score = strategy.calculate_score(target_paper, candidate, db)
-                    weighted_score = score * strategy.weight
-                    strategy_scores[strategy_name] = score
-                    total_score += weighted_score
+                    features[row, column] = strategy.calculate_score(target_paper, candidate, db)
                 except Exception as e:
                     logger.error(f"Error in {strategy_name} strategy: {str(e)}")
-                    strategy_scores[strategy_name] = 0.0
-            
-            # Normalize total score by sum of weights
-            total_weight = sum(s.weight for _, s in strategies)
-            total_score = total_score / total_weight if total_weight > 0 else 0.0
-            
-            if total_score >= min_score:
-                results.append(RecommendationResult(candidate, total_score, strategy_scores))
         
-        # Sort by total score
-        results.sort(key=lambda x: x.total_score, reverse=True)
+        # Weighted sum normalized by the sum of weights, for all candidates at once
+        total_weight = weights.sum()
+        totals = features @ weights / total_weight if total_weight > 0 else np.zeros(len(candidates))
+        
+        # Top `limit` above min_score; the stable sort keeps ties in candidate order
+        eligible = np.flatnonzero(totals >= min_score)
+        top = eligible[np.argsort(-totals[eligible], kind="stable")][:limit]
         
-        # Limit results
-        results = results[:limit]
+        # Result objects only for the returned papers
+        results = [
+            RecommendationResult(candidates[row], float(totals[row]), dict(zip(names, features[row].tolist())))
+            for row in top
+        ]
         
         logger.info(f"Generated {len(results)} recommendations for paper {paper_id}")
         
@@ -2,13 +2,23 @@
 AI service for smart research field classification.
 Analyzes papers and assigns them to 1-3 research field collections.
 """
+import asyncio
 import logging
 from typing import List, Dict, Any
 import json
-from openai import OpenAI
+from openai import AsyncOpenAI, APITimeoutError, RateLimitError
+
+from ..utils import async_retry_with_exponential_backoff
 
 logger = logging.getLogger(__name__)
 
+# Papers classified per request by classify_papers_batch
+CLASSIFY_BATCH_SIZE = 15
+# Soft cap on the titles and abstracts packed into one request (estimated tokens)
+CLASSIFY_BATCH_MAX_TOKENS = 6000
+# Classification requests in flight at once per service instance
+CLASSIFY_CONCURRENCY = 8
+
 
 class SmartCollectionService:
     """Service for AI-powered research field classification."""
@@ -55,10 +65,32 @@ class SmartCollectionService:
     ]
     
     def __init__(self, openai_api_key: str):
-        """Initialize with OpenAI API key."""
-        self.client = OpenAI(api_key=openai_api_key)
+        """
+        Initialize with OpenAI API key.
+        
+        The client's pooled connections belong to the event loop that opens
+        them, so use an instance within a single asyncio.run() call and
+        close() it before that call returns.
+        """
+        # Retries are handled by _create_completion
+        self.client = AsyncOpenAI(api_key=openai_api_key, max_retries=0)
+        self._semaphore = asyncio.Semaphore(CLASSIFY_CONCURRENCY)
+    
+    async def close(self):
+        """Close the client's connections; await before the event loop ends."""
+        await self.client.close()
     
-    def classify_paper(self, title: str, abstract: str = None) -> List[Dict[str, str]]:
+    @async_retry_with_exponential_backoff(
+        max_retries=2,
+        initial_delay=1.0,
+        exceptions=(RateLimitError, APITimeoutError)
+    )
+    async def _create_completion(self, **params):
+        """Chat completion with at most CLASSIFY_CONCURRENCY in flight, retried on rate limits and timeouts."""
+        async with self._semaphore:
+            return await self.client.chat.completions.create(**params)
+    
+    async def classify_paper(self, title: str, abstract: str = None) -> List[Dict[str, str]]:
         """
         Classify a paper into 1-3 research fields with descriptions.
         
@@ -94,7 +126,7 @@ Example format:
 Ensure fields are general enough to group multiple papers but specific enough to be meaningful.
 """
             
-            response = self.client.chat.completions.create(
+            response = await self._create_completion(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "You are a research field classification expert. Return only valid JSON arrays with name and description fields."},
@@ -108,18 +140,10 @@ Ensure fields are general enough to group multiple papers but specific enough to
             
             # Parse JSON response
             try:
-                fields = json.loads(result_text)
-                if isinstance(fields, list) and 1 <= len(fields) <= 3:
-                    # Validate structure
-                    if all(isinstance(f, dict) and 'name' in f and 'description' in f for f in fields):
-                        logger.info(f"Classified paper '{title}' into fields: {[f['name'] for f in fields]}")
-                        return fields
-                    else:
-                        logger.warning(f"Invalid field structure: {fields}")
-                        return []
-                else:
-                    logger.warning(f"Invalid field count: {fields}")
-                    return []
+                fields = self._validate_fields(json.loads(result_text))
+                if fields:
+                    logger.info(f"Classified paper '{title}' into fields: {[f['name'] for f in fields]}")
+                return fields
             except json.JSONDecodeError:
                 logger.error(f"Failed to parse JSON response: {result_text}")
                 return []
@@ -128,9 +152,28 @@ Ensure fields are general enough to group multiple papers but specific enough to
             logger.error(f"Error classifying paper: {e}")
             return []
     
-    def classify_papers_batch(self, papers: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, str]]]:
+    @staticmethod
+    def _validate_fields(fields: Any) -> List[Dict[str, str]]:
+        """Return fields if it is a list of 1-3 name/description dicts, else []."""
+        if isinstance(fields, list) and 1 <= len(fields) <= 3:
+            # Validate structure
+            if all(isinstance(f, dict) and 'name' in f and 'description' in f for f in fields):
+                return fields
+            else:
+                logger.warning(f"Invalid field structure: {fields}")
+                return []
+        else:
+            logger.warning(f"Invalid field count: {fields}")
+            return []
+    
+    async def classify_papers_batch(self, papers: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, str]]]:
         """
-        Classify multiple papers.
+        Classify multiple papers, up to CLASSIFY_BATCH_SIZE per request.
+        
+        Batches also stay under CLASSIFY_BATCH_MAX_TOKENS of paper text and
+        are sent concurrently. A batch whose response fails or does not parse
+        is classified paper by paper instead, as are papers missing from or
+        invalid in the response.
         
         Args:
             papers: List of paper dicts with 'id', 'title', 'abstract'
@@ -138,18 +181,98 @@ Ensure fields are general enough to group multiple papers but specific enough to
         Returns:
             Dict mapping paper_id to list of research fields
         """
-        results = {}
+        batches = []
+        batch = []
+        batch_tokens = 0
         for paper in papers:
-            paper_id = paper.get('id')
-            title = paper.get('title', '')
-            abstract = paper.get('abstract', '')
-            
-            if not title:
-                logger.warning(f"Skipping paper {paper_id} with no title")
+            if not paper.get('title'):
+                logger.warning(f"Skipping paper {paper.get('id')} with no title")
                 continue
             
-            fields = self.classify_paper(title, abstract)
+            # Rough estimate: 1 token ≈ 4 characters
+            tokens = (len(paper['title']) + len(paper.get('abstract') or '')) // 4
+            if batch and (len(batch) == CLASSIFY_BATCH_SIZE or batch_tokens + tokens > CLASSIFY_BATCH_MAX_TOKENS):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(paper)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        
+        results = {}
+        for batch_results in await asyncio.gather(*(self._classify_batch(batch) for batch in batches)):
+            results.update(batch_results)
+        return results
+    
+    async def _classify_batch(self, papers: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, str]]]:
+        """Classify papers in one request, falling back to classify_paper per paper."""
+        if len(papers) == 1:
+            paper = papers[0]
+            fields = await self.classify_paper(paper['title'], paper.get('abstract'))
+            return {paper.get('id'): fields} if fields else {}
+        
+        # Papers are numbered by position, which the response is keyed by
+        blocks = []
+        for number, paper in enumerate(papers, 1):
+            text = f"Paper {number}\nTitle: {paper['title']}"
+            if paper.get('abstract'):
+                text += f"\nAbstract: {paper['abstract']}"
+            blocks.append(text)
+        papers_text = "\n\n".join(blocks)
+        
+        prompt = f"""Analyze each of these {len(papers)} research papers and identify the 1-3 most relevant research fields for each.
+
+{papers_text}
+
+Choose from these common fields (or suggest closely related ones if none fit):
+{', '.join(self.COMMON_FIELDS)}
+
+Return ONLY a JSON object mapping each paper number to an array of 1-3 objects with "name" and "description" fields.
+Each description should be 1-3 sentences explaining what that research field encompasses.
+
+Example format:
+{{
+  "1": [{{"name": "Machine Learning", "description": "Study of algorithms and statistical models that enable computers to learn and improve from experience without explicit programming."}}],
+  "2": [{{"name": "Computer Vision", "description": "Field focused on enabling computers to understand and process visual information from images and videos."}}]
+}}
+
+Use the same name for the same field across papers.
+Ensure fields are general enough to group multiple papers but specific enough to be meaningful.
+"""
+        
+        try:
+            response = await self._create_completion(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": "You are a research field classification expert. Return only valid JSON objects mapping paper numbers to arrays with name and description fields."},
+                    {"role": "user", "content": prompt}
+                ],
+                response_format={"type": "json_object"},
+                temperature=0.3,
+                max_tokens=300 * len(papers)
+            )
+            classified = json.loads(response.choices[0].message.content)
+            if not isinstance(classified, dict):
+                raise ValueError(f"expected a JSON object, got {type(classified).__name__}")
+        except Exception as e:
+            logger.error(f"Batch classification of {len(papers)} papers failed, classifying individually: {e}")
+            classified = {}
+        
+        results = {}
+        retry = []
+        for number, paper in enumerate(papers, 1):
+            fields = self._validate_fields(classified[str(number)]) if str(number) in classified else []
+            if fields:
+                logger.info(f"Classified paper '{paper['title']}' into fields: {[f['name'] for f in fields]}")
+                results[paper.get('id')] = fields
+            else:
+                retry.append(paper)
+        
+        retried = await asyncio.gather(*(
+            self.classify_paper(paper['title'], paper.get('abstract')) for paper in retry
+        ))
+        for paper, fields in zip(retry, retried):
             if fields:
-                results[paper_id] = fields
+                results[paper.get('id')] = fields
         
         return results
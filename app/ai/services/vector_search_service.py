@@ -5,16 +5,25 @@ Implements semantic search over papers using vector embeddings.
 Supports pure semantic search, keyword search, and hybrid search.
 """
 
+import asyncio
 import logging
+import threading
+import time
+from datetime import timedelta
 from typing import List, Optional, Dict, Any, Tuple
+import numpy as np
 from sqlalchemy import text, or_, and_
 from sqlalchemy.orm import Session
 
+from app.database.connection import pgvector_has_halfvec
 from app.database.models import Paper, Collection
-from app.ai.services.embedding_service import EmbeddingService
+from app.ai.services.embedding_service import EmbeddingService, EMBEDDING_DIMENSION
 
 logger = logging.getLogger(__name__)
 
+# How long cached Paper.similar_papers results stay valid
+SIMILAR_PAPERS_TTL = timedelta(hours=24)
+
 
 class SearchResult:
     """Container for search results with metadata"""
@@ -53,7 +62,8 @@ class VectorSearchService:
         collection_ids: Optional[List[int]] = None,
         tag_ids: Optional[List[int]] = None,
         year_from: Optional[int] = None,
-        year_to: Optional[int] = None
+        year_to: Optional[int] = None,
+        query_embedding: Optional[List[float]] = None
     ) -> List[SearchResult]:
         """
         Perform semantic search using vector similarity.
@@ -67,6 +77,7 @@ class VectorSearchService:
             tag_ids: Filter by tag IDs
             year_from: Filter papers from this year onwards
             year_to: Filter papers up to this year
+            query_embedding: Embedding of query, if the caller already has it
             
         Returns:
             List of SearchResult objects ordered by relevance
@@ -76,17 +87,24 @@ class VectorSearchService:
             return []
         
         # Generate embedding for query
-        query_embedding = await EmbeddingService.generate_embedding(query)
+        if query_embedding is None:
+            query_embedding = await EmbeddingService.generate_embedding(query)
         
         if query_embedding is None:
             logger.error("Failed to generate embedding for query")
             return []
         
-        # Build SQL query with filters
-        sql = """
+        # Build SQL query with filters (halfvec cast matches ix_papers_embedding_hnsw;
+        # pgvector < 0.7 has no halfvec and scans the plain vectors instead)
+        distance = (
+            "p.embedding_title_abstract::halfvec(1536) <=> CAST(:query_embedding AS halfvec(1536))"
+            if halfvec_supported(db)
+            else "p.embedding_title_abstract <=> CAST(:query_embedding AS vector(1536))"
+        )
+        sql = f"""
             SELECT 
                 p.id,
-                1 - (p.embedding_title_abstract <=> CAST(:query_embedding AS vector)) AS similarity
+                1 - ({distance}) AS similarity
             FROM papers p
             WHERE p.embedding_title_abstract IS NOT NULL
         """
@@ -116,12 +134,12 @@ class VectorSearchService:
             params["year_to"] = year_to
         
         # Add minimum score filter
-        sql += " AND (1 - (p.embedding_title_abstract <=> CAST(:query_embedding AS vector))) >= :min_score"
+        sql += f" AND (1 - ({distance})) >= :min_score"
         params["min_score"] = min_score
         
         # Order and limit
-        sql += """
-            ORDER BY p.embedding_title_abstract <=> CAST(:query_embedding AS vector)
+        sql += f"""
+            ORDER BY {distance}
             LIMIT :limit
         """
         params["limit"] = limit
@@ -131,16 +149,21 @@ class VectorSearchService:
             result = db.execute(text(sql), params)
             rows = result.fetchall()
             
-            # Fetch full paper objects and create SearchResults
-            results = []
-            for paper_id, similarity in rows:
-                paper = db.query(Paper).filter(Paper.id == paper_id).first()
-                if paper:
-                    results.append(SearchResult(
-                        paper=paper,
-                        score=float(similarity),
-                        match_type="semantic"
-                    ))
+            # Fetch full paper objects in one query and create SearchResults
+            papers_by_id = {}
+            if rows:
+                matched = db.query(Paper).filter(Paper.id.in_([paper_id for paper_id, _ in rows])).all()
+                papers_by_id = {paper.id: paper for paper in matched}
+            
+            results = [
+                SearchResult(
+                    paper=papers_by_id[paper_id],
+                    score=float(similarity),
+                    match_type="semantic"
+                )
+                for paper_id, similarity in rows
+                if paper_id in papers_by_id
+            ]
             
             logger.info(f"Semantic search for '{query[:50]}...' returned {len(results)} results")
             return results
@@ -332,6 +355,219 @@ async def search_papers(
     return [result.to_dict() for result in results]
 
 
+def similar_paper_entry(paper: Paper, similarity: float) -> Dict[str, Any]:
+    """Build the dictionary returned for one similar paper."""
+    return {
+        "paper_id": paper.id,
+        "title": paper.title,
+        "authors": paper.authors,
+        "abstract": paper.abstract[:300] + "..." if paper.abstract and len(paper.abstract) > 300 else paper.abstract,
+        "year": paper.year,
+        "journal": paper.journal,
+        "doi": paper.doi,
+        "similarity_score": round(float(similarity), 4),
+        "has_summary": paper.ai_summary_short is not None
+    }
+
+
+class SimilarityQueryCache:
+    """
+    In-process semantic cache in front of find_similar_papers.
+    
+    Entries are keyed by the L2-normalized source embedding. A lookup whose
+    cosine similarity to a stored embedding reaches ``threshold`` reuses that
+    entry's results instead of querying the vector store, so near-duplicate
+    papers share one search. Entries are only valid for the same limit,
+    min_score and number of embedded papers they were computed with; the
+    least recently used entry is evicted once ``max_entries`` is reached.
+    """
+    
+    def __init__(self, dim: int = EMBEDDING_DIMENSION, max_entries: int = 1024, threshold: float = 0.98):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * max_entries
+        self._last_used = np.zeros(max_entries, dtype=np.int64)  # 0 marks an empty slot
+        self._clock = 0
+        self._lock = asyncio.Lock()
+    
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        return vector / norm
+    
+    async def lookup(
+        self,
+        embedding,
+        paper_id: int,
+        limit: int,
+        min_score: float,
+        corpus_size: int
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Return cached similar papers for an embedding, or None on a miss.
+        
+        On a hit from a different source paper, the querying paper is removed
+        from the cached results and the cached source paper is added in its
+        place, scored by its similarity to the query.
+        """
+        query = self._normalize(embedding)
+        if query is None:
+            return None
+        
+        async with self._lock:
+            if self._clock == 0:
+                return None
+            
+            # Only entries computed with the same parameters can answer, so a
+            # closer entry stored under another key must not hide them
+            key = (limit, min_score, corpus_size)
+            usable = np.fromiter(
+                (entry is not None and entry["key"] == key for entry in self._entries),
+                dtype=bool, count=self.max_entries
+            )
+            if not usable.any():
+                return None
+            
+            scores = self._vectors @ query
+            scores[~usable] = -1.0
+            slot = int(np.argmax(scores))
+            score = float(scores[slot])
+            entry = self._entries[slot]
+            
+            if score < self.threshold:
+                return None
+            
+            self._clock += 1
+            self._last_used[slot] = self._clock
+        
+        results = [r for r in entry["results"] if r["paper_id"] != paper_id]
+        source = entry["source"]
+        if source["paper_id"] != paper_id and score >= min_score:
+            results.append({**source, "similarity_score": round(score, 4)})
+            results.sort(key=lambda r: r["similarity_score"], reverse=True)
+        
+        return results[:limit]
+    
+    async def store(
+        self,
+        embedding,
+        source: Dict[str, Any],
+        limit: int,
+        min_score: float,
+        corpus_size: int,
+        results: List[Dict[str, Any]]
+    ) -> None:
+        """Remember the results computed for a source paper's embedding."""
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+        
+        async with self._lock:
+            # Overwrite this paper's previous entry, else fill an empty or the LRU slot
+            slot = next(
+                (i for i, entry in enumerate(self._entries)
+                 if entry is not None and entry["source"]["paper_id"] == source["paper_id"]),
+                int(np.argmin(self._last_used))
+            )
+            
+            self._clock += 1
+            self._vectors[slot] = vector
+            self._entries[slot] = {
+                "source": source,
+                "key": (limit, min_score, corpus_size),
+                "results": results
+            }
+            self._last_used[slot] = self._clock
+
+
+# Shared by the API process
+similarity_query_cache = SimilarityQueryCache()
+
+
+class EmbeddingMatrixCache:
+    """
+    In-memory copy of all paper embeddings for brute-force similarity search.
+    
+    Fallback for databases whose pgvector lacks halfvec (< 0.7), where the
+    SQL similarity query fails. Embeddings are held as one contiguous,
+    L2-normalized float32 matrix so a query is a single matrix-vector product;
+    the matrix is reloaded once it is older than ``ttl`` seconds.
+    """
+    
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._matrix = np.zeros((0, EMBEDDING_DIMENSION), dtype=np.float32)
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+    
+    def _load(self, db: Session) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            if time.monotonic() - self._loaded_at > self.ttl:
+                rows = db.query(Paper.id, Paper.embedding_title_abstract).filter(
+                    Paper.embedding_title_abstract.isnot(None)
+                ).all()
+                ids = np.array([row_id for row_id, _ in rows], dtype=np.int64)
+                matrix = np.array([embedding for _, embedding in rows], dtype=np.float32)
+                matrix = matrix.reshape(len(rows), EMBEDDING_DIMENSION)
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                norms[norms == 0.0] = 1.0
+                self._ids = ids
+                self._matrix = np.ascontiguousarray(matrix / norms)
+                self._loaded_at = time.monotonic()
+            return self._ids, self._matrix
+    
+    def top_k(
+        self,
+        db: Session,
+        embedding,
+        limit: int,
+        exclude_id: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """Return (paper_id, cosine similarity) pairs for the ``limit`` nearest papers."""
+        ids, matrix = self._load(db)
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if norm == 0.0 or len(ids) == 0:
+            return []
+        
+        scores = matrix @ (query / norm)
+        if exclude_id is not None:
+            scores[ids == exclude_id] = -np.inf
+        
+        # argpartition selects the top k in O(N); only those k get sorted
+        k = min(limit, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+
+embedding_matrix_cache = EmbeddingMatrixCache()
+
+# Whether the database's pgvector supports halfvec; checked once per process
+_halfvec_supported: Optional[bool] = None
+
+
+def halfvec_supported(db: Session) -> bool:
+    """
+    Whether similarity queries can use the halfvec cast (pgvector >= 0.7).
+    
+    The version check runs once per process. Callers fall back to
+    embedding_matrix_cache when this is False instead of trying the query
+    and rolling back the session on failure.
+    """
+    global _halfvec_supported
+    if _halfvec_supported is None:
+        _halfvec_supported = pgvector_has_halfvec(db)
+        if not _halfvec_supported:
+            logger.warning("pgvector lacks halfvec (< 0.7); similarity search runs in memory")
+    return _halfvec_supported
+
+
 async def find_similar_papers(
     db: Session,
     paper_id: int,
@@ -354,6 +590,22 @@ async def find_similar_papers(
     Returns:
         List of similar paper dictionaries with similarity scores
     """
+    return query_similar_papers(db, paper_id, limit, min_score, exclude_self)
+
+
+def query_similar_papers(
+    db: Session,
+    paper_id: int,
+    limit: int = 10,
+    min_score: float = 0.5,
+    exclude_self: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    Synchronous core of find_similar_papers.
+    
+    Async endpoints holding an AsyncSession call this through
+    ``await db.run_sync(query_similar_papers, ...)``.
+    """
     # Get the source paper's embedding
     paper = db.query(Paper).filter(Paper.id == paper_id).first()
     
@@ -365,11 +617,12 @@ async def find_similar_papers(
         logger.warning(f"Paper {paper_id} has no embedding")
         return []
     
-    # Build SQL query for vector similarity search
+    # Nearest neighbours by cosine distance; ORDER BY <=> ... LIMIT on the
+    # halfvec cast is served by the HNSW index (ix_papers_embedding_hnsw)
     sql = """
         SELECT 
             p.id,
-            1 - (p.embedding_title_abstract <=> CAST(:source_embedding AS vector)) AS similarity
+            1 - (p.embedding_title_abstract::halfvec(1536) <=> CAST(:source_embedding AS halfvec(1536))) AS similarity
         FROM papers p
         WHERE p.embedding_title_abstract IS NOT NULL
     """
@@ -383,37 +636,35 @@ async def find_similar_papers(
         sql += " AND p.id != :paper_id"
         params["paper_id"] = paper_id
     
-    # Add minimum score filter
-    sql += " AND (1 - (p.embedding_title_abstract <=> CAST(:source_embedding AS vector))) >= :min_score"
-    params["min_score"] = min_score
-    
-    # Order by similarity and limit
+    # Order by similarity and limit. min_score is applied to the returned rows
+    # rather than in WHERE: rows are sorted by distance, so the result is the
+    # same, and the planner keeps a plain index scan.
     sql += """
-        ORDER BY p.embedding_title_abstract <=> CAST(:source_embedding AS vector)
+        ORDER BY p.embedding_title_abstract::halfvec(1536) <=> CAST(:source_embedding AS halfvec(1536))
         LIMIT :limit
     """
     params["limit"] = limit
     
     try:
-        result = db.execute(text(sql), params)
-        rows = result.fetchall()
-        
-        # Fetch full paper objects and create results
-        results = []
-        for similar_paper_id, similarity in rows:
-            similar_paper = db.query(Paper).filter(Paper.id == similar_paper_id).first()
-            if similar_paper:
-                results.append({
-                    "paper_id": similar_paper.id,
-                    "title": similar_paper.title,
-                    "authors": similar_paper.authors,
-                    "abstract": similar_paper.abstract[:300] + "..." if similar_paper.abstract and len(similar_paper.abstract) > 300 else similar_paper.abstract,
-                    "year": similar_paper.year,
-                    "journal": similar_paper.journal,
-                    "doi": similar_paper.doi,
-                    "similarity_score": round(float(similarity), 4),
-                    "has_summary": similar_paper.ai_summary_short is not None
-                })
+        if halfvec_supported(db):
+            rows = db.execute(text(sql), params).fetchall()
+        else:
+            rows = embedding_matrix_cache.top_k(
+                db, embedding_list, limit, paper_id if exclude_self else None
+            )
+        rows = [(row_id, similarity) for row_id, similarity in rows if similarity >= min_score]
+        
+        # Load all matched papers in one query instead of one per row
+        papers_by_id = {}
+        if rows:
+            matched = db.query(Paper).filter(Paper.id.in_([row_id for row_id, _ in rows])).all()
+            papers_by_id = {p.id: p for p in matched}
+        
+        results = [
+            similar_paper_entry(papers_by_id[similar_paper_id], similarity)
+            for similar_paper_id, similarity in rows
+            if similar_paper_id in papers_by_id
+        ]
         
         logger.info(f"Found {len(results)} similar papers for paper {paper_id}")
         return results
@@ -3,19 +3,26 @@ Celery tasks for background AI metadata extraction.
 """
 import os
 import re
+import json
 import shutil
 from pathlib import Path
 from typing import Dict, Any, Optional
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 
 try:
-    from celery import Celery
+    from celery import Celery, Task
+    from celery.signals import task_prerun, task_postrun
 except ImportError:
     # Handle case where Celery is not installed yet
     Celery = None
 
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
 from .agents.metadata_pipeline import MetadataExtractionPipeline
+from .utils import run_async
+from ..database.models import Paper as PaperModel
 
 # Load environment variables (helpful when Celery spawns workers)
 try:
@@ -29,12 +36,89 @@ except Exception:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
+
+# Redis pub/sub channel carrying status updates for one task (see /api/ai/ws/status)
+TASK_STATUS_CHANNEL = "task:{task_id}"
+
+
+def task_status_payload(task_id: str, state: str, info: Any) -> Dict[str, Any]:
+    """
+    Build the client-facing status dict for a Celery task state.
+    
+    Shared by the /api/ai/status endpoint and the WebSocket status push.
+    """
+    if state == 'PENDING':
+        return {
+            "task_id": task_id,
+            "status": "pending",
+            "progress": 0,
+            "message": "Task is waiting to start"
+        }
+    elif state == 'PROGRESS':
+        return {
+            "task_id": task_id,
+            "status": "processing",
+            "progress": info.get('current', 0) if info else 0,
+            "message": info.get('status', 'Processing...') if info else 'Processing...'
+        }
+    elif state == 'SUCCESS':
+        return {
+            "task_id": task_id,
+            "status": "completed",
+            "progress": 100,
+            "result": info
+        }
+    elif state == 'FAILURE':
+        return {
+            "task_id": task_id,
+            "status": "failed",
+            "progress": 0,
+            "error": str(info) if info else "Unknown error"
+        }
+    else:
+        return {
+            "task_id": task_id,
+            "status": state.lower(),
+            "progress": 0
+        }
+
+
+_status_publisher = None
+
+
+def publish_task_status(task_id: Optional[str], state: str, info: Any = None) -> None:
+    """Publish a task state transition to its Redis status channel (best effort)."""
+    global _status_publisher
+    if not task_id:
+        return
+    try:
+        if _status_publisher is None:
+            import redis
+            _status_publisher = redis.Redis.from_url(CELERY_RESULT_BACKEND)
+        payload = task_status_payload(task_id, state, info)
+        _status_publisher.publish(
+            TASK_STATUS_CHANNEL.format(task_id=task_id),
+            json.dumps(payload, default=str)
+        )
+    except Exception as e:
+        logger.debug(f"Failed to publish status for task {task_id}: {e}")
+
+
 # Create Celery app
 if Celery:
+    class StatusPublishingTask(Task):
+        """Task base class that also pushes every update_state() to Redis pub/sub."""
+        
+        def update_state(self, task_id=None, state=None, meta=None, **kwargs):
+            super().update_state(task_id=task_id, state=state, meta=meta, **kwargs)
+            publish_task_status(task_id or self.request.id, state, meta)
+    
     celery_app = Celery(
         "scilib_ai",
         broker=os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"),
-        backend=os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
+        backend=CELERY_RESULT_BACKEND,
+        task_cls=StatusPublishingTask
     )
     
     # Celery configuration
@@ -50,6 +134,15 @@ if Celery:
         worker_prefetch_multiplier=1,
         result_expires=3600,  # 1 hour
     )
+    
+    @task_prerun.connect
+    def _publish_task_started(task_id=None, **kwargs):
+        publish_task_status(task_id, "STARTED")
+    
+    @task_postrun.connect
+    def _publish_task_finished(task_id=None, retval=None, state=None, **kwargs):
+        if state:
+            publish_task_status(task_id, state, retval)
 else:
     celery_app = None
 
@@ -250,9 +343,6 @@ def extract_pdf_metadata_task(self, pdf_path: str, paper_id: int, use_llm: bool
         if use_llm and not os.getenv("OPENAI_API_KEY"):
             logger.warning("OPENAI_API_KEY not set in worker environment; LLM calls will fail or fallback will be used.")
         
-        # Import asyncio for running async pipeline
-        import asyncio
-        
         # Update progress
         self.update_state(
             state="PROGRESS",
@@ -263,14 +353,26 @@ def extract_pdf_metadata_task(self, pdf_path: str, paper_id: int, use_llm: bool
             }
         )
         
+        # Report OCR page progress for scanned PDFs (mapped onto 10-40%)
+        def report_ocr_progress(pages_done: int, pages_total: int):
+            self.update_state(
+                state="PROGRESS",
+                meta={
+                    "current": 10 + int(30 * pages_done / max(pages_total, 1)),
+                    "total": 100,
+                    "status": f"Running OCR on scanned PDF (page {pages_done}/{pages_total})..."
+                }
+            )
+        
         # Run the extraction pipeline (same call used in minimals/pipeline/test_extraction.py)
-        import asyncio
         try:
             logger.info("Invoking MetadataExtractionPipeline.extract_metadata()")
             
             # If use_llm is True (manual re-extraction), force LLM to run even if APIs have results
             force_llm = use_llm
-            result = asyncio.run(pipeline.extract_metadata(pdf_path, paper_id, force_llm=force_llm))
+            result = run_async(pipeline.extract_metadata(
+                pdf_path, paper_id, force_llm=force_llm, progress_callback=report_ocr_progress
+            ))
             logger.info(f"Pipeline returned for paper {paper_id}: extraction_status={result.get('extraction_status')} confidence={result.get('confidence')} sources={result.get('sources')}")
             
             # If confidence is low (<80%) and LLM is available but not used, retry with LLM
@@ -299,7 +401,7 @@ def extract_pdf_metadata_task(self, pdf_path: str, paper_id: int, use_llm: bool
                 
                 # Re-run with force_llm=True
                 logger.info(f"Re-running extraction with LLM for paper {paper_id}")
-                result = asyncio.run(pipeline_with_llm.extract_metadata(pdf_path, paper_id, force_llm=True))
+                result = run_async(pipeline_with_llm.extract_metadata(pdf_path, paper_id, force_llm=True))
                 new_confidence = result.get('confidence', 0)
                 
                 if new_confidence > confidence:
@@ -553,9 +655,8 @@ def run_extraction_sync(pdf_path: str, paper_id: int) -> Dict[str, Any]:
             crossref_email=os.getenv("CROSSREF_EMAIL"),
             semantic_scholar_key=os.getenv("SEMANTIC_SCHOLAR_API_KEY")
         )
-        import asyncio
         logger.info(f"Running synchronous extraction for paper {paper_id}")
-        result = asyncio.run(pipeline.extract_metadata(pdf_path, paper_id))
+        result = run_async(pipeline.extract_metadata(pdf_path, paper_id))
         update_paper_extraction_results(paper_id, result)
         return result
     except Exception as e:
@@ -677,7 +778,6 @@ def generate_paper_embedding_task(self, paper_id: int, force_regenerate: bool =
         from ..database import SessionLocal
         from ..database import Paper as PaperModel
         from .services.embedding_service import EmbeddingService
-        import asyncio
         
         # Get paper from database
         with SessionLocal() as db:
@@ -726,7 +826,7 @@ def generate_paper_embedding_task(self, paper_id: int, force_regenerate: bool =
         )
         
         # Generate embedding
-        embedding = asyncio.run(EmbeddingService.generate_paper_embedding(title, abstract))
+        embedding = run_async(EmbeddingService.generate_paper_embedding(title, abstract))
         
         if embedding is None:
             logger.error(f"Failed to generate embedding for paper {paper_id}")
@@ -788,6 +888,40 @@ def generate_paper_embedding_task(self, paper_id: int, force_regenerate: bool =
         }
 
 
+def _queue_embedding_on_insert(mapper, connection, target):
+    """
+    Remember papers inserted with final metadata so their embedding is queued
+    once the transaction commits (the worker can't see them before that).
+    
+    Uploads are inserted with extraction_status "pending" and a placeholder
+    title; they are embedded after extraction completes instead.
+    """
+    if target.extraction_status == "completed" and target.title:
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault("papers_to_embed", set()).add(target.id)
+
+
+def _dispatch_queued_embeddings(session):
+    """Dispatch embedding tasks for papers inserted in the committed transaction."""
+    for paper_id in session.info.pop("papers_to_embed", ()):
+        try:
+            generate_paper_embedding_task.delay(paper_id)
+            logger.info(f"Queued embedding generation for new paper {paper_id}")
+        except Exception as e:
+            logger.warning(f"Failed to queue embedding for paper {paper_id}: {e}")
+
+
+def _discard_queued_embeddings(session, previous_transaction):
+    """Forget queued papers when their transaction rolls back."""
+    session.info.pop("papers_to_embed", None)
+
+
+event.listen(PaperModel, "after_insert", _queue_embedding_on_insert)
+event.listen(Session, "after_commit", _dispatch_queued_embeddings)
+event.listen(Session, "after_soft_rollback", _discard_queued_embeddings)
+
+
 @celery_app.task(bind=True, name="find_similar_papers")
 def find_similar_papers_task(self, paper_id: int, force_refresh: bool = False, limit: int = 10, min_score: float = 0.5) -> Dict[str, Any]:
     """
@@ -821,8 +955,7 @@ def find_similar_papers_task(self, paper_id: int, force_refresh: bool = False, l
         
         from ..database import SessionLocal
         from ..database.models import Paper as PaperModel
-        from .services.vector_search_service import find_similar_papers
-        import asyncio
+        from .services.vector_search_service import find_similar_papers, SIMILAR_PAPERS_TTL
         
         with SessionLocal() as db:
             paper = db.query(PaperModel).filter(PaperModel.id == paper_id).first()
@@ -836,17 +969,20 @@ def find_similar_papers_task(self, paper_id: int, force_refresh: bool = False, l
                 }
             
             # Check if we need to refresh
-            if not force_refresh and paper.similar_papers and paper.similar_papers_updated_at:
-                cache_age = datetime.now() - paper.similar_papers_updated_at.replace(tzinfo=None)
-                if cache_age.total_seconds() < 86400:  # 24 hours
-                    logger.info(f"Using cached similar papers for paper {paper_id}")
-                    return {
-                        "status": "SUCCESS",
-                        "paper_id": paper_id,
-                        "similar_papers": paper.similar_papers,
-                        "cached": True,
-                        "completed_at": datetime.now().isoformat()
-                    }
+            if (
+                not force_refresh
+                and paper.similar_papers
+                and paper.similar_papers_expires_at
+                and paper.similar_papers_expires_at > datetime.now(timezone.utc)
+            ):
+                logger.info(f"Using cached similar papers for paper {paper_id}")
+                return {
+                    "status": "SUCCESS",
+                    "paper_id": paper_id,
+                    "similar_papers": paper.similar_papers,
+                    "cached": True,
+                    "completed_at": datetime.now().isoformat()
+                }
             
             # Check if paper has embedding
             if paper.embedding_title_abstract is None:
@@ -868,7 +1004,7 @@ def find_similar_papers_task(self, paper_id: int, force_refresh: bool = False, l
             )
             
             # Perform similarity search
-            similar_papers = asyncio.run(find_similar_papers(
+            similar_papers = run_async(find_similar_papers(
                 db=db,
                 paper_id=paper_id,
                 limit=limit,
@@ -888,6 +1024,7 @@ def find_similar_papers_task(self, paper_id: int, force_refresh: bool = False, l
             # Cache results in database
             paper.similar_papers = similar_papers
             paper.similar_papers_updated_at = datetime.now()
+            paper.similar_papers_expires_at = datetime.now(timezone.utc) + SIMILAR_PAPERS_TTL
             db.commit()
             
             logger.info(f"Found {len(similar_papers)} similar papers for paper {paper_id}")
@@ -940,7 +1077,6 @@ def generate_paper_summary_task(self, paper_id: int, force_regenerate: bool = Fa
         from ..database import SessionLocal
         from ..database import Paper as PaperModel
         from .services.summary_service import SummaryService
-        import asyncio
         
         # Get paper from database
         with SessionLocal() as db:
@@ -989,7 +1125,7 @@ def generate_paper_summary_task(self, paper_id: int, force_regenerate: bool = Fa
         )
         
         # Generate all summaries in parallel (including ELI5)
-        short_summary, detailed_summary, key_findings, eli5_summary = asyncio.run(
+        short_summary, detailed_summary, key_findings, eli5_summary = run_async(
             SummaryService.generate_complete_summary(title, abstract)
         )
         
@@ -1240,6 +1376,63 @@ def check_and_generate_summary_task(self, paper_id: int) -> Dict[str, Any]:
         }
 
 
+def _apply_smart_collections(db: Session, paper, fields, collections: Optional[Dict[str, Any]] = None):
+    """
+    Replace a paper's smart collections with the classified fields.
+    
+    Args:
+        db: Database session
+        paper: Paper to update
+        fields: Fields from SmartCollectionService (dicts with name and description)
+        collections: Optional cache of collections by name, shared across papers
+        
+    Returns:
+        Names of the collections the paper was added to
+    """
+    from ..database.models import Collection
+    
+    # First, remove existing smart collections from this paper
+    existing_smart_collections = [c for c in paper.collections if c.is_smart]
+    for collection in existing_smart_collections:
+        paper.collections.remove(collection)
+    
+    if collections is None:
+        collections = {}
+    
+    added_collections = []
+    for field_data in fields:
+        field_name = field_data.get('name') if isinstance(field_data, dict) else field_data
+        field_description = field_data.get('description', f"Auto-generated collection for {field_name} research") if isinstance(field_data, dict) else f"Auto-generated collection for {field_name} research"
+        
+        # Check if collection exists (smart or not)
+        collection = collections.get(field_name)
+        if collection is None:
+            collection = db.query(Collection).filter(
+                Collection.name == field_name
+            ).first()
+        
+        if not collection:
+            # Create new smart collection with AI-generated description
+            collection = Collection(
+                name=field_name,
+                description=field_description,
+                is_smart=True
+            )
+            db.add(collection)
+            db.flush()
+        elif not collection.is_smart:
+            # Convert existing collection to smart with AI description
+            collection.is_smart = True
+            collection.description = field_description
+        collections[field_name] = collection
+        
+        if collection not in paper.collections:
+            paper.collections.append(collection)
+            added_collections.append(field_name)
+    
+    return added_collections
+
+
 @celery_app.task(bind=True, name="classify_paper_smart_collections")
 def classify_paper_smart_collections_task(self, paper_id: int) -> Dict[str, Any]:
     """
@@ -1289,8 +1482,14 @@ def classify_paper_smart_collections_task(self, paper_id: int) -> Dict[str, Any]
                 meta={"current": 30, "total": 100, "status": "Classifying with AI..."}
             )
             
-            service = SmartCollectionService(os.getenv("OPENAI_API_KEY"))
-            fields = service.classify_paper(paper.title, paper.abstract)
+            async def classify():
+                service = SmartCollectionService(os.getenv("OPENAI_API_KEY"))
+                try:
+                    return await service.classify_paper(paper.title, paper.abstract)
+                finally:
+                    await service.close()
+            
+            fields = run_async(classify())
             
             if not fields:
                 return {
@@ -1305,39 +1504,7 @@ def classify_paper_smart_collections_task(self, paper_id: int) -> Dict[str, Any]
                 meta={"current": 70, "total": 100, "status": "Adding to collections..."}
             )
             
-            # First, remove existing smart collections from this paper
-            existing_smart_collections = [c for c in paper.collections if c.is_smart]
-            for collection in existing_smart_collections:
-                paper.collections.remove(collection)
-            
-            added_collections = []
-            for field_data in fields:
-                field_name = field_data.get('name') if isinstance(field_data, dict) else field_data
-                field_description = field_data.get('description', f"Auto-generated collection for {field_name} research") if isinstance(field_data, dict) else f"Auto-generated collection for {field_name} research"
-                
-                # Check if collection exists (smart or not)
-                collection = db.query(Collection).filter(
-                    Collection.name == field_name
-                ).first()
-                
-                if not collection:
-                    # Create new smart collection with AI-generated description
-                    collection = Collection(
-                        name=field_name,
-                        description=field_description,
-                        is_smart=True
-                    )
-                    db.add(collection)
-                    db.flush()
-                elif not collection.is_smart:
-                    # Convert existing collection to smart with AI description
-                    collection.is_smart = True
-                    collection.description = field_description
-                
-                if collection not in paper.collections:
-                    paper.collections.append(collection)
-                    added_collections.append(field_name)
-            
+            added_collections = _apply_smart_collections(db, paper, fields)
             db.commit()
             
             field_names = [f.get('name') if isinstance(f, dict) else f for f in fields]
@@ -1369,14 +1536,20 @@ def classify_all_papers_smart_collections_task(self) -> Dict[str, Any]:
     """
     Celery task for classifying all papers in the database.
     
+    Papers are classified in batches of several papers per LLM request
+    (SmartCollectionService.classify_papers_batch), with requests sent
+    concurrently, rather than one task and one request per paper.
+    
     Returns:
         Dict with classification results for all papers
     """
     try:
         logger.info("Starting bulk smart classification")
         
+        from sqlalchemy.orm import selectinload
         from ..database import SessionLocal
         from ..database.models import Paper, Settings
+        from .services.smart_collection_service import SmartCollectionService
         
         db = SessionLocal()
         try:
@@ -1388,28 +1561,48 @@ def classify_all_papers_smart_collections_task(self) -> Dict[str, Any]:
                     "message": "Smart collections is disabled"
                 }
             
-            # Get all papers
-            papers = db.query(Paper).all()
+            # Only the text the classifier needs
+            papers = [
+                {"id": paper_id, "title": title, "abstract": abstract}
+                for paper_id, title, abstract in db.query(Paper.id, Paper.title, Paper.abstract).all()
+            ]
             total = len(papers)
             
             self.update_state(
                 state="PROGRESS",
-                meta={"current": 0, "total": total, "status": f"Dispatching {total} classification tasks..."}
+                meta={"current": 0, "total": total, "status": f"Classifying {total} papers with AI..."}
             )
             
-            # Dispatch classification tasks asynchronously
-            task_ids = []
-            for paper in papers:
-                task = classify_paper_smart_collections_task.delay(paper.id)
-                task_ids.append(task.id)
+            async def classify():
+                service = SmartCollectionService(os.getenv("OPENAI_API_KEY"))
+                try:
+                    return await service.classify_papers_batch(papers)
+                finally:
+                    await service.close()
+            
+            classified = run_async(classify())
+            
+            self.update_state(
+                state="PROGRESS",
+                meta={"current": 0, "total": total, "status": f"Adding {len(classified)} papers to collections..."}
+            )
+            
+            collections = {}
+            for paper in db.query(Paper).options(selectinload(Paper.collections)).filter(
+                Paper.id.in_(list(classified))
+            ):
+                _apply_smart_collections(db, paper, classified[paper.id], collections)
+            db.commit()
             
-            logger.info(f"Dispatched {len(task_ids)} classification tasks")
+            failed = total - len(classified)
+            logger.info(f"Classified {len(classified)} of {total} papers ({failed} failed)")
             
             return {
                 "status": "SUCCESS",
                 "total_papers": total,
-                "task_ids": task_ids,
-                "message": f"Dispatched {total} classification tasks",
+                "classified": len(classified),
+                "failed": failed,
+                "message": f"Classified {len(classified)} of {total} papers",
                 "completed_at": datetime.now().isoformat()
             }
             
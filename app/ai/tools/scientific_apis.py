@@ -25,11 +25,25 @@ class CrossRefTool:
         initial_delay=1.0,
         exceptions=(requests.RequestException, requests.Timeout)
     )
-    def search_by_title(self, title: str, limit: int = 5) -> List[Dict]:
-        """Search for papers by title with automatic retry."""
+    def search_by_title(
+        self,
+        title: str,
+        limit: int = 5,
+        min_year: Optional[int] = None,
+        max_year: Optional[int] = None
+    ) -> List[Dict]:
+        """Search for papers by title with automatic retry, optionally within a year range."""
         query = quote(title)
         url = f"{self.base_url}?query.title={query}&rows={limit}"
         
+        filters = []
+        if min_year is not None:
+            filters.append(f"from-pub-date:{min_year}")
+        if max_year is not None:
+            filters.append(f"until-pub-date:{max_year}")
+        if filters:
+            url += f"&filter={','.join(filters)}"
+        
         response = requests.get(url, headers=self.headers, timeout=10)
         response.raise_for_status()
         
@@ -160,12 +174,24 @@ class ArxivTool:
     def __init__(self):
         self.base_url = "http://export.arxiv.org/api/query"
     
-    def search_by_title(self, title: str, limit: int = 5) -> List[Dict]:
-        """Search arXiv by title."""
+    def search_by_title(
+        self,
+        title: str,
+        limit: int = 5,
+        min_year: Optional[int] = None,
+        max_year: Optional[int] = None
+    ) -> List[Dict]:
+        """Search arXiv by title, optionally within a submission year range."""
         try:
             import xml.etree.ElementTree as ET
             
-            query = quote(f'ti:"{title}"')
+            search_query = f'ti:"{title}"'
+            if min_year is not None or max_year is not None:
+                # submittedDate takes YYYYMMDDHHMM bounds; arXiv starts in 1991
+                start = f"{min_year if min_year is not None else 1991}01010000"
+                end = f"{max_year if max_year is not None else 9999}12312359"
+                search_query += f" AND submittedDate:[{start} TO {end}]"
+            query = quote(search_query)
             url = f"{self.base_url}?search_query={query}&max_results={limit}"
             
             response = requests.get(url, timeout=10)
@@ -253,8 +279,14 @@ class SemanticScholarTool:
         if api_key:
             self.headers["x-api-key"] = api_key
     
-    def search_by_title(self, title: str, limit: int = 5) -> List[Dict]:
-        """Search Semantic Scholar by title."""
+    def search_by_title(
+        self,
+        title: str,
+        limit: int = 5,
+        min_year: Optional[int] = None,
+        max_year: Optional[int] = None
+    ) -> List[Dict]:
+        """Search Semantic Scholar by title, optionally within a year range."""
         try:
             search_url = f"{self.base_url}/paper/search"
             params = {
@@ -262,6 +294,9 @@ class SemanticScholarTool:
                 "limit": limit,
                 "fields": "title,authors,year,abstract,citationCount,referenceCount,venue,journal,externalIds,publicationDate,url,isOpenAccess,openAccessPdf,fieldsOfStudy,s2FieldsOfStudy"
             }
+            if min_year is not None or max_year is not None:
+                # "2016-2020", "2016-" or "-2020"
+                params["year"] = f"{min_year or ''}-{max_year or ''}"
             
             response = requests.get(search_url, headers=self.headers, params=params, timeout=10)
             response.raise_for_status()
@@ -335,6 +370,41 @@ class SemanticScholarTool:
                 logger.error(f"Semantic Scholar DOI lookup failed for {doi}: {e}")
             return None
     
+    def get_papers_by_dois(self, dois: List[str]) -> List[Optional[Dict]]:
+        """
+        Get citation counts for many papers by DOI via the batch endpoint.
+        
+        One request per 500 DOIs instead of one per paper. Returns results
+        aligned with ``dois``; None where a paper wasn't found or the request failed.
+        """
+        results: List[Optional[Dict]] = []
+        batch_url = f"{self.base_url}/paper/batch"
+        for start in range(0, len(dois), 500):
+            chunk = dois[start:start + 500]
+            try:
+                ids = [
+                    "DOI:" + doi.strip().replace("https://doi.org/", "").replace("http://dx.doi.org/", "")
+                    for doi in chunk
+                ]
+                response = requests.post(
+                    batch_url,
+                    headers=self.headers,
+                    params={"fields": "title,externalIds,citationCount"},
+                    json={"ids": ids},
+                    timeout=30
+                )
+                response.raise_for_status()
+                results.extend(response.json())
+                
+            except Exception as e:
+                if '429' in str(e):
+                    print("\033[93m⚠️  Semantic Scholar: Rate limited\033[0m")
+                else:
+                    logger.error(f"Semantic Scholar batch DOI lookup failed: {e}")
+                results.extend([None] * len(chunk))
+        
+        return results
+    
     def get_paper_by_arxiv(self, arxiv_id: str) -> Optional[Dict]:
         """Get paper metadata by arXiv ID."""
         try:
@@ -460,8 +530,14 @@ class OpenAlexTool:
         if email:
             self.headers["User-Agent"] = f"SciLib/1.0 (mailto:{email})"
     
-    def search_by_title(self, title: str, limit: int = 5) -> List[Dict]:
-        """Search OpenAlex by title."""
+    def search_by_title(
+        self,
+        title: str,
+        limit: int = 5,
+        min_year: Optional[int] = None,
+        max_year: Optional[int] = None
+    ) -> List[Dict]:
+        """Search OpenAlex by title, optionally within a publication year range."""
         try:
             search_url = f"{self.base_url}/works"
             params = {
@@ -469,6 +545,12 @@ class OpenAlexTool:
                 "per_page": limit,
                 "select": "id,doi,title,display_name,publication_year,authorships,abstract_inverted_index,primary_location,type,cited_by_count,biblio,keywords,topics"
             }
+            if min_year is not None and max_year is not None:
+                params["filter"] = f"publication_year:{min_year}-{max_year}"
+            elif min_year is not None:
+                params["filter"] = f"publication_year:>{min_year - 1}"
+            elif max_year is not None:
+                params["filter"] = f"publication_year:<{max_year + 1}"
             
             response = requests.get(search_url, headers=self.headers, params=params, timeout=10)
             response.raise_for_status()
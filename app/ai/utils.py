@@ -1,10 +1,13 @@
 """
 Utility functions for AI operations including retry logic.
 """
+import asyncio
 import time
 import logging
+import threading
+from concurrent.futures import Future
 from functools import wraps
-from typing import Callable, Any, Optional
+from typing import Awaitable, Callable, Any, Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -127,3 +130,121 @@ def async_retry_with_exponential_backoff(
         
         return wrapper
     return decorator
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one execution.
+    
+    The first caller for a key runs the function; callers arriving with the
+    same key while it runs wait and receive the same result (or exception)
+    instead of repeating the upstream request. Covers threads of one process;
+    results are shared, so callers must not mutate them.
+    
+    Example:
+        flights = SingleFlight()
+        results = flights.do(cache_key, api.search, query, limit=10)
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+    
+    def do(self, key: str, func: Callable, *args, **kwargs) -> Any:
+        """Run func(*args, **kwargs), or wait for the call already running under key."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        
+        if not leader:
+            return future.result()
+        
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class LoopBoundClient:
+    """
+    Lazily created async client, bound to the event loop that created it.
+    
+    Pooled HTTP and Redis connections cannot cross event loops, and Celery
+    tasks run each coroutine in a fresh loop (asyncio.run), so get() creates
+    a new client whenever the running loop changes. Run such coroutines
+    through run_async(), which closes every client opened in its loop
+    before the loop ends.
+    
+    Example:
+        _cache = LoopBoundClient(lambda: aioredis.from_url(url))
+        value = await _cache.get().get(key)
+    """
+    
+    _instances: List["LoopBoundClient"] = []
+    
+    def __init__(self, factory: Callable[[], Any], close: str = "aclose"):
+        """
+        Args:
+            factory: Creates the client
+            close: Name of the client's coroutine method that closes it
+        """
+        self._factory = factory
+        self._close = close
+        self._client = None
+        self._loop = None
+        LoopBoundClient._instances.append(self)
+    
+    def get(self) -> Any:
+        """The client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if self._client is not None:
+                # Its loop has ended; its connections can no longer be closed cleanly
+                logger.debug(f"Replacing {type(self._client).__name__} left open by a previous event loop")
+            self._client = self._factory()
+            self._loop = loop
+        return self._client
+    
+    async def close(self):
+        """Close the client if it was created in the running event loop."""
+        client = self._client
+        if client is None or self._loop is not asyncio.get_running_loop():
+            return
+        self._client = None
+        self._loop = None
+        try:
+            await getattr(client, self._close)()
+        except Exception as e:
+            logger.debug(f"Closing {type(client).__name__} failed: {e}")
+
+
+async def close_loop_clients():
+    """Close every LoopBoundClient created in the running event loop."""
+    for client in LoopBoundClient._instances:
+        await client.close()
+
+
+def run_async(coro: Awaitable) -> Any:
+    """
+    asyncio.run() for sync callers such as Celery tasks.
+    
+    Closes the LoopBoundClients the coroutine opened before the loop ends,
+    instead of leaving their connection pools behind with it.
+    """
+    async def main():
+        try:
+            return await coro
+        finally:
+            await close_loop_clients()
+    
+    return asyncio.run(main())
@@ -1,13 +1,15 @@
 """
 Citation Analysis API endpoints
 """
+import json
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel, Field
 from sqlalchemy import func
 
-from ..database.connection import get_db
+from ..database.connection import SessionLocal, get_db
 from ..auth import verify_api_key
 from ..ai.services.citation_service import CitationAnalysisService
 
@@ -21,6 +23,16 @@ class AddCitationRequest(BaseModel):
     context: Optional[str] = Field(None, description="Optional citation context")
 
 
+class BulkAddCitationsRequest(BaseModel):
+    """Request to add many citations at once"""
+    citations: List[AddCitationRequest] = Field(..., description="Citations to add")
+
+
+class FetchExternalCitationsRequest(BaseModel):
+    """Request to refresh external citation counts for many papers"""
+    paper_ids: List[int] = Field(..., max_length=1000, description="Papers to look up")
+
+
 class CitationResponse(BaseModel):
     """Citation response"""
     id: int
@@ -91,6 +103,34 @@ def add_citation(
         raise HTTPException(status_code=500, detail=f"Failed to add citation: {str(e)}")
 
 
+@router.post("/add-bulk")
+def bulk_add_citations(
+    request: BulkAddCitationsRequest,
+    db: Session = Depends(get_db),
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Add many citation relationships in one request (e.g. a paper's reference list)
+    
+    Self-citations and citations that already exist are skipped.
+    """
+    try:
+        service = CitationAnalysisService(db)
+        added = service.bulk_add_citations([
+            (c.citing_paper_id, c.cited_paper_id, c.context)
+            for c in request.citations
+        ])
+        
+        return {
+            "requested": len(request.citations),
+            "added": added,
+            "message": f"Added {added} citations"
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to add citations: {str(e)}")
+
+
 @router.delete("/{citing_paper_id}/{cited_paper_id}")
 def remove_citation(
     citing_paper_id: int,
@@ -134,6 +174,39 @@ def get_paper_citations(
         raise HTTPException(status_code=500, detail=f"Failed to get citations: {str(e)}")
 
 
+@router.post("/fetch-external-bulk")
+def fetch_external_citations_bulk(
+    request: FetchExternalCitationsRequest,
+    db: Session = Depends(get_db),
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Fetch external citation data from Semantic Scholar for many papers
+    
+    DOIs are looked up in batches; papers without a DOI match fall back to
+    concurrent title matching. Unknown paper IDs are skipped.
+    """
+    try:
+        service = CitationAnalysisService(db)
+        results = service.fetch_external_citations_bulk(request.paper_ids)
+        
+        return {
+            "papers": [
+                {
+                    "paper_id": paper_id,
+                    "external_citations": data["external_citations"],
+                    "source": data["source"]
+                }
+                for paper_id, data in results.items()
+            ],
+            "updated": sum(1 for data in results.values() if data["source"]),
+            "message": "External citations updated successfully"
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch external citations: {str(e)}")
+
+
 @router.post("/paper/{paper_id}/fetch-external")
 def fetch_external_citations(
     paper_id: int,
@@ -194,6 +267,7 @@ def calculate_influence(
 
 @router.post("/recalculate-all")
 def recalculate_all_metrics(
+    force: bool = Query(False, description="Recalculate even if no citations changed"),
     db: Session = Depends(get_db),
     api_key: str = Depends(verify_api_key)
 ):
@@ -201,10 +275,11 @@ def recalculate_all_metrics(
     Recalculate citation metrics for all papers
     
     This is a heavy operation that updates influence scores and h-index
-    for all papers in the library.
+    for all papers in the library. It is skipped when no citation links
+    changed since the last run, unless force is set.
     """
     service = CitationAnalysisService(db)
-    result = service.recalculate_all_metrics()
+    result = service.recalculate_all_metrics(force=force)
     
     return {
         "total_papers": result["total"],
@@ -270,6 +345,27 @@ def get_citation_network(
     return CitationNetworkResponse(**network)
 
 
+@router.get("/network/stream")
+def stream_citation_network(
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Stream the citation network as newline-delimited JSON
+    
+    One object per line: all nodes (``"type": "node"``), then all edges
+    (``"type": "edge"``), then a ``"type": "stats"`` summary. Lets clients
+    render large networks incrementally instead of waiting for /network.
+    """
+    def generate():
+        # Own session: the request-scoped one may be closed while the body streams
+        with SessionLocal() as db:
+            service = CitationAnalysisService(db)
+            for record in service.iter_citation_network():
+                yield json.dumps(record) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
 @router.get("/clusters")
 def get_citation_clusters(
     db: Session = Depends(get_db),
@@ -299,20 +395,25 @@ def get_citation_stats(
     """
     from ..database.models import Paper, Citation
     
-    total_papers = db.query(Paper).count()
-    total_citations = db.query(Citation).count()
-    
-    # Papers with citations
-    papers_with_citations = db.query(Paper).filter(Paper.citation_count > 0).count()
+    # Paper totals, papers with citations and average citations in one pass
+    total_papers, papers_with_citations, avg_citations = db.query(
+        func.count(Paper.id),
+        func.count(Paper.id).filter(Paper.citation_count > 0),
+        func.avg(Paper.citation_count)
+    ).one()
+    avg_citations = avg_citations or 0
     
-    # Average citations
-    avg_citations = db.query(func.avg(Paper.citation_count)).scalar() or 0
+    total_citations = db.query(func.count(Citation.id)).scalar()
     
     # Most cited paper
-    most_cited = db.query(Paper).order_by(Paper.citation_count.desc()).first()
+    most_cited = db.query(
+        Paper.id, Paper.title, Paper.citation_count
+    ).order_by(Paper.citation_count.desc()).first()
     
     # Most influential paper
-    most_influential = db.query(Paper).order_by(Paper.influence_score.desc()).first()
+    most_influential = db.query(
+        Paper.id, Paper.title, Paper.influence_score
+    ).order_by(Paper.influence_score.desc()).first()
     
     return {
         "total_papers": total_papers,
@@ -1,12 +1,15 @@
 """
 Discovery API endpoints for external paper search
 """
+import json
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel, Field
 
-from ..database.connection import get_db
+from ..database.connection import SessionLocal, get_db
 from ..auth import verify_api_key
 from ..ai.services.discovery_service import DiscoveryService, search_external_papers
 
@@ -162,6 +165,44 @@ def search_papers_get(
         raise HTTPException(status_code=500, detail=f"Discovery search failed: {str(e)}")
 
 
+@router.get("/search/stream")
+def stream_search_papers(
+    query: str = Query(..., description="Search query"),
+    sources: Optional[str] = Query(None, description="Comma-separated list of sources"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum results"),
+    min_year: Optional[int] = Query(None, description="Minimum publication year"),
+    max_year: Optional[int] = Query(None, description="Maximum publication year"),
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Search external scientific databases, streaming results as newline-delimited JSON
+    
+    Takes the same query parameters as GET /search. Each source's new papers
+    are sent as soon as that source responds (``"type": "paper"``, with an
+    ``index``), followed by one ``"type": "ranking"`` line giving the final
+    order by index once all sources are done.
+    """
+    source_list = None
+    if sources:
+        source_list = [s.strip() for s in sources.split(",")]
+        valid_sources = {"semantic_scholar", "arxiv", "crossref", "openalex"}
+        invalid = set(source_list) - valid_sources
+        if invalid:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid sources: {invalid}. Valid sources: {valid_sources}"
+            )
+    
+    def generate():
+        # Own session: the request-scoped one may be closed while the body streams
+        with SessionLocal() as db:
+            service = DiscoveryService(db)
+            for record in service.search_stream(query, source_list, limit, min_year, max_year):
+                yield json.dumps(record) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
 @router.post("/add", response_model=AddPaperResponse)
 def add_discovered_paper(
     request: AddPaperRequest,
@@ -187,7 +228,7 @@ def add_discovered_paper(
         from ..database.models import Paper
         
         if request.doi:
-            existing = db.query(Paper).filter(Paper.doi == request.doi).first()
+            existing = db.query(Paper.id).filter(Paper.doi == request.doi).first()
             if existing:
                 raise HTTPException(
                     status_code=400,
@@ -195,7 +236,8 @@ def add_discovered_paper(
                 )
         
         if request.title:
-            existing = db.query(Paper).filter(Paper.title == request.title).first()
+            # Served by ix_papers_title_lower
+            existing = db.query(Paper.id).filter(func.lower(Paper.title) == request.title.lower()).first()
             if existing:
                 raise HTTPException(
                     status_code=400,
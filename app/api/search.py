@@ -4,12 +4,14 @@ Search API endpoints for SciLib
 Provides semantic, keyword, and hybrid search over papers.
 """
 
+import json
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
-from app.database.connection import get_db
+from app.database.connection import SessionLocal, get_db
 from app.auth import verify_api_key
 from app.ai.services.vector_search_service import search_papers
 from app.ai.services.rag_service import RAGService
@@ -354,3 +356,37 @@ async def question_answer(
             detail=f"Q&A failed: {str(e)}"
         )
 
+
+@router.post("/qa/stream", dependencies=[Depends(verify_api_key)])
+async def question_answer_stream(request: QARequest):
+    """
+    Answer a question like POST /qa, streaming the answer as it is generated.
+    
+    The response is newline-delimited JSON: one ``"type": "sources"`` line
+    (sources, context_papers_count, has_sources) once retrieval is done, then
+    ``"type": "token"`` lines whose ``text`` concatenates to the answer, and
+    finally ``"type": "done"`` - or ``"type": "error"`` if answering failed.
+    """
+    # Validate year range
+    if request.year_from and request.year_to and request.year_from > request.year_to:
+        raise HTTPException(
+            status_code=400,
+            detail="year_from must be less than or equal to year_to"
+        )
+    
+    async def generate():
+        # Own session: the request-scoped one may be closed while the body streams
+        with SessionLocal() as db:
+            rag_service = RAGService()
+            async for record in rag_service.answer_question_stream(
+                db=db,
+                query=request.question,
+                collection_ids=request.collection_ids,
+                tag_ids=request.tag_ids,
+                year_from=request.year_from,
+                year_to=request.year_to,
+                max_papers=request.max_papers
+            ):
+                yield json.dumps(record) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
@@ -38,6 +38,7 @@ def main():
     try:
         # Import Celery app
         from app.ai.tasks import celery_app
+        from app.config import settings
         
         if not celery_app:
             logger.error("Celery not available. Please install with: pip install celery redis")
@@ -49,7 +50,7 @@ def main():
         celery_app.worker_main([
             "worker",
             "--loglevel=debug",
-            "--concurrency=2",  # Limit concurrent tasks
+            f"--concurrency={settings.worker_concurrency}",  # Limit concurrent tasks
             "--prefetch-multiplier=1",
             "--queues=celery,default",
             "--hostname=scilib-ai-worker@%h"
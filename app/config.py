@@ -23,6 +23,7 @@ class Settings(BaseSettings):
     # Background Processing
     redis_url: str = "redis://localhost:6379"
     celery_broker_url: str = "redis://localhost:6379"
+    worker_concurrency: int = 2  # Celery worker processes
     
     # Server
     host: str = "127.0.0.1"
@@ -36,6 +37,9 @@ class Settings(BaseSettings):
     max_ocr_pages: int = 10
     ocr_language: str = "eng"
     extraction_timeout: int = 300
+    extraction_cache_dir: Optional[str] = None  # Cache extracted PDF text by file hash
+    ocr_backend: str = "tesseract"  # "tesseract" or "easyocr" (GPU, for bulk backfills)
+    ocr_workers: Optional[int] = None  # OCR threads per worker process (default: CPU cores / worker_concurrency)
     
     class Config:
         env_file = ".env"
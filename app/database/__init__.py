@@ -1,10 +1,14 @@
-from .connection import SessionLocal, engine, get_db
+from .connection import SessionLocal, ScopedSession, engine, get_db, AsyncSessionLocal, async_engine, get_async_db
 from .models import Base, Paper, Collection, PaperCollection, Settings
 
 __all__ = [
     "SessionLocal",
+    "ScopedSession",
     "engine", 
     "get_db",
+    "AsyncSessionLocal",
+    "async_engine",
+    "get_async_db",
     "Base",
     "Paper",
     "Collection",
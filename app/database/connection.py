@@ -1,28 +1,124 @@
-from sqlalchemy import create_engine
+import itertools
+import threading
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 from ..config import settings
 
-# Create database engine
+# Create database engine (sync - used by Celery workers and legacy routes)
 engine = create_engine(
     settings.database_url,
+    pool_size=20,
+    max_overflow=10,
+    pool_timeout=30,
     pool_pre_ping=True,
+    pool_recycle=3600,  # Replace connections before server/proxy idle timeouts drop them
     echo=settings.debug  # Log SQL queries in debug mode
 )
 
 # Create sessionmaker
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Request-scoped sessions for sync routes. The scope is a context variable set
+# per request by the middleware in app.main (sync dependencies and endpoints
+# may run on different threadpool threads, so thread-local scoping is not
+# enough). Outside a request the session is scoped to the current thread.
+_request_scope: ContextVar[Optional[int]] = ContextVar("db_request_scope", default=None)
+_request_ids = itertools.count()
+
+
+def _session_scope():
+    """Key for the current session: the active request, else the current thread."""
+    request_id = _request_scope.get()
+    if request_id is not None:
+        return ("request", request_id)
+    return ("thread", threading.get_ident())
+
+
+ScopedSession = scoped_session(SessionLocal, scopefunc=_session_scope)
+
+
+def begin_request_scope():
+    """Start a new session scope for the current request; returns a reset token."""
+    return _request_scope.set(next(_request_ids))
+
+
+def end_request_scope(token):
+    """Close the request's session and leave its scope."""
+    try:
+        ScopedSession.remove()
+    finally:
+        _request_scope.reset(token)
+
+
+def _async_database_url(url: str) -> str:
+    """Map the configured psycopg2 URL onto the asyncpg driver."""
+    if url.startswith("postgresql+asyncpg://"):
+        return url
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+# Create async database engine (used by async FastAPI endpoints)
+async_engine = create_async_engine(
+    _async_database_url(settings.database_url),
+    pool_size=20,
+    max_overflow=10,
+    pool_timeout=30,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    echo=settings.debug
+)
+
+
+# Create async sessionmaker
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Create base class for models
 Base = declarative_base()
 
 
+def pgvector_has_halfvec(connection) -> bool:
+    """
+    Whether the database's pgvector extension supports halfvec (>= 0.7).
+    
+    Reads the installed version instead of trying a halfvec query, so an old
+    version never aborts the caller's transaction. Accepts a Connection or
+    a Session.
+    """
+    version = connection.execute(
+        text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+    ).scalar()
+    if not version:
+        return False
+    major, minor = (int(part) for part in version.split(".")[:2])
+    return (major, minor) >= (0, 7)
+
+
 def get_db():
     """
     Dependency to get database session
+    
+    Returns the request's scoped session; the request middleware removes it
+    once the response has been produced.
     """
-    db = SessionLocal()
-    try:
+    yield ScopedSession()
+
+
+async def get_async_db():
+    """
+    Dependency to get async database session
+    """
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -1,8 +1,8 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table, Float, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table, Float, JSON, Boolean, Index, UniqueConstraint, text, event, DDL
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from pgvector.sqlalchemy import Vector
-from .connection import Base
+from .connection import Base, pgvector_has_halfvec
 
 
 # Association tables for many-to-many relationships
@@ -74,6 +74,7 @@ class Paper(Base):
     # Similar papers (cached results from vector similarity search)
     similar_papers = Column(JSON)  # List of {paper_id, similarity_score, title}
     similar_papers_updated_at = Column(DateTime(timezone=True))
+    similar_papers_expires_at = Column(DateTime(timezone=True))  # Cached similar_papers valid until
     
     # Citation fields
     citation_count = Column(Integer, default=0, index=True)  # Times cited by other library papers
@@ -82,6 +83,7 @@ class Paper(Base):
     h_index = Column(Integer, default=0, index=True)  # H-index based on library citations
     influence_score = Column(Float, default=0.0, index=True)  # Calculated influence (0.0-1.0)
     citations_updated_at = Column(DateTime(timezone=True))
+    metrics_stale = Column(Boolean, default=True, server_default=text("true"))  # Set by citations trigger, cleared on recalculation
     
     # Relationships
     collections = relationship("Collection", secondary=paper_collections, back_populates="papers")
@@ -99,6 +101,23 @@ class Paper(Base):
         back_populates="cited_paper",
         cascade="all, delete-orphan"
     )
+    
+    __table_args__ = (
+        # Partial index so "how many papers have embeddings" is an index-only scan
+        Index(
+            "ix_papers_has_embedding",
+            "id",
+            postgresql_where=text("embedding_title_abstract IS NOT NULL")
+        ),
+        # Case-insensitive title lookups (discovery "already in library" checks)
+        Index("ix_papers_title_lower", text("lower(title)")),
+        # The influence ranking only lists papers with a positive score
+        Index(
+            "ix_papers_influence_positive",
+            "influence_score",
+            postgresql_where=text("influence_score > 0")
+        ),
+    )
 
 
 class Collection(Base):
@@ -119,14 +138,73 @@ class Citation(Base):
     __tablename__ = "citations"
     
     id = Column(Integer, primary_key=True, index=True)
-    citing_paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), nullable=False, index=True)
-    cited_paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), nullable=False, index=True)
+    citing_paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), nullable=False)
+    cited_paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), nullable=False)
     context = Column(Text)  # Optional: citation context from text
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     citing_paper = relationship("Paper", foreign_keys=[citing_paper_id], back_populates="citations_made")
     cited_paper = relationship("Paper", foreign_keys=[cited_paper_id], back_populates="citations_received")
+    
+    __table_args__ = (
+        # One row per citing/cited pair; add_citation relies on it for ON CONFLICT DO NOTHING.
+        # Its index also serves lookups by citing paper, the reverse index by cited
+        # paper, so neither column needs an index of its own.
+        UniqueConstraint("citing_paper_id", "cited_paper_id", name="uq_citations_pair"),
+        Index("ix_citations_cited_citing", "cited_paper_id", "citing_paper_id"),
+    )
+
+
+# Flags both papers of an inserted or deleted citation, so
+# recalculate_all_metrics knows whose metrics are out of date
+MARK_CITATION_METRICS_STALE_FUNCTION = """
+    CREATE OR REPLACE FUNCTION mark_citation_metrics_stale() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            UPDATE papers SET metrics_stale = true
+            WHERE id IN (OLD.citing_paper_id, OLD.cited_paper_id);
+            RETURN OLD;
+        END IF;
+        UPDATE papers SET metrics_stale = true
+        WHERE id IN (NEW.citing_paper_id, NEW.cited_paper_id);
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+CITATIONS_MARK_METRICS_STALE_TRIGGER = """
+    CREATE TRIGGER citations_mark_metrics_stale
+    AFTER INSERT OR DELETE ON citations
+    FOR EACH ROW EXECUTE FUNCTION mark_citation_metrics_stale()
+"""
+
+# Installed with the table by create_all (init_db); existing databases get
+# them from scripts/migrate_add_metrics_stale.py
+event.listen(
+    Citation.__table__, "after_create",
+    DDL(MARK_CITATION_METRICS_STALE_FUNCTION).execute_if(dialect="postgresql")
+)
+event.listen(
+    Citation.__table__, "after_create",
+    DDL(CITATIONS_MARK_METRICS_STALE_TRIGGER).execute_if(dialect="postgresql")
+)
+
+
+# Approximate nearest-neighbour index for cosine similarity search. Built on
+# a half-precision cast: half the size of a float32 index, so more of it stays
+# in shared_buffers. Queries must use the same cast. halfvec needs pgvector
+# >= 0.7; older versions skip the index (similarity search then runs in
+# memory) instead of failing create_all.
+event.listen(
+    Paper.__table__, "after_create",
+    DDL(
+        "CREATE INDEX ix_papers_embedding_hnsw ON papers "
+        "USING hnsw ((embedding_title_abstract::halfvec(1536)) halfvec_cosine_ops)"
+    ).execute_if(
+        callable_=lambda ddl, target, bind, **kw: bind.dialect.name == "postgresql" and pgvector_has_halfvec(bind)
+    )
+)
 
 
 # Compatibility aliases for association tables
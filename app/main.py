@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -7,6 +7,7 @@ from .api import papers, collections, search, discovery, citations, smart_collec
 from .api import settings as settings_router
 from .ai import endpoints as ai_endpoints
 from .auth import verify_api_key
+from .database.connection import begin_request_scope, end_request_scope
 
 # Create FastAPI app
 app = FastAPI(
@@ -30,6 +31,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def scoped_db_session(request: Request, call_next):
+    """Give each request its own scoped DB session and release it afterwards"""
+    token = begin_request_scope()
+    try:
+        return await call_next(request)
+    finally:
+        end_request_scope(token)
+
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -42,6 +54,7 @@ app.include_router(citations.router, dependencies=[Depends(verify_api_key)])
 app.include_router(smart_collections.router, dependencies=[Depends(verify_api_key)])
 app.include_router(settings_router.router, prefix="/api", dependencies=[Depends(verify_api_key)])
 app.include_router(ai_endpoints.router, dependencies=[Depends(verify_api_key)])
+app.include_router(ai_endpoints.ws_router)  # Checks the API key itself
 
 # Public endpoints (no auth required)
 @app.get("/")
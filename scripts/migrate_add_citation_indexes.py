@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Migration script: Add reverse citation pair index
+
+Adds the following index to the citations table:
+- ix_citations_cited_citing: (cited_paper_id, citing_paper_id)
+  (lookups by cited paper; together with uq_citations_pair, which covers
+  lookups by citing paper, every citation query is an index seek)
+
+Drops the single-column ix_citations_citing_paper_id and
+ix_citations_cited_paper_id indexes, which the pair indexes make redundant.
+
+Run scripts/migrate_add_citation_unique.py first.
+
+Usage:
+    python scripts/migrate_add_citation_indexes.py
+"""
+
+import sys
+import os
+
+# Add the project root to the path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+from app.database.connection import engine
+from app.config import settings
+
+
+def check_index_exists(connection, index_name):
+    """Check if an index exists."""
+    result = connection.execute(text(f"""
+        SELECT indexname
+        FROM pg_indexes
+        WHERE indexname = '{index_name}'
+    """))
+    return result.fetchone() is not None
+
+
+def add_index(connection, index_name, ddl):
+    """Create an index if it doesn't exist."""
+    if check_index_exists(connection, index_name):
+        print(f"  ⏭ Index '{index_name}' already exists, skipping")
+        return False
+    
+    connection.execute(text(ddl))
+    print(f"  ✓ Added index '{index_name}'")
+    return True
+
+
+def drop_index(connection, index_name):
+    """Drop an index if it exists."""
+    if not check_index_exists(connection, index_name):
+        return False
+    
+    connection.execute(text(f"DROP INDEX {index_name}"))
+    print(f"  ✓ Dropped index '{index_name}'")
+    return True
+
+
+def migrate():
+    """Run the migration."""
+    print("SciLib Migration: Add Citation Pair Indexes")
+    print("=" * 50)
+    print(f"Database: {settings.database_url}")
+    print()
+    
+    new_indexes = [
+        (
+            "ix_citations_cited_citing",
+            "CREATE INDEX ix_citations_cited_citing ON citations (cited_paper_id, citing_paper_id)"
+        ),
+    ]
+    
+    # Covered by the leading column of a pair index
+    old_indexes = ["ix_citations_citing_paper_id", "ix_citations_cited_paper_id"]
+    
+    with engine.connect() as connection:
+        with connection.begin():
+            # The unique constraint's index must exist before dropping the citing-side index
+            if not check_index_exists(connection, "uq_citations_pair"):
+                raise RuntimeError("uq_citations_pair missing, run scripts/migrate_add_citation_unique.py first")
+            
+            print("Updating indexes on 'citations' table:")
+            
+            changes_made = 0
+            for index_name, ddl in new_indexes:
+                if add_index(connection, index_name, ddl):
+                    changes_made += 1
+            
+            for index_name in old_indexes:
+                if drop_index(connection, index_name):
+                    changes_made += 1
+            
+            print()
+            if changes_made > 0:
+                print(f"✅ Migration complete! {changes_made} index change(s) applied.")
+            else:
+                print("✅ No changes needed - all indexes already exist.")
+
+
+if __name__ == "__main__":
+    try:
+        migrate()
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
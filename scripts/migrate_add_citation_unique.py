@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Migration script: Add unique constraint on citation pairs
+
+Adds the following constraint to the citations table:
+- uq_citations_pair: UNIQUE (citing_paper_id, cited_paper_id)
+  (lets add_citation insert with ON CONFLICT DO NOTHING instead of checking
+  for an existing row first; its index also serves lookups by citing paper)
+
+Duplicate citation rows are removed first, keeping the oldest of each pair.
+
+Usage:
+    python scripts/migrate_add_citation_unique.py
+"""
+
+import sys
+import os
+
+# Add the project root to the path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+from app.database.connection import engine
+from app.config import settings
+
+
+def check_constraint_exists(connection, constraint_name):
+    """Check if a constraint exists."""
+    result = connection.execute(text(f"""
+        SELECT conname
+        FROM pg_constraint
+        WHERE conname = '{constraint_name}'
+    """))
+    return result.fetchone() is not None
+
+
+def migrate():
+    """Run the migration."""
+    print("SciLib Migration: Add Citation Pair Unique Constraint")
+    print("=" * 50)
+    print(f"Database: {settings.database_url}")
+    print()
+    
+    with engine.connect() as connection:
+        with connection.begin():
+            print("Updating 'citations' table:")
+            
+            if check_constraint_exists(connection, "uq_citations_pair"):
+                print("  ⏭ Constraint 'uq_citations_pair' already exists, skipping")
+                print()
+                print("✅ No changes needed - constraint already exists.")
+                return
+            
+            result = connection.execute(text("""
+                DELETE FROM citations a
+                USING citations b
+                WHERE a.citing_paper_id = b.citing_paper_id
+                  AND a.cited_paper_id = b.cited_paper_id
+                  AND a.id > b.id
+            """))
+            if result.rowcount:
+                print(f"  ✓ Removed {result.rowcount} duplicate citation(s)")
+            
+            connection.execute(text(
+                "ALTER TABLE citations ADD CONSTRAINT uq_citations_pair "
+                "UNIQUE (citing_paper_id, cited_paper_id)"
+            ))
+            print("  ✓ Added constraint 'uq_citations_pair'")
+            
+            print()
+            print("✅ Migration complete! Added 1 constraint.")
+
+
+if __name__ == "__main__":
+    try:
+        migrate()
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
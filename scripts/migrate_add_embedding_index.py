@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Migration script: Add partial index on embedded papers
+
+Adds the following index to the papers table:
+- ix_papers_has_embedding: Partial index on id WHERE embedding_title_abstract IS NOT NULL
+  (lets the similar-papers endpoint count embedded papers with an index-only scan)
+
+Usage:
+    python scripts/migrate_add_embedding_index.py
+"""
+
+import sys
+import os
+
+# Add the project root to the path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+from app.database.connection import engine
+from app.config import settings
+
+
+def check_index_exists(connection, index_name):
+    """Check if an index exists."""
+    result = connection.execute(text(f"""
+        SELECT indexname
+        FROM pg_indexes
+        WHERE indexname = '{index_name}'
+    """))
+    return result.fetchone() is not None
+
+
+def add_index(connection, index_name, ddl):
+    """Create an index if it doesn't exist."""
+    if check_index_exists(connection, index_name):
+        print(f"  ⏭ Index '{index_name}' already exists, skipping")
+        return False
+    
+    connection.execute(text(ddl))
+    print(f"  ✓ Added index '{index_name}'")
+    return True
+
+
+def migrate():
+    """Run the migration."""
+    print("SciLib Migration: Add Embedding Partial Index")
+    print("=" * 50)
+    print(f"Database: {settings.database_url}")
+    print()
+    
+    new_indexes = [
+        (
+            "ix_papers_has_embedding",
+            "CREATE INDEX ix_papers_has_embedding ON papers (id) "
+            "WHERE embedding_title_abstract IS NOT NULL"
+        ),
+    ]
+    
+    with engine.connect() as connection:
+        with connection.begin():
+            print("Adding indexes to 'papers' table:")
+            
+            changes_made = 0
+            for index_name, ddl in new_indexes:
+                if add_index(connection, index_name, ddl):
+                    changes_made += 1
+            
+            print()
+            if changes_made > 0:
+                print(f"✅ Migration complete! Added {changes_made} index(es).")
+            else:
+                print("✅ No changes needed - all indexes already exist.")
+
+
+if __name__ == "__main__":
+    try:
+        migrate()
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
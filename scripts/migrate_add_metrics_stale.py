@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Migration script: Add citation metrics staleness tracking
+
+Adds the following to the database:
+- papers.metrics_stale: BOOLEAN DEFAULT true
+  (cleared by recalculate_all_metrics, which skips the recompute when no
+  paper is flagged)
+- mark_citation_metrics_stale(): trigger function flagging both papers of
+  an inserted or deleted citation
+- citations_mark_metrics_stale: AFTER INSERT OR DELETE trigger on citations
+
+Existing papers start out stale, so the first recalculation covers them all.
+
+Usage:
+    python scripts/migrate_add_metrics_stale.py
+"""
+
+import sys
+import os
+
+# Add the project root to the path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+from app.database.connection import engine
+from app.database.models import MARK_CITATION_METRICS_STALE_FUNCTION, CITATIONS_MARK_METRICS_STALE_TRIGGER
+from app.config import settings
+
+
+def check_column_exists(connection, table, column):
+    """Check if a column exists in the table."""
+    result = connection.execute(text(f"""
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_name = '{table}' AND column_name = '{column}'
+    """))
+    return result.fetchone() is not None
+
+
+def check_trigger_exists(connection, trigger_name):
+    """Check if a trigger exists."""
+    result = connection.execute(text(f"""
+        SELECT tgname
+        FROM pg_trigger
+        WHERE tgname = '{trigger_name}'
+    """))
+    return result.fetchone() is not None
+
+
+def migrate():
+    """Run the migration."""
+    print("SciLib Migration: Add Citation Metrics Staleness Tracking")
+    print("=" * 50)
+    print(f"Database: {settings.database_url}")
+    print()
+    
+    with engine.connect() as connection:
+        with connection.begin():
+            changes_made = 0
+            
+            print("Updating 'papers' table:")
+            if check_column_exists(connection, "papers", "metrics_stale"):
+                print("  ⏭ Column 'metrics_stale' already exists, skipping")
+            else:
+                connection.execute(text(
+                    "ALTER TABLE papers ADD COLUMN metrics_stale BOOLEAN DEFAULT true"
+                ))
+                print("  ✓ Added column 'metrics_stale'")
+                changes_made += 1
+            
+            print("Updating 'citations' table:")
+            # CREATE OR REPLACE keeps the function body current on re-runs
+            connection.execute(text(MARK_CITATION_METRICS_STALE_FUNCTION))
+            print("  ✓ Created function 'mark_citation_metrics_stale'")
+            
+            if check_trigger_exists(connection, "citations_mark_metrics_stale"):
+                print("  ⏭ Trigger 'citations_mark_metrics_stale' already exists, skipping")
+            else:
+                connection.execute(text(CITATIONS_MARK_METRICS_STALE_TRIGGER))
+                print("  ✓ Added trigger 'citations_mark_metrics_stale'")
+                changes_made += 1
+            
+            print()
+            if changes_made > 0:
+                print(f"✅ Migration complete! {changes_made} change(s) applied.")
+            else:
+                print("✅ No changes needed - staleness tracking already installed.")
+
+
+if __name__ == "__main__":
+    try:
+        migrate()
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
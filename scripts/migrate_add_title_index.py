@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Migration script: Add case-insensitive title index
+
+Adds the following index to the papers table:
+- ix_papers_title_lower: Expression index on lower(title)
+  (discovery checks whether results are already in the library by
+  case-insensitive title; DOI lookups use the existing unique index)
+
+Usage:
+    python scripts/migrate_add_title_index.py
+"""
+
+import sys
+import os
+
+# Add the project root to the path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+from app.database.connection import engine
+from app.config import settings
+
+
+def check_index_exists(connection, index_name):
+    """Check if an index exists."""
+    result = connection.execute(text(f"""
+        SELECT indexname
+        FROM pg_indexes
+        WHERE indexname = '{index_name}'
+    """))
+    return result.fetchone() is not None
+
+
+def add_index(connection, index_name, ddl):
+    """Create an index if it doesn't exist."""
+    if check_index_exists(connection, index_name):
+        print(f"  ⏭ Index '{index_name}' already exists, skipping")
+        return False
+    
+    connection.execute(text(ddl))
+    print(f"  ✓ Added index '{index_name}'")
+    return True
+
+
+def migrate():
+    """Run the migration."""
+    print("SciLib Migration: Add Title Index")
+    print("=" * 50)
+    print(f"Database: {settings.database_url}")
+    print()
+    
+    new_indexes = [
+        (
+            "ix_papers_title_lower",
+            "CREATE INDEX ix_papers_title_lower ON papers (lower(title))"
+        ),
+    ]
+    
+    with engine.connect() as connection:
+        with connection.begin():
+            print("Adding indexes to 'papers' table:")
+            
+            changes_made = 0
+            for index_name, ddl in new_indexes:
+                if add_index(connection, index_name, ddl):
+                    changes_made += 1
+            
+            print()
+            if changes_made > 0:
+                print(f"✅ Migration complete! Added {changes_made} index(es).")
+            else:
+                print("✅ No changes needed - all indexes already exist.")
+
+
+if __name__ == "__main__":
+    try:
+        migrate()
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
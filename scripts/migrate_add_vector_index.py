@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Migration script: Add HNSW index for similarity search
+
+Adds the following index to the papers table:
+- ix_papers_embedding_hnsw: HNSW index on embedding_title_abstract::halfvec(1536)
+  (halfvec_cosine_ops; lets similar-paper queries use ORDER BY <=> ... LIMIT k as an
+  ANN index scan, at half the index size of a float32 index)
+
+Drops the earlier ix_papers_embedding_ivfflat index if present.
+
+Usage:
+    python scripts/migrate_add_vector_index.py
+"""
+
+import sys
+import os
+
+# Add the project root to the path
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+from app.database.connection import engine, pgvector_has_halfvec
+from app.config import settings
+
+
+def check_index_exists(connection, index_name):
+    """Check if an index exists."""
+    result = connection.execute(text(f"""
+        SELECT indexname
+        FROM pg_indexes
+        WHERE indexname = '{index_name}'
+    """))
+    return result.fetchone() is not None
+
+
+def add_index(connection, index_name, ddl):
+    """Create an index if it doesn't exist."""
+    if check_index_exists(connection, index_name):
+        print(f"  ⏭ Index '{index_name}' already exists, skipping")
+        return False
+    
+    connection.execute(text(ddl))
+    print(f"  ✓ Added index '{index_name}'")
+    return True
+
+
+def drop_index(connection, index_name):
+    """Drop an index if it exists."""
+    if not check_index_exists(connection, index_name):
+        return False
+    
+    connection.execute(text(f"DROP INDEX {index_name}"))
+    print(f"  ✓ Dropped index '{index_name}'")
+    return True
+
+
+def migrate():
+    """Run the migration."""
+    print("SciLib Migration: Add Embedding HNSW Index")
+    print("=" * 50)
+    print(f"Database: {settings.database_url}")
+    print()
+    
+    new_indexes = [
+        (
+            "ix_papers_embedding_hnsw",
+            "CREATE INDEX ix_papers_embedding_hnsw ON papers "
+            "USING hnsw ((embedding_title_abstract::halfvec(1536)) halfvec_cosine_ops)"
+        ),
+    ]
+    
+    # Superseded by the halfvec HNSW index
+    old_indexes = ["ix_papers_embedding_ivfflat"]
+    
+    with engine.connect() as connection:
+        with connection.begin():
+            if not pgvector_has_halfvec(connection):
+                print("⏭ pgvector < 0.7 has no halfvec; skipping the HNSW index")
+                print("  (similarity search falls back to in-memory scoring)")
+                return
+            
+            print("Adding indexes to 'papers' table:")
+            
+            changes_made = 0
+            for index_name, ddl in new_indexes:
+                if add_index(connection, index_name, ddl):
+                    changes_made += 1
+            
+            for index_name in old_indexes:
+                if drop_index(connection, index_name):
+                    changes_made += 1
+            
+            print()
+            if changes_made > 0:
+                print(f"✅ Migration complete! {changes_made} index change(s) applied.")
+            else:
+                print("✅ No changes needed - all indexes already exist.")
+
+
+if __name__ == "__main__":
+    try:
+        migrate()
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
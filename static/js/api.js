@@ -153,6 +153,58 @@ class API {
             return API.request(`/ai/status/${taskId}`);
         },
         
+        // Push-based task status. Calls onUpdate(status) for every update; resolves true
+        // once the task has finished, false if the socket closed before that.
+        watchTaskStatus(taskId, onUpdate) {
+            return new Promise((resolve, reject) => {
+                const apiKey = ApiKeyManager.getApiKey();
+                if (!apiKey || typeof WebSocket === 'undefined') {
+                    reject(new Error('WebSocket status updates unavailable'));
+                    return;
+                }
+                
+                const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+                const url = `${protocol}//${window.location.host}${API_BASE_URL}/ai/ws/status/${taskId}`;
+                const socket = new WebSocket(url);
+                let finished = false;
+                let opened = false;
+                
+                socket.onopen = () => {
+                    opened = true;
+                    // Authenticate in the first message; a query parameter would end up in access logs
+                    socket.send(JSON.stringify({ api_key: apiKey.trim() }));
+                };
+                
+                socket.onmessage = async (event) => {
+                    if (finished) return;
+                    const status = JSON.parse(event.data);
+                    // Mark terminal states before awaiting so onclose can't trigger a fallback
+                    finished = ['completed', 'failed', 'error'].includes(status.status);
+                    try {
+                        await onUpdate(status);
+                    } catch (error) {
+                        console.error('Error handling task status update:', error);
+                    }
+                    if (finished) {
+                        socket.close();
+                        resolve(true);
+                    }
+                };
+                
+                socket.onerror = () => {
+                    if (!opened) {
+                        reject(new Error('WebSocket connection failed'));
+                    }
+                };
+                
+                socket.onclose = () => {
+                    if (!finished) {
+                        resolve(false);
+                    }
+                };
+            });
+        },
+        
         // Summaries (in papers API)
         async generateSummary(paperId) {
             return API.request(`/papers/${paperId}/summarize`, { 
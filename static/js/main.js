@@ -1622,6 +1622,57 @@ class PaperManager {
     async pollTaskStatus(taskId, paperId, autoTriggered = false, maxAttempts = 60) {
         let attempts = 0;
         
+        // Returns true once the task has finished and the UI has been updated
+        const handleStatus = async (status) => {
+            if (status.status === 'completed') {
+                console.log('Task completed! Refreshing paper details...');
+                
+                // Remove from active tasks
+                this.activeSummaryTasks.delete(paperId);
+                
+                if (!autoTriggered) {
+                    UIComponents.showNotification('Summary generated successfully!', 'success');
+                }
+                
+                // Force reload paper details to show new summary
+                const paper = await API.papers.get(paperId);
+                console.log('Reloaded paper data:', paper);
+                
+                await this.showPaperDetails(paperId);
+                
+                // Also reload the papers list to update the card
+                await this.loadPapers();
+                
+                return true;
+            } else if (status.status === 'failed' || status.status === 'error') {
+                console.log('Task failed:', status.error);
+                
+                // Remove from active tasks
+                this.activeSummaryTasks.delete(paperId);
+                
+                UIComponents.showNotification(`Summary generation failed: ${status.error || 'Unknown error'}`, 'error');
+                
+                // Still reload to show the knowledge check badge
+                await this.showPaperDetails(paperId);
+                await this.loadPapers();
+                
+                return true;
+            }
+            
+            // Update progress message in the tabs if available
+            if (status.message && autoTriggered) {
+                const summaryAction = document.querySelector('.summary-status');
+                if (summaryAction) {
+                    const messageText = summaryAction.querySelector('span');
+                    if (messageText) {
+                        messageText.textContent = status.message;
+                    }
+                }
+            }
+            
+            return false;
+        };
+        
         const poll = async () => {
             try {
                 attempts++;
@@ -1629,38 +1680,7 @@ class PaperManager {
                 
                 console.log('Poll attempt', attempts, 'for task', taskId, '- Status:', status);
                 
-                if (status.status === 'completed') {
-                    console.log('Task completed! Refreshing paper details...');
-                    
-                    // Remove from active tasks
-                    this.activeSummaryTasks.delete(paperId);
-                    
-                    if (!autoTriggered) {
-                        UIComponents.showNotification('Summary generated successfully!', 'success');
-                    }
-                    
-                    // Force reload paper details to show new summary
-                    const paper = await API.papers.get(paperId);
-                    console.log('Reloaded paper data:', paper);
-                    
-                    await this.showPaperDetails(paperId);
-                    
-                    // Also reload the papers list to update the card
-                    await this.loadPapers();
-                    
-                    return;
-                } else if (status.status === 'failed' || status.status === 'error') {
-                    console.log('Task failed:', status.error);
-                    
-                    // Remove from active tasks
-                    this.activeSummaryTasks.delete(paperId);
-                    
-                    UIComponents.showNotification(`Summary generation failed: ${status.error || 'Unknown error'}`, 'error');
-                    
-                    // Still reload to show the knowledge check badge
-                    await this.showPaperDetails(paperId);
-                    await this.loadPapers();
-                    
+                if (await handleStatus(status)) {
                     return;
                 } else if (attempts >= maxAttempts) {
                     console.log('Task polling timed out after', attempts, 'attempts');
@@ -1668,17 +1688,6 @@ class PaperManager {
                     return;
                 }
                 
-                // Update progress message in the tabs if available
-                if (status.message && autoTriggered) {
-                    const summaryAction = document.querySelector('.summary-status');
-                    if (summaryAction) {
-                        const messageText = summaryAction.querySelector('span');
-                        if (messageText) {
-                            messageText.textContent = status.message;
-                        }
-                    }
-                }
-                
                 // Poll again after 2 seconds
                 setTimeout(poll, 2000);
             } catch (error) {
@@ -1691,6 +1700,16 @@ class PaperManager {
             }
         };
         
+        // Prefer pushed updates; fall back to polling if the WebSocket drops early
+        try {
+            const finished = await API.ai.watchTaskStatus(taskId, handleStatus);
+            if (finished) {
+                return;
+            }
+        } catch (error) {
+            console.warn('Task status WebSocket unavailable, falling back to polling:', error);
+        }
+        
         // Start polling
         poll();
     }